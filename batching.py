@@ -0,0 +1,109 @@
+"""
+Funzioni di supporto per consumare i dati delle persone a blocchi (batch).
+
+I writer Excel e SQLite accettano qualsiasi sorgente supportata da `iter_row_batches()`:
+- una lista (o un iterabile) di dizionari persona, come quella di `DataGenerator.generate_data()`;
+- un iterabile di batch, come quello di `DataGenerator.iter_batches()`;
+- blocchi colonnari (dizionario di array o DataFrame), come quelli di
+  `DataGenerator.generate_bulk()` e `DataGenerator.generate_parallel()`;
+- un `person.PersonBatch` (o batch di record `person.Person`).
+Le persone nel formato precedente, senza i campi dell'indirizzo strutturato, vengono completate
+ricavandoli dall'indirizzo (vedi `person.completa_riga()`).
+In questo modo i dati vengono letti un blocco alla volta e non serve tenerli tutti in memoria.
+"""
+from person import CAMPI_BASE, Person, PersonBatch, completa_riga, riga_da_dict
+
+# Campi di una persona, nell'ordine delle colonne di Excel e della tabella `persone`
+CAMPI = Person._fields
+# Numero di righe per batch di default
+BATCH_SIZE = 10_000
+
+
+def iter_row_batches(data, batch_size=BATCH_SIZE):
+    """
+    Normalizza una sorgente di persone in batch di tuple ordinate secondo `CAMPI`.
+    Args:
+        data: Lista/iterabile di persone, iterabile di batch oppure blocco colonnare.
+        batch_size (int): Numero massimo di righe per batch restituito.
+    Yields:
+        list[tuple]: Batch di al massimo `batch_size` righe ordinate secondo `CAMPI`.
+    """
+    if isinstance(data, PersonBatch):
+        # Già colonnare: decodifica direttamente un blocco alla volta
+        yield from data.iter_batches(batch_size)
+        return
+
+    buffer = []
+    for row in _iter_rows(data):
+        buffer.append(row)
+        if len(buffer) >= batch_size:
+            yield buffer
+            buffer = []
+    if buffer:
+        yield buffer
+
+
+def _iter_rows(data):
+    """
+    Restituisce una per una le righe (tuple) contenute in `data`, qualunque sia la sua forma.
+    Raises:
+        TypeError: Se un elemento non è né una persona né un insieme di persone (es. una stringa,
+        un numero o una riga con un numero di valori diverso da quello di `CAMPI` o `CAMPI_BASE`).
+    """
+    if is_columnar(data):
+        yield from _columnar_rows(data)
+        return
+    if isinstance(data, PersonBatch):
+        for batch in data.iter_batches(BATCH_SIZE):
+            yield from batch
+        return
+
+    for item in data:
+        if isinstance(item, dict) and not is_columnar(item):
+            # Singola persona (anche con campi vuoti, es. nome None)
+            yield riga_da_dict(item)
+        elif isinstance(item, (tuple, list)) and len(item) in (len(CAMPI), len(CAMPI_BASE)) and all(
+                valore is None or isinstance(valore, str) for valore in item):
+            # Riga già in forma di tupla (o lista)
+            yield completa_riga(item if type(item) is tuple else tuple(item))
+        elif is_columnar(item):
+            yield from _columnar_rows(item)
+        elif isinstance(item, (tuple, list)) and item and all(map(_scalare, item)):
+            # Riga con valori non testuali (es. telefono numerico), convertiti in stringhe
+            if len(item) not in (len(CAMPI), len(CAMPI_BASE)):
+                raise TypeError(f"riga con {len(item)} valori invece di {len(CAMPI_BASE)} o {len(CAMPI)}: {item!r}")
+            yield completa_riga(tuple(None if valore is None else str(valore) for valore in item))
+        elif _scalare(item):
+            raise TypeError(f"elemento non valido tra le persone: {item!r}")
+        else:
+            # Batch di persone
+            yield from _iter_rows(item)
+
+
+def _scalare(valore):
+    """
+    Verifica se `valore` è un singolo valore (stringa, numero, None) e non un insieme di valori.
+    """
+    return isinstance(valore, str) or not hasattr(valore, "__iter__")
+
+
+def is_columnar(data):
+    """
+    Verifica se `data` è un blocco colonnare (dizionario di colonne o DataFrame): in un
+    dizionario la colonna "nome" deve essere un insieme di valori, non un valore singolo.
+    """
+    if isinstance(data, dict):
+        return "nome" in data and not _scalare(data["nome"])
+    return hasattr(data, "columns") and hasattr(data, "iloc")
+
+
+def _columnar_rows(columns):
+    """
+    Converte un blocco colonnare in tuple, trasformando gli array NumPy in stringhe Python.
+    """
+    campi = CAMPI if "via" in columns else CAMPI_BASE
+    colonne = [columns[campo] for campo in campi]
+    colonne = [col.tolist() if hasattr(col, "tolist") else col for col in colonne]
+    if campi is CAMPI_BASE:
+        return map(completa_riga, zip(*colonne))
+    return zip(*colonne)
@@ -0,0 +1,10 @@
+"""
+Benchmark del progetto.
+
+Ogni modulo si esegue dalla cartella principale del progetto, ad esempio:
+    python -m benchmarks.bench_generator
+
+`bench_suite` misura tutte le operazioni principali a più dimensioni e confronta due esecuzioni
+per trovare le regressioni; `bench_startup` controlla il tempo di avvio di `main.py` rispetto
+a un budget.
+"""
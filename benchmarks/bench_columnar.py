@@ -0,0 +1,67 @@
+"""
+Confronta i formati di archiviazione delle persone: XLSX, SQLite, Parquet e Arrow IPC.
+Per ciascuno misura scrittura, lettura completa a blocchi, confronto con il database
+(`diff.DiffEngine`) e dimensione del file.
+
+Richiede `pyarrow`.
+
+Uso:
+    python -m benchmarks.bench_columnar --rows 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from columnar import ColumnarWriter
+from database import SQLiteWriter
+from diff import DiffEngine
+from excel import ExcelWriter
+from generator import DataGenerator
+
+
+def _misura(funzione):
+    start = time.perf_counter()
+    risultato = funzione()
+    return risultato, time.perf_counter() - start
+
+
+def _conta(blocchi):
+    return sum(len(blocco) for blocco in blocchi)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark formati XLSX / SQLite / Parquet / Arrow")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    dati = DataGenerator().generate_bulk(args.rows, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "persone.db")
+        sqlite_writer = SQLiteWriter(db_name)
+        _, secondi = _misura(lambda: sqlite_writer.bulk_insert(dati))
+        _, lettura = _misura(lambda: _conta(sqlite_writer.iter_persone(fetch_size=10_000)))
+        risultati = [("sqlite", secondi, lettura, None, os.path.getsize(db_name))]
+
+        sorgenti = [("xlsx", ExcelWriter(os.path.join(tmp, "persone.xlsx")))]
+        sorgenti += [(formato, ColumnarWriter(os.path.join(tmp, f"persone.{formato}")))
+                     for formato in ("parquet", "arrow")]
+        for nome, writer in sorgenti:
+            if nome == "xlsx":
+                _, scrittura = _misura(lambda: writer.write_to_excel_streaming(dati))
+            else:
+                _, scrittura = _misura(lambda: writer.write(dati))
+            _, lettura = _misura(lambda: _conta(writer.iter_excel_rows()))
+            _, confronto = _misura(lambda: DiffEngine(writer, db_name).compare())
+            risultati.append((nome, scrittura, lettura, confronto, os.path.getsize(writer.filename)))
+        sqlite_writer.close()
+
+    print(f"\n{'formato':<8} {'scrittura':>10} {'lettura':>10} {'confronto':>10} {'MB':>8}   ({args.rows:,} righe)")
+    for nome, scrittura, lettura, confronto, dimensione in risultati:
+        confronto = f"{confronto:9.2f}s" if confronto is not None else f"{'-':>10}"
+        print(f"{nome:<8} {scrittura:9.2f}s {lettura:9.2f}s {confronto} {dimensione / 1024 / 1024:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Confronta in MB/s la crittografia a blocchi di `streamcrypto`, al variare del numero
+di worker della pipeline, con il vecchio formato a token Fernet unico (file letto e
+cifrato tutto in memoria). Per la pipeline stampa anche i tempi di ogni fase.
+
+Uso:
+    python -m benchmarks.bench_crypto --size-mb 256 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+from perf import peak_rss_mb
+from streamcrypto import CHUNK_SIZE, decrypt_file, encrypt_file, format_stats
+
+
+def _fernet_encrypt(path, encrypted_path, key):
+    """
+    Vecchio percorso di `crypto_db()` / `crypto_excel()`: un'unica chiamata a `Fernet.encrypt`.
+    """
+    with open(path, "rb") as file:
+        encrypted = Fernet(key).encrypt(file.read())
+    with open(encrypted_path, "wb") as file:
+        file.write(encrypted)
+
+
+def _fernet_decrypt(encrypted_path, path, key):
+    """
+    Vecchio percorso di `decrypto_db()` / `decrypto_excel()`.
+    """
+    with open(encrypted_path, "rb") as file:
+        decrypted = Fernet(key).decrypt(file.read())
+    with open(path, "wb") as file:
+        file.write(decrypted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crittografia file")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--chunk-kb", type=int, default=CHUNK_SIZE // 1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--skip-fernet", action="store_true", help="non misura il vecchio formato Fernet")
+    args = parser.parse_args()
+
+    key = Fernet.generate_key()
+    mb = args.size_mb
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "persone.db")
+        with open(plain, "wb") as file:
+            for _ in range(mb):
+                file.write(os.urandom(1024 * 1024))
+        enc, out = plain + ".enc", plain + ".out"
+
+        for workers in args.workers:
+            for nome, funzione in (
+                    ("encrypt", lambda: encrypt_file(plain, enc, key, args.chunk_kb * 1024, workers=workers)),
+                    ("decrypt", lambda: decrypt_file(enc, out, key, workers=workers))):
+                stats = funzione()
+                print(f"stream {nome} x{workers:<3}: {mb:>6} MB in {stats['secondi']:7.2f}s -> {format_stats(stats)}")
+
+        if not args.skip_fernet:
+            for nome, funzione in (("fernet encrypt", lambda: _fernet_encrypt(plain, enc, key)),
+                                   ("fernet decrypt", lambda: _fernet_decrypt(enc, out, key))):
+                start = time.perf_counter()
+                funzione()
+                secondi = time.perf_counter() - start
+                print(f"{nome:<18}: {mb:>6} MB in {secondi:7.2f}s -> {mb / secondi:.1f} MB/s")
+        print(f"picco RSS processo: {peak_rss_mb() or 0:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Confronta i backend di lettura di `ExcelWriter.iter_excel_rows()` con il percorso
+originale `pd.read_excel(dtype=str)` + `df.iterrows()` su file di dimensioni diverse,
+e la rilettura dello stesso file dalla cache in memoria e dal file di cache su disco
+(vedi `cache.WorkbookCache`). I file di prova vengono generati una volta con `write_to_excel_streaming()`.
+
+Uso:
+    python -m benchmarks.bench_excel_read --rows 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from cache import workbook_cache
+from excel import ExcelWriter
+from generator import DataGenerator
+
+
+def _iterrows(filename):
+    """
+    Percorso di lettura originale di `read_from_excel()`: DataFrame + iterrows.
+    """
+    df = pd.read_excel(filename, dtype=str)
+    return sum(1 for _ in df.iterrows())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lettura Excel")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["calamine", "openpyxl", "pandas"])
+    parser.add_argument("--skip-iterrows", action="store_true", help="non misura pd.read_excel + iterrows")
+    args = parser.parse_args()
+
+    generator = DataGenerator()
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            writer = ExcelWriter(os.path.join(tmp, f"persone_{rows}.xlsx"), cache=False)
+            writer.write_to_excel_streaming(generator.generate_parallel(rows, seed=args.seed, workers=1))
+            cached = ExcelWriter(writer.filename, sidecar=True)
+
+            def da_cache(svuota):
+                if svuota:
+                    workbook_cache.clear()
+                return sum(len(c) for c in cached.iter_excel_rows())
+
+            misure = [(backend, lambda b=backend: sum(len(c) for c in writer.iter_excel_rows(b)))
+                      for backend in args.backends]
+            if not args.skip_iterrows:
+                misure.append(("read_excel+iterrows", lambda: _iterrows(writer.filename)))
+            misure += [("cache: prima lettura", lambda: da_cache(False)),
+                       ("cache: memoria", lambda: da_cache(False)),
+                       ("cache: sidecar", lambda: da_cache(True))]
+
+            for nome, funzione in misure:
+                try:
+                    start = time.perf_counter()
+                    letti = funzione()
+                    secondi = time.perf_counter() - start
+                except ImportError as e:
+                    print(f"{rows:>10,} righe | {nome:<20} | non disponibile ({e})")
+                    continue
+                print(f"{rows:>10,} righe | {nome:<20} | {secondi:8.2f}s -> {letti / secondi:>10,.0f} righe/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Confronta `ExcelWriter.write_to_excel()` (workbook in memoria) con
+`ExcelWriter.write_to_excel_streaming()` (workbook write-only) in righe al secondo e picco RSS.
+Ogni modalità gira in un processo separato, così il picco RSS misurato è solo il suo.
+
+Uso:
+    python -m benchmarks.bench_excel_write --rows 300000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _esegui(modalita, rows, seed, filename):
+    """
+    Esegue una singola esportazione (chiamata nel processo figlio) e stampa le statistiche.
+    """
+    from excel import ExcelWriter
+    from generator import DataGenerator
+    from perf import peak_rss_mb
+
+    generator = DataGenerator()
+    shards = generator.generate_parallel(rows, seed=seed, workers=1, shard_size=50_000)
+    writer = ExcelWriter(filename)
+    start = time.perf_counter()
+    if modalita == "streaming":
+        writer.write_to_excel_streaming(shards)
+    else:
+        writer.write_to_excel(shards)
+    secondi = time.perf_counter() - start
+    print(f"RISULTATO {modalita:<10} {rows:>10,} righe in {secondi:8.2f}s -> "
+          f"{rows / secondi:>10,.0f} righe/s, picco RSS {peak_rss_mb() or 0:,.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scrittura Excel")
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=["normale", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _esegui(args.mode, args.rows, args.seed, args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for modalita in ("normale", "streaming"):
+            filename = os.path.join(tmp, f"{modalita}.xlsx")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_excel_write", "--rows", str(args.rows),
+                 "--seed", str(args.seed), "--mode", modalita, "--file", filename],
+                capture_output=True, text=True, check=True).stdout
+            print(next(line for line in output.splitlines() if line.startswith("RISULTATO"))[10:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Confronta la tabella `persone` in chiaro con `persone_cifrate` (crittografia per campo):
+- importazione con `SQLiteWriter.bulk_insert()`, senza e con `encrypt_fields=True`;
+- ricerca di un'email esatta con `query_persone()` e con `query_persone_cifrate()` (indice cieco).
+
+Uso:
+    python -m benchmarks.bench_field_crypto --rows 200000 --lookups 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from database import SQLiteWriter
+from generator import DataGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crittografia per campo")
+    parser.add_argument("--rows", type=int, default=200_000, help="righe importate")
+    parser.add_argument("--lookups", type=int, default=1000, help="ricerche per email")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    dati = DataGenerator().generate_bulk(args.rows, seed=args.seed)
+    email = random.Random(args.seed).choices(dati["email"].tolist(), k=args.lookups)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = SQLiteWriter(os.path.join(tmp, "persone.db"), field_key=os.path.join(tmp, "campi.key"))
+        import_stats = {}
+        for nome, cifrato in (("in chiaro", False), ("cifrato", True)):
+            stats = writer.bulk_insert(dati, encrypt_fields=cifrato)
+            import_stats[nome] = stats
+            print(f"import {nome:<10}: {stats['righe']:>10,} righe in {stats['secondi']:6.2f}s -> "
+                  f"{stats['righe_al_secondo']:>10,.0f} righe/s")
+        rapporto = import_stats["in chiaro"]["righe_al_secondo"] / import_stats["cifrato"]["righe_al_secondo"]
+        print(f"costo della crittografia per campo in importazione: {rapporto:.1f}x")
+
+        for nome, cerca in (("in chiaro", lambda e: writer.query_persone(email=e, limit=1)[0]),
+                            ("cifrato", lambda e: writer.query_persone_cifrate(email=e, limit=1))):
+            start = time.perf_counter()
+            trovate = sum(len(cerca(e)) for e in email)
+            secondi = time.perf_counter() - start
+            print(f"ricerca {nome:<9}: {args.lookups:>10,} email in {secondi:6.2f}s -> "
+                  f"{secondi / args.lookups * 1e6:8.1f} µs/ricerca ({trovate} trovate)")
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
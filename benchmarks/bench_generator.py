@@ -0,0 +1,56 @@
+"""
+Confronta le righe al secondo di `DataGenerator.generate_data()` (ciclo Faker per persona)
+con la modalità vettoriale `DataGenerator.generate_bulk()` e, opzionalmente, con la
+generazione parallela `DataGenerator.generate_parallel()` al variare del numero di worker.
+
+Uso:
+    python -m benchmarks.bench_generator --loop 5000 --bulk 1000000 --seed 42
+    python -m benchmarks.bench_generator --parallel 10000000 --workers 1 2 4 8
+"""
+import argparse
+import time
+
+from generator import DataGenerator
+
+
+def _misura(funzione):
+    """
+    Esegue `funzione` e restituisce il risultato e i secondi impiegati.
+    """
+    start = time.perf_counter()
+    risultato = funzione()
+    return risultato, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generazione persone")
+    parser.add_argument("--loop", type=int, default=5000, help="persone generate con generate_data()")
+    parser.add_argument("--bulk", type=int, default=1_000_000, help="persone generate con generate_bulk()")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--parallel", type=int, default=0, help="persone generate con generate_parallel()")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    generator = DataGenerator(count=args.loop)
+    generator.fake.seed_instance(args.seed)
+    _, loop_sec = _misura(generator.generate_data)
+    loop_rps = args.loop / loop_sec
+    print(f"generate_data  : {args.loop:>10,} righe in {loop_sec:8.3f}s -> {loop_rps:>12,.0f} righe/s")
+
+    # Il primo giro include il campionamento dei pool, il secondo li riusa
+    _, pool_sec = _misura(lambda: generator.generate_bulk(count=1, seed=args.seed))
+    _, bulk_sec = _misura(lambda: generator.generate_bulk(count=args.bulk, seed=args.seed))
+    bulk_rps = args.bulk / bulk_sec
+    print(f"pool Faker     : {pool_sec:8.3f}s (una tantum)")
+    print(f"generate_bulk  : {args.bulk:>10,} righe in {bulk_sec:8.3f}s -> {bulk_rps:>12,.0f} righe/s")
+    print(f"speedup        : {bulk_rps / loop_rps:,.1f}x")
+
+    if args.parallel:
+        for workers in args.workers:
+            _, sec = _misura(lambda: sum(len(shard["nome"]) for shard in
+                                         generator.generate_parallel(args.parallel, seed=args.seed, workers=workers)))
+            print(f"parallel x{workers:<4} : {args.parallel:>10,} righe in {sec:8.3f}s -> {args.parallel / sec:>12,.0f} righe/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Misura le ricerche di tutte le persone di una provincia o di un CAP nella tabella `persone`:
+- con le colonne dell'indirizzo strutturato e i relativi indici (`iter_persone()`);
+- con la ricerca sulla stringa Indirizzo, come era necessario prima (scansione di tutte le righe);
+e i conteggi per provincia/città letti da `persone_conteggi` (`query_conteggi()`) rispetto
+a un GROUP BY su tutta la tabella. Misura infine il costo dei trigger dei conteggi sugli inserimenti.
+
+Uso:
+    python -m benchmarks.bench_geo_query --rows 1000000 --lookups 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database import SQLiteWriter, _crea_conteggi, _sospendi_conteggi
+from generator import DataGenerator
+
+
+def _misura(funzione, ripetizioni):
+    start = time.perf_counter()
+    for i in range(ripetizioni):
+        funzione(i)
+    return (time.perf_counter() - start) / ripetizioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ricerche per provincia / CAP e conteggi")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200, help="ricerche per ciascun tipo")
+    parser.add_argument("--inserts", type=int, default=50_000, help="righe inserite con write_to_db()")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = DataGenerator()
+    dati = generator.generate_bulk(args.rows, seed=args.seed)
+    rng = random.Random(args.seed)
+    province = rng.choices(dati["provincia"].tolist(), k=args.lookups)
+    cap = rng.choices(dati["cap"].tolist(), k=args.lookups)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "persone.db")
+        writer = SQLiteWriter(db_name)
+        stats = writer.bulk_insert(dati)
+        print(f"bulk_insert: {stats['righe']:,} righe in {stats['secondi']:.2f}s "
+              f"(indici e conteggi {stats['secondi_indici']:.2f}s)")
+        del dati
+
+        conn = sqlite3.connect(db_name)
+        prove = [
+            ("provincia, indice", lambda i: list(writer.iter_persone(provincia=province[i]))),
+            ("provincia, stringa", lambda i: conn.execute(
+                "SELECT * FROM persone WHERE Indirizzo LIKE ? ORDER BY id", ("% " + province[i],)).fetchall()),
+            ("CAP, indice", lambda i: list(writer.iter_persone(cap=cap[i]))),
+            ("CAP, stringa", lambda i: conn.execute(
+                "SELECT * FROM persone WHERE substr(Indirizzo, instr(Indirizzo, ', ') + 2, 5) = ? ORDER BY id",
+                (cap[i],)).fetchall()),
+            ("conteggi provincia", lambda i: writer.query_conteggi()),
+            ("conteggi città", lambda i: writer.query_conteggi(province[i], per_citta=True)),
+            ("GROUP BY provincia", lambda i: conn.execute(
+                "SELECT Provincia, COUNT(*) FROM persone GROUP BY Provincia").fetchall()),
+        ]
+        print(f"\n{'ricerca':<20} {'ms/ricerca':>11}   ({args.rows:,} righe)")
+        for nome, funzione in prove:
+            # Le scansioni complete sono lente: bastano poche ripetizioni
+            ripetizioni = args.lookups if "indice" in nome or "conteggi" in nome else max(1, args.lookups // 20)
+            print(f"{nome:<20} {_misura(funzione, ripetizioni) * 1000:11.3f}")
+
+        # Costo dei trigger di `persone_conteggi` sugli inserimenti con write_to_db()
+        nuove = generator.generate_bulk(args.inserts, seed=args.seed + 1)
+        velocita = {}
+        for conteggi in (False, True):
+            if not conteggi:
+                _sospendi_conteggi(conn)
+                conn.commit()
+            start = time.perf_counter()
+            writer.write_to_db(nuove)
+            velocita[conteggi] = args.inserts / (time.perf_counter() - start)
+            if not conteggi:
+                _crea_conteggi(conn)
+                conn.commit()
+        conn.close()
+        print(f"write_to_db senza conteggi: {velocita[False]:>10,.0f} righe/s")
+        print(f"write_to_db con conteggi  : {velocita[True]:>10,.0f} righe/s")
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
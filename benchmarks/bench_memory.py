@@ -0,0 +1,66 @@
+"""
+Confronta la memoria occupata da N persone nelle diverse rappresentazioni:
+- lista di dizionari (formato di `DataGenerator.generate_data()`);
+- lista di record `person.Person`;
+- `person.PersonBatch` colonnare.
+
+Ogni rappresentazione viene costruita dagli stessi dati di `DataGenerator.generate_bulk()`
+creando stringhe nuove, come farebbero Faker o la lettura di un file Excel; la memoria è
+quella che resta allocata al termine della costruzione, misurata con `tracemalloc`.
+
+Uso:
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from generator import DataGenerator
+from person import Person, PersonBatch
+
+
+def _misura(costruisci):
+    """
+    Costruisce la struttura e restituisce (byte rimasti allocati, picco in byte, secondi).
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    struttura = costruisci()
+    secondi = time.perf_counter() - start
+    allocati, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del struttura
+    return allocati, picco, secondi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memoria dict / Person / PersonBatch")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    colonne = DataGenerator().generate_bulk(args.rows, seed=args.seed)
+
+    def righe():
+        return zip(*(colonne[campo].tolist() for campo in Person._fields))
+
+    rappresentazioni = [
+        ("list[dict]", lambda: [dict(zip(Person._fields, riga)) for riga in righe()]),
+        ("list[Person]", lambda: [Person(*riga) for riga in righe()]),
+        ("PersonBatch", lambda: PersonBatch.from_columns(colonne)),
+    ]
+    print(f"\n{'formato':<14} {'MB':>9} {'byte/persona':>13} {'picco MB':>9} {'costruzione':>12}"
+          f"   ({args.rows:,} persone)")
+    risultati = {}
+    for nome, costruisci in rappresentazioni:
+        allocati, picco, secondi = _misura(costruisci)
+        risultati[nome] = allocati
+        print(f"{nome:<14} {allocati / 1024 / 1024:9.1f} {allocati / args.rows:13.1f} "
+              f"{picco / 1024 / 1024:9.1f} {secondi:11.2f}s")
+    print(f"PersonBatch occupa {risultati['list[dict]'] / risultati['PersonBatch']:.1f}x meno memoria della lista di dizionari")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Prova di carico del servizio HTTP/JSON (`service.py`): misura la latenza delle richieste
+(p50 / p99) con molti client concorrenti, prima con sole letture e poi mentre lo scrittore
+esegue generazione, importazione e confronto di un file Excel, per verificare che il lavoro
+bloccante non fermi le altre richieste.
+
+Il servizio viene avviato in un thread con un proprio ciclo di eventi in una cartella temporanea
+(oppure si usa un servizio già avviato con --url); i client usano connessioni keep-alive.
+
+Uso:
+    python -m benchmarks.bench_service --rows 100000 --clients 32 --requests 3000
+    python -m benchmarks.bench_service --url http://127.0.0.1:8765 --skip-setup
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from service import DataService
+
+# Province e prefissi dei cognomi usati nelle query
+PROVINCE = ("MI", "RM", "TO", "NA", "BO", "FI", "VE", "GE", "BA", "PA")
+PREFISSI = ("Ro", "Bi", "Co", "Fe", "Ma", "Ri", "Es", "Gi")
+
+
+async def _richiesta(reader, writer, metodo, percorso, corpo=None):
+    """
+    Invia una richiesta sulla connessione keep-alive e restituisce (stato, corpo JSON).
+    """
+    dati = json.dumps(corpo).encode() if corpo is not None else b""
+    writer.write((f"{metodo} {percorso} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(dati)}\r\n\r\n").encode() + dati)
+    await writer.drain()
+    stato = int((await reader.readline()).split()[1])
+    lunghezza = 0
+    while True:
+        riga = await reader.readline()
+        if riga in (b"\r\n", b""):
+            break
+        nome, _, valore = riga.decode("latin-1").partition(":")
+        if nome.strip().lower() == "content-length":
+            lunghezza = int(valore)
+    return stato, json.loads(await reader.readexactly(lunghezza)) if lunghezza else None
+
+
+async def _chiama(host, port, metodo, percorso, corpo=None):
+    """
+    Esegue una singola richiesta su una nuova connessione.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return await _richiesta(reader, writer, metodo, percorso, corpo)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def _query_casuale(rng):
+    """
+    Restituisce il percorso di una lettura casuale (pagina per provincia o cognome, conteggi).
+    """
+    scelta = rng.random()
+    if scelta < 0.45:
+        return f"/persone?provincia={rng.choice(PROVINCE)}&limit=50"
+    if scelta < 0.9:
+        return f"/persone?cognome={rng.choice(PREFISSI)}&limit=50"
+    return "/conteggi?per_citta=1" if scelta < 0.95 else "/conteggi"
+
+
+async def _client(host, port, richieste, rng, latenze, stati):
+    """
+    Esegue le richieste assegnate su un'unica connessione keep-alive.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(richieste):
+            start = time.perf_counter()
+            stato, _ = await _richiesta(reader, writer, "GET", _query_casuale(rng))
+            latenze.append(time.perf_counter() - start)
+            stati[stato] = stati.get(stato, 0) + 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _fase(host, port, clients, richieste, seed, scritture=None):
+    """
+    Esegue `richieste` letture divise tra `clients` client concorrenti, facoltativamente mentre
+    viene eseguita la coroutine `scritture`.
+    Returns:
+        tuple[list[float], dict, float, object]: Latenze, conteggio per stato, secondi totali,
+        risultato delle scritture.
+    """
+    latenze, stati = [], {}
+    per_client = [richieste // clients + (i < richieste % clients) for i in range(clients)]
+    start = time.perf_counter()
+    lavori = [_client(host, port, n, random.Random(seed + i), latenze, stati) for i, n in enumerate(per_client)]
+    task_scritture = asyncio.create_task(scritture) if scritture is not None else None
+    await asyncio.gather(*lavori)
+    secondi = time.perf_counter() - start
+    risultato = await task_scritture if task_scritture is not None else None
+    return latenze, stati, secondi, risultato
+
+
+async def _scritture(host, port, righe_file):
+    """
+    Genera un file Excel, lo importa nel database e lo confronta, misurando ogni operazione.
+    """
+    tempi = {}
+    for nome, percorso, corpo in (
+            ("generate", "/generate", {"count": righe_file, "seed": 7, "target": "file", "file": "carico.xlsx"}),
+            ("import", "/import", {"file": "carico.xlsx", "append": True}),
+            ("compare", "/compare", {"file": "carico.xlsx", "key": "email", "max_rows": 0})):
+        start = time.perf_counter()
+        stato, risposta = await _chiama(host, port, "POST", percorso, corpo)
+        tempi[nome] = (stato, time.perf_counter() - start, risposta)
+    return tempi
+
+
+def _percentile(valori, p):
+    """
+    Restituisce il percentile `p` (0-100) dei valori, con il metodo del rango più vicino.
+    """
+    ordinati = sorted(valori)
+    if not ordinati:
+        return 0.0
+    return ordinati[min(len(ordinati) - 1, max(0, round(p / 100 * len(ordinati)) - 1))]
+
+
+def _stampa(fase, latenze, stati, secondi):
+    ms = [latenza * 1000 for latenza in latenze]
+    stati = ", ".join(f"{stato}: {n}" for stato, n in sorted(stati.items()))
+    print(f"{fase:<22} {len(ms):>8} {_percentile(ms, 50):8.2f} {_percentile(ms, 99):8.2f} "
+          f"{max(ms, default=0):8.2f} {len(ms) / secondi:10.0f}   {stati}")
+
+
+async def _esegui(args, host, port):
+    if not args.skip_setup:
+        start = time.perf_counter()
+        stato, risposta = await _chiama(host, port, "POST", "/generate", {"count": args.rows, "seed": args.seed})
+        if stato != 200:
+            raise RuntimeError(f"generazione non riuscita ({stato}): {risposta}")
+        print(f"ℹ️ Database popolato con {args.rows:,} persone in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n{'fase':<22} {'richieste':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'richieste/s':>10}"
+          f"   ({args.clients} client concorrenti)")
+    latenze, stati, secondi, _ = await _fase(host, port, args.clients, args.requests, args.seed)
+    _stampa("solo letture", latenze, stati, secondi)
+    latenze, stati, secondi, tempi = await _fase(host, port, args.clients, args.requests, args.seed,
+                                                 _scritture(host, port, args.file_rows))
+    _stampa("letture + scritture", latenze, stati, secondi)
+    for nome, (stato, secondi, risposta) in tempi.items():
+        esito = "ok" if stato == 200 else f"errore {stato}: {risposta}"
+        print(f"  {nome:<20} {secondi:8.2f}s  {esito}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prova di carico del servizio HTTP/JSON (latenza p50/p99)")
+    parser.add_argument("--url", help="servizio già avviato (default: ne avvia uno in una cartella temporanea)")
+    parser.add_argument("--rows", type=int, default=100_000, help="persone generate nel database")
+    parser.add_argument("--file-rows", type=int, default=20_000, help="persone del file Excel importato")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=3000, help="letture per fase")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-setup", action="store_true", help="non popola il database")
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        asyncio.run(_esegui(args, url.hostname, url.port))
+        return
+
+    with tempfile.TemporaryDirectory() as cartella:
+        # Il servizio gira in un altro thread con il proprio ciclo di eventi, come un processo separato
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        service = DataService(cartella, port=0)
+        asyncio.run_coroutine_threadsafe(service.start(), loop).result()
+        try:
+            asyncio.run(_esegui(args, service.host, service.port))
+        finally:
+            asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            print(f"ℹ️ Statistiche del servizio: {service.stats}")
+
+
+if __name__ == "__main__":
+    main()
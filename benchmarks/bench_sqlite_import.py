@@ -0,0 +1,57 @@
+"""
+Misura l'importazione in `persone.db`:
+- `SQLiteWriter.bulk_insert()` da righe già in memoria (solo inserimento, obiettivo > 500k righe/s);
+- `read_from_excel_and_insert_to_sql()` da file Excel, in modalità massiva e con `DataFrame.to_sql`.
+
+Uso:
+    python -m benchmarks.bench_sqlite_import --rows 1000000 --excel-rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from batching import CAMPI
+from database import SQLiteWriter
+from excel import ExcelWriter
+from generator import DataGenerator
+
+# Righe al secondo attese per la fase di inserimento di bulk_insert()
+OBIETTIVO = 500_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark importazione SQLite")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="righe per bulk_insert() da memoria")
+    parser.add_argument("--excel-rows", type=int, default=100_000, help="righe del file Excel importato")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = DataGenerator()
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = SQLiteWriter(os.path.join(tmp, "persone.db"))
+
+        # Righe già materializzate in tuple, così si misura solo SQLite
+        righe = [riga for shard in generator.generate_parallel(args.rows, seed=args.seed, workers=1)
+                 for riga in zip(*(shard[campo].tolist() for campo in CAMPI))]
+        batches = [righe[i:i + 50_000] for i in range(0, len(righe), 50_000)]
+        stats = writer.bulk_insert(batches, columns=[campo.capitalize() for campo in CAMPI])
+        print(f"bulk_insert (memoria)   : {stats['righe']:>10,} righe in {stats['secondi']:6.2f}s -> "
+              f"{stats['righe_al_secondo']:>10,.0f} righe/s (executemany {stats['righe'] / stats['secondi_inserimento']:,.0f} "
+              f"righe/s, indici {stats['secondi_indici']:.2f}s)")
+        esito = "raggiunto" if stats["righe"] / stats["secondi_inserimento"] > OBIETTIVO else "NON raggiunto"
+        print(f"obiettivo executemany > {OBIETTIVO:,} righe/s: {esito}")
+        del righe, batches
+
+        excel_file = os.path.join(tmp, "persone.xlsx")
+        ExcelWriter(excel_file).write_to_excel_streaming(
+            generator.generate_parallel(args.excel_rows, seed=args.seed, workers=1))
+        for nome, bulk in (("excel -> bulk_insert", True), ("excel -> to_sql", False)):
+            start = time.perf_counter()
+            writer.read_from_excel_and_insert_to_sql(excel_file, bulk=bulk)
+            secondi = time.perf_counter() - start
+            print(f"{nome:<24}: {args.excel_rows:>10,} righe in {secondi:6.2f}s -> {args.excel_rows / secondi:>10,.0f} righe/s")
+
+
+if __name__ == "__main__":
+    main()
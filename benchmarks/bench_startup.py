@@ -0,0 +1,149 @@
+"""
+Misura il tempo di avvio di `main.py`, che conta per le esecuzioni brevi (una voce di menu o una
+pipeline per container):
+- tempo di import di `main` con `python -X importtime`, e i pacchetti che lo occupano di più;
+- tempo fino alla comparsa del menu (time-to-menu), confrontato con l'avvio del solo interprete;
+- dipendenze pesanti (pandas, openpyxl, Faker, cryptography, NumPy, pyarrow) caricate all'avvio,
+  che dovrebbero essere importate solo dalla prima operazione che le usa.
+Esce con codice 1 se la mediana del time-to-menu supera il budget o se all'avvio viene
+caricata una dipendenza pesante.
+
+Prima delle misure i moduli del progetto vengono compilati (`compileall`): con
+PYTHONDONTWRITEBYTECODE i file `.pyc` non verrebbero scritti e ogni avvio ricompilerebbe i sorgenti.
+
+Uso:
+    python -m benchmarks.bench_startup --runs 20 --budget-ms 200
+"""
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Dipendenze che non devono essere importate all'avvio
+PESANTI = ("pandas", "openpyxl", "faker", "cryptography", "numpy", "pyarrow", "python_calamine")
+# Budget predefinito per il time-to-menu, in millisecondi
+BUDGET_MS = 200
+# Riga stampata all'apertura del menu
+MENU = "--- MENU ---"
+# Voce del menu che chiude il programma
+ESCI = "13"
+
+CARTELLA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importtime():
+    """
+    Importa `main` con `-X importtime`.
+    Returns:
+        tuple[float, dict[str, float]]: Millisecondi di import di `main` e millisecondi
+        (tempo proprio) per pacchetto di primo livello.
+    """
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                              cwd=CARTELLA, capture_output=True, text=True, check=True)
+    totale = 0.0
+    pacchetti = {}
+    for riga in processo.stderr.splitlines():
+        if not riga.startswith("import time:") or "self [us]" in riga:
+            continue
+        proprio, cumulativo, modulo = (campo.strip() for campo in riga[len("import time:"):].split("|"))
+        pacchetto = modulo.split(".")[0]
+        pacchetti[pacchetto] = pacchetti.get(pacchetto, 0.0) + int(proprio) / 1000
+        if modulo == "main":
+            totale = int(cumulativo) / 1000
+    return totale, pacchetti
+
+
+def _time_to_menu():
+    """
+    Avvia `main.py` e misura i millisecondi fino alla riga del menu, poi lo chiude con la voce Esci.
+    """
+    start = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, "-u", "main.py"], cwd=CARTELLA, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for riga in processo.stdout:
+            if MENU in riga:
+                secondi = time.perf_counter() - start
+                break
+        else:
+            raise RuntimeError("main.py è terminato senza mostrare il menu")
+        processo.stdin.write(ESCI + "\n")
+        processo.stdin.flush()
+        processo.communicate(timeout=10)
+    finally:
+        if processo.poll() is None:
+            processo.kill()
+            processo.wait()
+    return secondi * 1000
+
+
+def _interprete():
+    """
+    Millisecondi di avvio del solo interprete (riferimento per il time-to-menu).
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _moduli_pesanti():
+    """
+    Restituisce le dipendenze pesanti già caricate dopo `import main`.
+    """
+    codice = f"import main, sys; print(','.join(m for m in {PESANTI!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", codice], cwd=CARTELLA, capture_output=True,
+                            text=True, check=True).stdout.strip()
+    return [modulo for modulo in output.split(",") if modulo]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tempo di avvio di main.py (-X importtime)")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="budget per il time-to-menu (mediana)")
+    parser.add_argument("--top", type=int, default=10, help="pacchetti più lenti da mostrare")
+    parser.add_argument("--no-compile", action="store_true", help="non compila i moduli prima delle misure")
+    args = parser.parse_args()
+
+    if not args.no_compile:
+        compileall.compile_dir(CARTELLA, quiet=1)
+
+    import_main, per_pacchetto, menu, interprete = [], {}, [], []
+    for _ in range(args.runs):
+        totale, pacchetti = _importtime()
+        import_main.append(totale)
+        for pacchetto, ms in pacchetti.items():
+            per_pacchetto.setdefault(pacchetto, []).append(ms)
+        menu.append(_time_to_menu())
+        interprete.append(_interprete())
+
+    print(f"\n{'misura':<28} {'mediana ms':>11} {'min ms':>8} {'max ms':>8}   ({args.runs} esecuzioni)")
+    for nome, valori in (("import main", import_main), ("avvio interprete", interprete), ("time-to-menu", menu)):
+        print(f"{nome:<28} {statistics.median(valori):11.1f} {min(valori):8.1f} {max(valori):8.1f}")
+
+    print("\nPacchetti con più tempo di import (tempo proprio, mediana):")
+    mediane = sorted(((statistics.median(valori), pacchetto) for pacchetto, valori in per_pacchetto.items()),
+                     reverse=True)
+    for ms, pacchetto in mediane[:args.top]:
+        print(f"  {pacchetto:<26} {ms:8.1f} ms")
+
+    ok = True
+    pesanti = _moduli_pesanti()
+    if pesanti:
+        ok = False
+        print(f"\n❌ Dipendenze pesanti importate all'avvio: {', '.join(pesanti)}")
+    else:
+        print("\n✅ Nessuna dipendenza pesante importata all'avvio")
+    mediana = statistics.median(menu)
+    if mediana > args.budget_ms:
+        ok = False
+        print(f"❌ Time-to-menu {mediana:.1f} ms oltre il budget di {args.budget_ms:g} ms")
+    else:
+        print(f"✅ Time-to-menu {mediana:.1f} ms entro il budget di {args.budget_ms:g} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Suite riproducibile delle operazioni principali, per accorgersi delle regressioni quando
+cambiano il codice o le dipendenze (pandas, openpyxl, Faker, cryptography, ...):
+- `DataGenerator.generate_data()` e `generate_bulk()`;
+- `ExcelWriter.write_to_excel()`, `write_to_excel_streaming()`, `read_from_excel()`, `compare_excel_with_sql()`;
+- `SQLiteWriter.read_from_excel_and_insert_to_sql()` e `read_from_db()`;
+- `crypto_excel()` / `decrypto_excel()` e `crypto_db()` / `decrypto_db()`.
+
+Per ogni dimensione i file di prova (persone.xlsx e persone.db) vengono generati una volta con un
+seme fisso; ogni misura gira in un processo separato, così il picco RSS è solo quello
+dell'operazione (dati di input compresi) e nessuna cache resta calda tra una ripetizione e l'altra.
+I risultati (mediana delle ripetizioni: secondi, righe/s, MB/s, picco RSS) vengono salvati in JSON
+insieme alle versioni di Python e delle dipendenze; `--compare` confronta due file di risultati e
+segnala le operazioni più lente (o con più memoria) oltre la soglia, uscendo con codice 1.
+
+`write_to_excel()` tiene in memoria l'intero workbook: oltre `--max-workbook-rows` righe viene saltata.
+
+Uso:
+    python -m benchmarks.bench_suite --rows 1000 100000 1000000 --output risultati.json
+    python -m benchmarks.bench_suite --rows 1000 --operations generate_bulk read_from_excel
+    python -m benchmarks.bench_suite --compare base.json risultati.json --threshold 10
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Versione del formato del file dei risultati
+VERSIONE = 1
+# Dipendenze di cui registrare la versione
+DIPENDENZE = ("pandas", "openpyxl", "numpy", "Faker", "cryptography", "python-calamine", "pyarrow")
+# Soglia di regressione predefinita, in percentuale
+SOGLIA = 10.0
+# Sotto questa durata le differenze di tempo sono rumore e non vengono segnalate
+MIN_SECONDI = 0.05
+# File di prova nella cartella di lavoro
+EXCEL = "persone.xlsx"
+DB = "persone.db"
+CHIAVE_EXCEL = "key.key"
+CHIAVE_DB = "psw.key"
+
+
+def _dati(rows, seed):
+    from generator import DataGenerator
+
+    return DataGenerator().generate_bulk(rows, seed=seed, as_batch=True)
+
+
+def _prepara(rows, seed):
+    """
+    Genera i file di prova (non misurato).
+    """
+    from database import SQLiteWriter
+    from excel import ExcelWriter
+
+    dati = _dati(rows, seed)
+    ExcelWriter(EXCEL).write_to_excel_streaming(dati)
+    writer = SQLiteWriter(DB)
+    writer.bulk_insert(dati)
+    writer.close()
+
+
+def _cifrato(path, cifra):
+    """
+    Crea il file `.enc` se manca, così le decrittografie si possono misurare anche da sole.
+    """
+    if not os.path.exists(path + ".enc"):
+        cifra()
+
+
+# Operazioni: nome → funzione(rows, seed) che restituisce (preparazione, misura); la misura
+# restituisce i byte elaborati. La preparazione non viene cronometrata.
+def _op_generate_data(rows, seed):
+    from generator import DataGenerator
+
+    generator = DataGenerator(rows)
+    generator.fake.seed_instance(seed)
+    return None, lambda: generator.generate_data() and 0
+
+
+def _op_generate_bulk(rows, seed):
+    from generator import DataGenerator
+
+    return None, lambda: DataGenerator().generate_bulk(rows, seed=seed) and 0
+
+
+def _op_write_to_excel(rows, seed):
+    from excel import ExcelWriter
+
+    dati = _dati(rows, seed)
+    writer = ExcelWriter("scrittura.xlsx")
+    return None, lambda: writer.write_to_excel(dati) or os.path.getsize(writer.filename)
+
+
+def _op_write_to_excel_streaming(rows, seed):
+    from excel import ExcelWriter
+
+    dati = _dati(rows, seed)
+    return None, lambda: ExcelWriter("scrittura.xlsx").write_to_excel_streaming(dati)["byte"]
+
+
+def _op_read_from_excel(rows, seed):
+    from excel import ExcelWriter
+
+    return None, lambda: ExcelWriter(EXCEL).read_from_excel() or os.path.getsize(EXCEL)
+
+
+def _op_compare_excel_with_sql(rows, seed):
+    from excel import ExcelWriter
+
+    def misura():
+        if ExcelWriter(EXCEL).compare_excel_with_sql(DB, max_rows=0) is None:
+            raise RuntimeError("confronto non riuscito")
+        return os.path.getsize(EXCEL)
+    return None, misura
+
+
+def _op_read_from_excel_and_insert_to_sql(rows, seed):
+    from database import SQLiteWriter
+
+    def misura():
+        writer = SQLiteWriter("importazione.db")
+        writer.read_from_excel_and_insert_to_sql(EXCEL)
+        writer.close()
+        return os.path.getsize(EXCEL)
+    return None, misura
+
+
+def _op_read_from_db(rows, seed):
+    from database import SQLiteWriter
+
+    return None, lambda: SQLiteWriter(DB).read_from_db() or os.path.getsize(DB)
+
+
+def _op_crypto_excel(rows, seed):
+    from excel import ExcelWriter
+
+    return None, lambda: _byte(ExcelWriter(EXCEL).crypto_excel(CHIAVE_EXCEL, remove_original=False))
+
+
+def _op_decrypto_excel(rows, seed):
+    from excel import ExcelWriter
+
+    writer = ExcelWriter(EXCEL)
+    prepara = lambda: _cifrato(EXCEL, lambda: writer.crypto_excel(CHIAVE_EXCEL, remove_original=False))
+    return prepara, lambda: _byte(writer.decrypto_excel(CHIAVE_EXCEL, remove_encrypted=False))
+
+
+def _op_crypto_db(rows, seed):
+    from database import SQLiteWriter
+
+    return None, lambda: _byte(SQLiteWriter(DB).crypto_db(CHIAVE_DB, remove_original=False))
+
+
+def _op_decrypto_db(rows, seed):
+    from database import SQLiteWriter
+
+    writer = SQLiteWriter(DB)
+    prepara = lambda: _cifrato(DB, lambda: writer.crypto_db(CHIAVE_DB, remove_original=False))
+    return prepara, lambda: _byte(writer.decrypto_db(CHIAVE_DB, remove_encrypted=False))
+
+
+def _byte(stats):
+    if stats is None:
+        raise RuntimeError("operazione non riuscita")
+    return stats["byte"]
+
+
+OPERAZIONI = {
+    "generate_data": _op_generate_data,
+    "generate_bulk": _op_generate_bulk,
+    "write_to_excel": _op_write_to_excel,
+    "write_to_excel_streaming": _op_write_to_excel_streaming,
+    "read_from_excel": _op_read_from_excel,
+    "read_from_excel_and_insert_to_sql": _op_read_from_excel_and_insert_to_sql,
+    "read_from_db": _op_read_from_db,
+    "compare_excel_with_sql": _op_compare_excel_with_sql,
+    "crypto_excel": _op_crypto_excel,
+    "decrypto_excel": _op_decrypto_excel,
+    "crypto_db": _op_crypto_db,
+    "decrypto_db": _op_decrypto_db,
+}
+
+
+def _esegui(operazione, rows, seed):
+    """
+    Esegue una singola misura (nel processo figlio) e stampa il risultato in JSON.
+    L'output delle operazioni (es. le righe stampate da `read_from_excel()`) viene scartato.
+    """
+    from perf import peak_rss_mb
+
+    with open(os.devnull, "w") as nulla, contextlib.redirect_stdout(nulla):
+        if operazione == "prepara":
+            _prepara(rows, seed)
+            byte = 0
+            secondi = 0.0
+        else:
+            prepara, misura = OPERAZIONI[operazione](rows, seed)
+            if prepara is not None:
+                prepara()
+            start = time.perf_counter()
+            byte = misura()
+            secondi = time.perf_counter() - start
+    print("RISULTATO " + json.dumps({"secondi": secondi, "byte": byte, "picco_rss_mb": peak_rss_mb()}))
+
+
+def _figlio(operazione, rows, seed, cartella):
+    """
+    Esegue una misura in un processo separato nella cartella di lavoro.
+    Returns:
+        dict: 'secondi', 'byte', 'picco_rss_mb', oppure 'errore'.
+    """
+    processo = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", "--op", operazione, "--rows", str(rows),
+         "--seed", str(seed)],
+        cwd=cartella, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))})
+    for riga in processo.stdout.splitlines():
+        if riga.startswith("RISULTATO "):
+            return json.loads(riga[len("RISULTATO "):])
+    errore = (processo.stderr.strip().splitlines() or [f"codice di uscita {processo.returncode}"])[-1]
+    return {"errore": errore}
+
+
+def _ambiente():
+    """
+    Versioni di Python, del sistema e delle dipendenze, e commit git corrente (se disponibile).
+    """
+    from importlib import metadata
+
+    versioni = {}
+    for dipendenza in DIPENDENZE:
+        try:
+            versioni[dipendenza] = metadata.version(dipendenza)
+        except metadata.PackageNotFoundError:
+            versioni[dipendenza] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "sistema": platform.platform(),
+            "cpu": os.cpu_count(), "commit": commit, "dipendenze": versioni}
+
+
+def _aggrega(operazione, rows, misure):
+    """
+    Riassume le ripetizioni di una misura: mediana dei secondi e picco RSS massimo.
+    """
+    secondi = statistics.median(misura["secondi"] for misura in misure)
+    byte = misure[0]["byte"] or 0
+    rss = [misura["picco_rss_mb"] for misura in misure if misura["picco_rss_mb"] is not None]
+    return {
+        "operazione": operazione,
+        "righe": rows,
+        "ripetizioni": len(misure),
+        "secondi": secondi,
+        "secondi_min": min(misura["secondi"] for misura in misure),
+        "righe_al_secondo": rows / secondi if secondi else 0.0,
+        "byte": byte,
+        "mb_al_secondo": byte / 1024 / 1024 / secondi if secondi and byte else None,
+        "picco_rss_mb": max(rss) if rss else None,
+    }
+
+
+def _stampa(risultato):
+    if "saltata" in risultato or "errore" in risultato:
+        motivo = risultato.get("saltata") or f"❌ {risultato['errore']}"
+        print(f"{risultato['operazione']:<36} {risultato['righe']:>10,}   {motivo}")
+        return
+    mb = f"{risultato['mb_al_secondo']:8.1f}" if risultato["mb_al_secondo"] is not None else f"{'-':>8}"
+    rss = f"{risultato['picco_rss_mb']:9.0f}" if risultato["picco_rss_mb"] is not None else f"{'-':>9}"
+    print(f"{risultato['operazione']:<36} {risultato['righe']:>10,} {risultato['secondi']:9.3f} "
+          f"{risultato['righe_al_secondo']:12,.0f} {mb} {rss}")
+
+
+def run(args):
+    """
+    Esegue la suite e salva i risultati in `args.output`.
+    """
+    operazioni = args.operations or list(OPERAZIONI)
+    risultati = {"versione": VERSIONE, "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "seed": args.seed, "ripetizioni": args.repeat, "ambiente": _ambiente(), "risultati": []}
+    print(f"\n{'operazione':<36} {'righe':>10} {'secondi':>9} {'righe/s':>12} {'MB/s':>8} {'RSS MB':>9}")
+    with tempfile.TemporaryDirectory() as temporanea:
+        for rows in args.rows:
+            cartella = os.path.join(temporanea, str(rows))
+            os.makedirs(cartella)
+            preparazione = _figlio("prepara", rows, args.seed, cartella)
+            if "errore" in preparazione:
+                raise RuntimeError(f"preparazione dei file da {rows} righe non riuscita: {preparazione['errore']}")
+            for operazione in operazioni:
+                if operazione == "write_to_excel" and rows > args.max_workbook_rows:
+                    risultato = {"operazione": operazione, "righe": rows,
+                                 "saltata": f"oltre --max-workbook-rows ({args.max_workbook_rows:,})"}
+                else:
+                    misure = [_figlio(operazione, rows, args.seed, cartella) for _ in range(args.repeat)]
+                    errori = [misura["errore"] for misura in misure if "errore" in misura]
+                    if errori:
+                        risultato = {"operazione": operazione, "righe": rows, "errore": errori[0]}
+                    else:
+                        risultato = _aggrega(operazione, rows, misure)
+                _stampa(risultato)
+                risultati["risultati"].append(risultato)
+                # Salvataggio a ogni misura: una suite interrotta conserva i risultati parziali
+                with open(args.output, "w", encoding="utf-8") as file:
+                    json.dump(risultati, file, indent=2, ensure_ascii=False)
+    print(f"\nℹ️ Risultati salvati in {args.output}")
+
+
+def compare(base, nuovo, soglia=SOGLIA, min_secondi=MIN_SECONDI):
+    """
+    Confronta due file di risultati e stampa le differenze per operazione e dimensione.
+    Args:
+        base (str): Risultati di riferimento.
+        nuovo (str): Risultati da verificare.
+        soglia (float): Percentuale oltre cui un peggioramento di tempo o picco RSS è una regressione.
+        min_secondi (float): Le differenze di tempo sotto questa durata non sono segnalate.
+    Returns:
+        list[str]: Le regressioni trovate.
+    """
+    with open(base, encoding="utf-8") as file:
+        base = json.load(file)
+    with open(nuovo, encoding="utf-8") as file:
+        nuovo = json.load(file)
+
+    dipendenze_base = base.get("ambiente", {}).get("dipendenze", {})
+    for nome, versione in nuovo.get("ambiente", {}).get("dipendenze", {}).items():
+        if dipendenze_base.get(nome) != versione:
+            print(f"ℹ️ {nome}: {dipendenze_base.get(nome)} → {versione}")
+
+    riferimento = {(r["operazione"], r["righe"]): r for r in base["risultati"] if "secondi" in r}
+    regressioni = []
+    print(f"\n{'operazione':<36} {'righe':>10} {'secondi':>19} {'Δ tempo':>9} {'Δ RSS':>8}")
+    for risultato in nuovo["risultati"]:
+        chiave = (risultato["operazione"], risultato["righe"])
+        prima = riferimento.get(chiave)
+        if prima is None or "secondi" not in risultato:
+            continue
+        delta_tempo = (risultato["secondi"] / prima["secondi"] - 1) * 100 if prima["secondi"] else 0.0
+        delta_rss = None
+        if risultato.get("picco_rss_mb") and prima.get("picco_rss_mb"):
+            delta_rss = (risultato["picco_rss_mb"] / prima["picco_rss_mb"] - 1) * 100
+        segnalazioni = []
+        if delta_tempo > soglia and max(risultato["secondi"], prima["secondi"]) >= min_secondi:
+            segnalazioni.append(f"tempo +{delta_tempo:.1f}%")
+        if delta_rss is not None and delta_rss > soglia:
+            segnalazioni.append(f"RSS +{delta_rss:.1f}%")
+        rss = f"{delta_rss:+7.1f}%" if delta_rss is not None else f"{'-':>8}"
+        esito = f"   ⚠️ REGRESSIONE ({', '.join(segnalazioni)})" if segnalazioni else ""
+        print(f"{chiave[0]:<36} {chiave[1]:>10,} {prima['secondi']:8.3f} → {risultato['secondi']:8.3f} "
+              f"{delta_tempo:+8.1f}% {rss}{esito}")
+        if segnalazioni:
+            regressioni.append(f"{chiave[0]} ({chiave[1]:,} righe): {', '.join(segnalazioni)}")
+
+    if regressioni:
+        print(f"\n❌ {len(regressioni)} regressioni oltre la soglia del {soglia:g}%")
+    else:
+        print(f"\n✅ Nessuna regressione oltre la soglia del {soglia:g}%")
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite di benchmark riproducibile con confronto tra risultati")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="ripetizioni per misura (vale la mediana)")
+    parser.add_argument("--operations", nargs="+", choices=list(OPERAZIONI), help="default: tutte")
+    parser.add_argument("--max-workbook-rows", type=int, default=100_000,
+                        help="righe oltre cui write_to_excel (workbook in memoria) viene saltata")
+    parser.add_argument("--output", default="risultati_benchmark.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUOVO"), help="confronta due file di risultati")
+    parser.add_argument("--threshold", type=float, default=SOGLIA, help="soglia di regressione in percentuale")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDI,
+                        help="durata sotto cui le differenze di tempo non vengono segnalate")
+    parser.add_argument("--op", choices=["prepara", *OPERAZIONI], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.op:
+        _esegui(args.op, args.rows[0], args.seed)
+        return
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold, args.min_seconds) else 0)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
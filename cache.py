@@ -0,0 +1,259 @@
+"""
+Cache dei file Excel già letti, condivisa da tutte le istanze di `ExcelWriter`.
+
+Un file viene identificato dalla sua impronta (percorso, dimensione, data di modifica e SHA-256
+del contenuto): finché l'impronta non cambia, intestazione e righe lette la prima volta vengono
+riusate invece di analizzare di nuovo l'XML del workbook. Le righe sono salvate per colonne
+(una lista per colonna), più compatte e veloci da serializzare delle tuple.
+
+La cache in memoria è LRU con un limite di memoria stimato (`MAX_BYTES`). Facoltativamente
+il contenuto viene salvato anche in un file accanto al workbook ("<file>.cache"), così anche
+in una nuova sessione riaprire un file non modificato costa solo la lettura del pickle.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+# Memoria massima stimata occupata dai file in cache
+MAX_BYTES = 256 * 1024 * 1024
+# Estensione del file di cache salvato accanto al workbook
+ESTENSIONE_SIDECAR = ".cache"
+# Versione del formato del file di cache
+_VERSIONE_SIDECAR = 1
+# Valori campionati per stimare la memoria di una colonna
+_CAMPIONE = 1000
+
+
+class CachedWorkbook:
+    """
+    Contenuto di un file Excel letto: intestazione e righe (tutti i fogli) memorizzate per colonne.
+    Attributi:
+        header (list[str]): Intestazione del primo foglio.
+        colonne (list[list]): Una lista di valori per colonna, tutte lunghe `righe`.
+        righe (int): Numero di righe (intestazioni escluse).
+        nbytes (int): Memoria occupata stimata.
+    """
+
+    def __init__(self, header, colonne):
+        self.header = header
+        self.colonne = colonne
+        self.righe = len(colonne[0]) if colonne else 0
+        self.nbytes = _stima_byte(colonne)
+
+    @classmethod
+    def from_rows(cls, header, righe):
+        """
+        Crea la voce dalle righe lette (tuple); le righe più corte vengono completate con None.
+        """
+        larghezza = max((len(riga) for riga in righe), default=len(header))
+        vuote = (None,) * larghezza
+        colonne = [list(colonna) for colonna in zip(*((riga + vuote)[:larghezza] for riga in righe))]
+        return cls(header, colonne or [[] for _ in range(larghezza)])
+
+    def iter_rows(self, chunk_size):
+        """
+        Restituisce le righe a blocchi di tuple, come `ExcelWriter.iter_excel_rows()`.
+        """
+        for inizio in range(0, self.righe, chunk_size):
+            yield list(zip(*(colonna[inizio:inizio + chunk_size] for colonna in self.colonne)))
+
+
+class WorkbookCache:
+    """
+    Cache LRU thread-safe dei workbook letti, indicizzata per impronta del file e backend di lettura.
+    Attributi:
+        max_bytes (int): Memoria massima stimata delle voci in cache.
+        hits (int): Letture servite dalla memoria.
+        disk_hits (int): Letture servite dal file di cache su disco.
+        misses (int): Letture che hanno richiesto di analizzare il workbook.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        """
+        Args:
+            max_bytes (int): Memoria massima stimata. Default: `MAX_BYTES`.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._voci = OrderedDict()
+        self._hash = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path):
+        """
+        Restituisce l'impronta del file. L'hash del contenuto viene ricalcolato solo se
+        dimensione o data di modifica sono cambiate dall'ultima volta.
+        Args:
+            path (str): File da identificare.
+        Returns:
+            tuple: (percorso assoluto, dimensione, mtime in ns, SHA-256).
+        Raises:
+            FileNotFoundError: Se il file non esiste.
+        """
+        stat = os.stat(path)
+        chiave = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        sha256 = self._hash.get(chiave)
+        if sha256 is None:
+            sha256 = _sha256_file(path)
+            with self._lock:
+                # Un solo hash per percorso: quelli di versioni precedenti del file non servono più
+                for vecchia in [k for k in self._hash if k[0] == chiave[0]]:
+                    del self._hash[vecchia]
+                self._hash[chiave] = sha256
+        return chiave + (sha256,)
+
+    def get(self, path, backend, impronta=None, sidecar=False):
+        """
+        Restituisce il contenuto del file se è in cache (in memoria o, con `sidecar`, su disco).
+        Args:
+            path (str): File Excel.
+            backend (str): Backend di lettura con cui è stato letto il file.
+            impronta (tuple, optional): Impronta già calcolata con `fingerprint()`.
+            sidecar (bool): Se True cerca anche il file di cache accanto al workbook.
+        Returns:
+            CachedWorkbook | None: Il contenuto, None se non è in cache.
+        """
+        impronta = impronta or self.fingerprint(path)
+        with self._lock:
+            voce = self._voci.get((impronta, backend))
+            if voce is not None:
+                self._voci.move_to_end((impronta, backend))
+                self.hits += 1
+                return voce
+        if sidecar:
+            voce = _leggi_sidecar(path, impronta, backend)
+            if voce is not None:
+                self.disk_hits += 1
+                self._aggiungi((impronta, backend), voce)
+                return voce
+        self.misses += 1
+        return None
+
+    def put(self, path, backend, impronta, voce, sidecar=False):
+        """
+        Memorizza il contenuto letto di un file.
+        Args:
+            path (str): File Excel.
+            backend (str): Backend di lettura usato.
+            impronta (tuple): Impronta del file calcolata prima della lettura.
+            voce (CachedWorkbook): Contenuto letto.
+            sidecar (bool): Se True salva il contenuto anche nel file di cache su disco.
+        """
+        # Se il file è cambiato durante la lettura il contenuto non corrisponde all'impronta
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != impronta[1:3]:
+            return
+        self._aggiungi((impronta, backend), voce)
+        if sidecar:
+            _scrivi_sidecar(path, impronta, backend, voce)
+
+    def invalidate(self, path):
+        """
+        Elimina dalla cache (in memoria e su disco) tutte le versioni del file.
+        Args:
+            path (str): File Excel modificato o eliminato.
+        """
+        percorso = os.path.abspath(path)
+        with self._lock:
+            for chiave in [k for k in self._voci if k[0][0] == percorso]:
+                self._nbytes -= self._voci.pop(chiave).nbytes
+            for chiave in [k for k in self._hash if k[0] == percorso]:
+                del self._hash[chiave]
+        try:
+            os.remove(path + ESTENSIONE_SIDECAR)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """
+        Svuota la cache in memoria.
+        """
+        with self._lock:
+            self._voci.clear()
+            self._hash.clear()
+            self._nbytes = 0
+
+    def _aggiungi(self, chiave, voce):
+        """
+        Inserisce una voce ed elimina le meno usate finché la memoria stimata supera `max_bytes`.
+        Le voci più grandi del limite non vengono memorizzate.
+        """
+        if voce.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if chiave in self._voci:
+                self._nbytes -= self._voci.pop(chiave).nbytes
+            self._voci[chiave] = voce
+            self._nbytes += voce.nbytes
+            while self._nbytes > self.max_bytes:
+                _, eliminata = self._voci.popitem(last=False)
+                self._nbytes -= eliminata.nbytes
+
+
+def _sha256_file(path, chunk_size=1024 * 1024):
+    """
+    Calcola l'hash SHA-256 di un file leggendolo a blocchi.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for blocco in iter(lambda: file.read(chunk_size), b""):
+            digest.update(blocco)
+    return digest.hexdigest()
+
+
+def _stima_byte(colonne):
+    """
+    Stima la memoria occupata dalle colonne campionando al massimo `_CAMPIONE` valori per colonna.
+    """
+    totale = 0
+    for colonna in colonne:
+        campione = colonna[:_CAMPIONE]
+        if campione:
+            media = sum(sys.getsizeof(valore) for valore in campione) / len(campione)
+            totale += int(media * len(colonna))
+        totale += sys.getsizeof(colonna)
+    return totale
+
+
+def _leggi_sidecar(path, impronta, backend):
+    """
+    Legge il file di cache del workbook se corrisponde a dimensione e hash attuali del file
+    (la data di modifica non viene confrontata, così il file sopravvive a una copia).
+    """
+    try:
+        with open(path + ESTENSIONE_SIDECAR, "rb") as file:
+            salvato = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if (not isinstance(salvato, dict) or salvato.get("versione") != _VERSIONE_SIDECAR
+            or salvato.get("backend") != backend
+            or (salvato.get("dimensione"), salvato.get("sha256")) != (impronta[1], impronta[3])):
+        return None
+    return CachedWorkbook(salvato["header"], salvato["colonne"])
+
+
+def _scrivi_sidecar(path, impronta, backend, voce):
+    """
+    Salva il contenuto del workbook nel file di cache, sostituendolo atomicamente.
+    """
+    sidecar = path + ESTENSIONE_SIDECAR
+    temporaneo = sidecar + ".tmp"
+    try:
+        with open(temporaneo, "wb") as file:
+            pickle.dump({"versione": _VERSIONE_SIDECAR, "backend": backend, "dimensione": impronta[1],
+                         "sha256": impronta[3], "header": voce.header, "colonne": voce.colonne},
+                        file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaneo, sidecar)
+    finally:
+        if os.path.exists(temporaneo):
+            os.remove(temporaneo)
+
+
+# Istanza condivisa da tutti gli ExcelWriter
+workbook_cache = WorkbookCache()
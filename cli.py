@@ -0,0 +1,428 @@
+"""
+Interfaccia a riga di comando non interattiva, usata da `main.py` quando riceve argomenti.
+
+Ogni comando è uno stadio di una pipeline; più stadi si concatenano con "|", tra virgolette
+perché non venga interpretato dalla shell:
+
+    python main.py "generate --count 5000000 | to-sqlite | encrypt --yes"
+    python main.py generate --count 1000 "|" to-excel "|" to-sqlite "|" compare
+
+Le persone passano da uno stadio all'altro a blocchi (liste di tuple ordinate secondo
+`batching.CAMPI`), senza passare da persone.xlsx:
+- gli stadi sorgente (generate, read, from-sqlite) producono i blocchi;
+- gli stadi di scrittura (to-excel, to-sqlite) li scrivono in un thread dedicato e li
+  inoltrano subito allo stadio successivo, così più destinazioni vengono scritte in parallelo;
+- gli stadi sui file (encrypt, decrypt, compare) partono quando gli stadi precedenti hanno finito
+  e, se non si indicano file, lavorano su quelli scritti prima nella pipeline.
+Le domande di conferma vengono sostituite da `--yes` (risposta sì), indicato per un singolo stadio
+o prima del primo per tutti; senza, la risposta è no.
+Al termine di ogni stadio vengono stampati righe elaborate e tempo. Prima del primo stadio si può
+chiedere di salvare le misure di ogni operazione (`--metrics misure.json` o `misure.prom`) e un
+profilo cProfile per operazione (`--profile cartella`), vedi `perf.Metriche`:
+
+    python main.py --metrics misure.prom --trace-memory "generate --count 100000 | to-excel | to-sqlite"
+"""
+import argparse
+import os
+import queue
+import shlex
+import sys
+import threading
+import time
+
+from batching import BATCH_SIZE, iter_row_batches
+from perf import metriche
+
+# Separatore tra gli stadi della pipeline
+SEPARATORE = "|"
+# Blocchi in attesa tra uno stadio e il thread di scrittura (limita la memoria)
+CODA_BLOCCHI = 4
+# Fine del flusso di blocchi verso un thread di scrittura
+_FINE = object()
+# Flusso interrotto da un errore a monte: lo scrittore deve annullare invece di salvare
+_ANNULLA = object()
+
+
+def main(argv=None):
+    """
+    Esegue la pipeline descritta dagli argomenti.
+    Args:
+        argv (list[str], optional): Argomenti (senza il nome del programma). Default: `sys.argv[1:]`.
+    Returns:
+        int: Codice di uscita, 0 se tutti gli stadi sono terminati correttamente.
+    """
+    parser = _crea_parser()
+    try:
+        stadi = [parser.parse_args(segmento) for segmento in _dividi(argv)]
+    except ValueError as e:
+        parser.error(str(e))
+    yes = any(stadio.yes_tutti for stadio in stadi)
+    misure = next((stadio.metrics for stadio in stadi if stadio.metrics), None)
+    profili = next((stadio.profile for stadio in stadi if stadio.profile), None)
+    if misure or profili:
+        metriche.enable(memoria=any(stadio.trace_memory for stadio in stadi), profile_dir=profili)
+    try:
+        return 0 if esegui_pipeline(stadi, yes) else 1
+    except Exception as e:
+        print(f"❌ Pipeline interrotta: {e}")
+        return 1
+    finally:
+        if misure:
+            try:
+                metriche.save(misure)
+                print(f"📊 Misure delle operazioni salvate in {misure}")
+            except Exception as e:
+                print(f"❌ Errore nel salvataggio delle misure in {misure}: {e}")
+        if profili:
+            print(f"📊 Profili cProfile salvati in {profili}")
+
+
+def esegui_pipeline(stadi, yes=False):
+    """
+    Esegue gli stadi in ordine, collegandoli con il flusso di blocchi.
+    Args:
+        stadi (list[argparse.Namespace]): Stadi già analizzati (attributo `comando` e relative opzioni).
+        yes (bool): Risposta alle domande di conferma di tutti gli stadi.
+    Returns:
+        bool: True se tutti gli stadi sono terminati correttamente.
+    Raises:
+        ValueError: Se uno stadio è in una posizione non valida (es. to-sqlite senza sorgente).
+    """
+    contesto = {"yes": yes, "excel": [], "db": [], "ok": True}
+    start = time.perf_counter()
+    flusso = None
+    for numero, args in enumerate(stadi, 1):
+        tipo, funzione = STADI[args.comando]
+        nome = f"[{numero}/{len(stadi)}] {args.comando}"
+        if tipo == "sorgente" and flusso is not None:
+            raise ValueError(f"lo stadio '{args.comando}' deve essere il primo della pipeline")
+        if tipo == "scrittura" and flusso is None:
+            raise ValueError(f"lo stadio '{args.comando}' richiede dati da uno stadio precedente "
+                             f"(es. 'read --file persone.xlsx | {args.comando}')")
+        if tipo == "file":
+            # I file devono essere completi: prima si esauriscono gli stadi precedenti
+            _consuma(flusso)
+            flusso = None
+            inizio = time.perf_counter()
+            if not funzione(args, contesto):
+                contesto["ok"] = False
+            print(f"⏱️ {nome}: {time.perf_counter() - inizio:.2f}s")
+        else:
+            flusso = _cronometra(nome, funzione(args, flusso, contesto))
+    _consuma(flusso)
+    print(f"⏱️ Pipeline completata in {time.perf_counter() - start:.2f}s")
+    return contesto["ok"]
+
+
+def _dividi(argv):
+    """
+    Divide gli argomenti negli stadi separati da "|". Un argomento che contiene la pipeline
+    intera (es. "generate --count 10 | to-sqlite") viene prima diviso come farebbe la shell.
+    """
+    argv = list(argv) if argv is not None else sys.argv[1:]
+    argv = [parte for argomento in argv
+            for parte in (shlex.split(argomento.replace(SEPARATORE, f" {SEPARATORE} "))
+                          if SEPARATORE in argomento and argomento != SEPARATORE else [argomento])]
+    segmenti = [[]]
+    for argomento in argv:
+        if argomento == SEPARATORE:
+            segmenti.append([])
+        else:
+            segmenti[-1].append(argomento)
+    if not all(segmenti):
+        raise ValueError("stadio vuoto nella pipeline")
+    return segmenti
+
+
+def _crea_parser():
+    """
+    Costruisce il parser con un sottocomando per ogni stadio.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Pipeline non interattiva: stadi separati da '|', es. "
+                    "\"generate --count 5000000 | to-sqlite | encrypt --yes\". Senza argomenti avvia il menu.")
+    comuni = argparse.ArgumentParser(add_help=False)
+    comuni.add_argument("-y", "--yes", action="store_true",
+                        help="risponde sì alle domande di conferma (es. eliminare i file originali)")
+    # Stessa opzione prima del primo stadio (dest diverso: il sottocomando sovrascriverebbe il valore)
+    parser.add_argument("-y", "--yes", dest="yes_tutti", action="store_true",
+                        help="risponde sì alle domande di conferma di tutti gli stadi")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="salva le misure di ogni operazione in JSON (o in formato Prometheus se .prom)")
+    parser.add_argument("--profile", metavar="DIR", help="salva un profilo cProfile per operazione nella cartella")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="con --metrics misura anche il picco di memoria allocata (tracemalloc, più lento)")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True, metavar="STADIO")
+
+    stadio = sottocomandi.add_parser("generate", parents=[comuni], help="genera persone casuali")
+    stadio.add_argument("--count", type=int, default=10, help="numero di persone (default: 10)")
+    stadio.add_argument("--seed", type=int, help="seme per risultati riproducibili")
+    stadio.add_argument("--mode", choices=("bulk", "faker"), default="bulk",
+                        help="bulk: vettoriale con NumPy (default); faker: una persona alla volta")
+    stadio.add_argument("--workers", type=int, default=1, help="processi per la modalità bulk (default: 1)")
+    stadio.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="persone per blocco")
+
+    stadio = sottocomandi.add_parser("read", parents=[comuni], help="legge un file Excel, Parquet o Arrow")
+    stadio.add_argument("--file", default="persone.xlsx")
+    stadio.add_argument("--backend", default="auto", help="backend di lettura Excel (default: auto)")
+    stadio.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="persone per blocco")
+
+    stadio = sottocomandi.add_parser("from-sqlite", parents=[comuni], help="legge le persone dal database")
+    stadio.add_argument("--db", default="persone.db")
+    for filtro in ("cognome", "email", "citta", "cap", "provincia"):
+        stadio.add_argument(f"--{filtro}", help=f"filtro su {filtro} (vedi SQLiteWriter.query_persone)")
+    stadio.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="persone per blocco")
+
+    stadio = sottocomandi.add_parser("to-excel", parents=[comuni],
+                                     help="scrive un file Excel (o Parquet/Arrow, dall'estensione)")
+    stadio.add_argument("--file", default="persone.xlsx")
+    stadio.add_argument("--rows-per-sheet", type=int, help="righe massime per foglio")
+
+    stadio = sottocomandi.add_parser("to-sqlite", parents=[comuni], help="importa nel database SQLite")
+    stadio.add_argument("--db", default="persone.db")
+    stadio.add_argument("--append", action="store_true", help="aggiunge invece di sostituire i dati")
+    stadio.add_argument("--encrypt-fields", action="store_true",
+                        help="cifra Indirizzo, Email e Telefono (tabella persone_cifrate)")
+    stadio.add_argument("--field-key", default="campi.key")
+
+    stadio = sottocomandi.add_parser("encrypt", parents=[comuni],
+                                     help="cifra i file scritti dalla pipeline (o quelli indicati)")
+    stadio.add_argument("--excel", help="file Excel da cifrare")
+    stadio.add_argument("--db", help="database da cifrare")
+    stadio.add_argument("--excel-key", default="key.key")
+    stadio.add_argument("--db-key", default="psw.key")
+
+    stadio = sottocomandi.add_parser("decrypt", parents=[comuni], help="decifra i file .enc")
+    stadio.add_argument("--excel", help="file Excel da ripristinare")
+    stadio.add_argument("--db", help="database da ripristinare")
+    stadio.add_argument("--excel-key", default="key.key")
+    stadio.add_argument("--db-key", default="psw.key")
+
+    stadio = sottocomandi.add_parser("compare", parents=[comuni], help="confronta il file Excel con il database")
+    stadio.add_argument("--excel", help="file Excel (o Parquet/Arrow) da confrontare")
+    stadio.add_argument("--db", help="database da confrontare")
+    stadio.add_argument("--key", default="id", help="colonna usata per abbinare le righe (default: id)")
+    stadio.add_argument("--max-rows", type=int, default=20, help="righe stampate per categoria")
+    return parser
+
+
+def _cronometra(nome, flusso):
+    """
+    Inoltra i blocchi di `flusso` contando le righe e stampa il tempo quando lo stadio termina.
+    """
+    start = time.perf_counter()
+    righe = 0
+    for batch in flusso:
+        righe += len(batch)
+        yield batch
+    print(f"⏱️ {nome}: {righe:,} righe in {time.perf_counter() - start:.2f}s")
+
+
+def _consuma(flusso):
+    """
+    Esaurisce il flusso, portando a termine gli stadi che lo producono.
+    """
+    if flusso is not None:
+        for _ in flusso:
+            pass
+
+
+def _inoltra(flusso, scrivi):
+    """
+    Passa i blocchi a `scrivi` (funzione che consuma un iterabile di blocchi) in un thread
+    dedicato e intanto li restituisce allo stadio successivo. La coda tra i due è limitata a
+    `CODA_BLOCCHI` blocchi, così uno scrittore lento rallenta la pipeline invece di accumulare dati.
+    Se il flusso a monte (o uno stadio successivo) fallisce, l'iterabile passato a `scrivi`
+    solleva un errore, così l'importazione viene annullata e il file non viene sostituito.
+    Raises:
+        Exception: L'eventuale errore di `scrivi`, appena rilevato (il flusso a monte viene interrotto).
+    """
+    coda = queue.Queue(maxsize=CODA_BLOCCHI)
+    errore = []
+    # Ultimo elemento letto dalla coda: dice se il segnale di fine è già stato ricevuto
+    ultimo = [None]
+
+    def blocchi():
+        while True:
+            ultimo[0] = coda.get()
+            if ultimo[0] is _FINE:
+                return
+            if ultimo[0] is _ANNULLA:
+                raise RuntimeError("flusso interrotto da un errore in uno stadio della pipeline")
+            yield ultimo[0]
+
+    def lavoro():
+        try:
+            scrivi(blocchi())
+        except BaseException as e:
+            errore.append(e)
+            # Continua a svuotare la coda, altrimenti lo stadio a monte resterebbe bloccato
+            while ultimo[0] is not _FINE and ultimo[0] is not _ANNULLA:
+                ultimo[0] = coda.get()
+
+    thread = threading.Thread(target=lavoro, daemon=True)
+    thread.start()
+    fine = _ANNULLA
+    try:
+        for batch in flusso:
+            if errore:
+                break
+            coda.put(batch)
+            yield batch
+        else:
+            fine = _FINE
+    finally:
+        coda.put(fine)
+        thread.join()
+    if errore:
+        raise errore[0]
+
+
+def _generate(args, flusso, contesto):
+    from generator import DataGenerator
+
+    generator = DataGenerator(count=args.count)
+    if args.mode == "faker":
+        sorgente = generator.iter_batches(args.batch_size, args.count)
+    else:
+        sorgente = generator.generate_parallel(args.count, seed=args.seed, workers=args.workers)
+    return iter_row_batches(sorgente, args.batch_size)
+
+
+def _read(args, flusso, contesto):
+    from database import iter_file_batches
+
+    if not os.path.exists(args.file):
+        raise ValueError(f"il file '{args.file}' non esiste")
+    return iter_file_batches(args.file, args.backend, args.batch_size)
+
+
+def _from_sqlite(args, flusso, contesto):
+    from database import SQLiteWriter
+
+    if not os.path.exists(args.db):
+        raise ValueError(f"il database '{args.db}' non esiste")
+    writer = SQLiteWriter(args.db)
+    try:
+        for blocco in writer.iter_persone(args.cognome, args.email, args.citta, args.cap, args.provincia,
+                                          fetch_size=args.batch_size):
+            # Senza la colonna id, nell'ordine di `CAMPI`
+            yield [riga[1:] for riga in blocco]
+    finally:
+        writer.close()
+
+
+def _to_excel(args, flusso, contesto):
+    from columnar import FORMATI, ColumnarWriter
+    from excel import MAX_RIGHE_FOGLIO, ExcelWriter
+
+    def scrivi(blocchi):
+        if os.path.splitext(args.file)[1].lower() in FORMATI:
+            ColumnarWriter(args.file).write(blocchi)
+        else:
+            ExcelWriter(args.file).write_to_excel_streaming(blocchi, args.rows_per_sheet or MAX_RIGHE_FOGLIO)
+        contesto["excel"].append(args.file)
+
+    return _inoltra(flusso, scrivi)
+
+
+def _to_sqlite(args, flusso, contesto):
+    from database import SQLiteWriter
+
+    def scrivi(blocchi):
+        writer = SQLiteWriter(args.db, field_key=args.field_key)
+        try:
+            writer.bulk_insert(blocchi, replace=not args.append, encrypt_fields=args.encrypt_fields)
+        finally:
+            writer.close()
+        contesto["db"].append(args.db)
+
+    return _inoltra(flusso, scrivi)
+
+
+def _bersagli(args, contesto, predefiniti):
+    """
+    Restituisce i file Excel e database su cui lavorare: quelli indicati, altrimenti quelli
+    scritti dalla pipeline, altrimenti `predefiniti` (elenco di (tipo, file) da usare se esistono).
+    """
+    if args.excel or args.db:
+        return [("excel", args.excel)] * bool(args.excel) + [("db", args.db)] * bool(args.db)
+    scritti = [("excel", f) for f in contesto["excel"]] + [("db", f) for f in contesto["db"]]
+    return scritti or predefiniti
+
+
+def _encrypt(args, contesto):
+    from database import SQLiteWriter
+    from excel import ExcelWriter
+
+    remove = args.yes or contesto["yes"]
+    bersagli = _bersagli(args, contesto, [(tipo, nome) for tipo, nome in
+                                          (("excel", "persone.xlsx"), ("db", "persone.db")) if os.path.exists(nome)])
+    if not bersagli:
+        print("⚠️ Nessun file da crittografare.")
+        return False
+    ok = True
+    for tipo, nome in bersagli:
+        if tipo == "excel":
+            stats = ExcelWriter(nome).crypto_excel(args.excel_key, remove_original=remove)
+        else:
+            writer = SQLiteWriter(nome)
+            stats = writer.crypto_db(args.db_key, remove_original=remove)
+            writer.close()
+        ok = ok and stats is not None
+    return ok
+
+
+def _decrypt(args, contesto):
+    from database import SQLiteWriter
+    from excel import ExcelWriter
+
+    remove = args.yes or contesto["yes"]
+    bersagli = _bersagli(args, contesto, [(tipo, nome) for tipo, nome in
+                                          (("excel", "persone.xlsx"), ("db", "persone.db"))
+                                          if os.path.exists(nome + ".enc")])
+    if not bersagli:
+        print("⚠️ Nessun file da decrittografare.")
+        return False
+    ok = True
+    for tipo, nome in bersagli:
+        if tipo == "excel":
+            stats = ExcelWriter(nome).decrypto_excel(args.excel_key, remove_encrypted=remove)
+        else:
+            writer = SQLiteWriter(nome)
+            stats = writer.decrypto_db(args.db_key, remove_encrypted=remove)
+            writer.close()
+        ok = ok and stats is not None
+    return ok
+
+
+def _compare(args, contesto):
+    from columnar import ColumnarWriter
+    from database import open_reader
+
+    excel_file = args.excel or (contesto["excel"] or ["persone.xlsx"])[-1]
+    db_name = args.db or (contesto["db"] or ["persone.db"])[-1]
+    if not os.path.exists(excel_file):
+        print(f"⚠️ Il file {excel_file} non esiste, impossibile confrontare.")
+        return False
+    lettore = open_reader(excel_file)
+    if isinstance(lettore, ColumnarWriter):
+        result = lettore.compare_with_sql(db_name, key=args.key, max_rows=args.max_rows)
+    else:
+        result = lettore.compare_excel_with_sql(db_name, key=args.key, max_rows=args.max_rows)
+    return result is not None
+
+
+# Stadi disponibili: comando → (tipo, funzione). I tipi "sorgente" e "scrittura" restituiscono
+# un flusso di blocchi; gli stadi "file" restituiscono True se sono terminati correttamente.
+STADI = {
+    "generate": ("sorgente", _generate),
+    "read": ("sorgente", _read),
+    "from-sqlite": ("sorgente", _from_sqlite),
+    "to-excel": ("scrittura", _to_excel),
+    "to-sqlite": ("scrittura", _to_sqlite),
+    "encrypt": ("file", _encrypt),
+    "decrypt": ("file", _decrypt),
+    "compare": ("file", _compare),
+}
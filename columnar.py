@@ -0,0 +1,280 @@
+"""
+Archiviazione colonnare delle persone in Parquet o Arrow IPC, accanto a Excel e SQLite.
+
+Il formato viene scelto dall'estensione del file: `.parquet` oppure `.arrow` / `.feather`.
+Le persone vengono scritte a blocchi (RecordBatch; per Arrow IPC nel formato stream), con le
+colonne a bassa cardinalità (nome, cognome) codificate a dizionario, e rilette con memory-map:
+leggere il file non richiede di decomprimere e analizzare XML come per l'xlsx, quindi può fare
+da formato intermedio veloce per importazione, confronto ed esportazione.
+
+Richiede il pacchetto opzionale `pyarrow`, importato solo quando serve.
+"""
+import itertools
+import os
+import time
+
+from batching import CAMPI, BATCH_SIZE, is_columnar, iter_row_batches
+from perf import peak_rss_mb
+from person import CAMPI_BASE, PersonBatch
+
+# Estensioni riconosciute e relativo formato
+FORMATI = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+# Intestazione delle colonne, come nel file Excel
+INTESTAZIONE = [campo.capitalize() for campo in CAMPI]
+# Colonne codificate a dizionario (valori molto ripetuti)
+COLONNE_DIZIONARIO = ("nome", "cognome", "via", "numero", "cap", "citta", "provincia")
+
+
+class ColumnarWriter:
+    """
+    Gestisce un file Parquet o Arrow IPC con le persone, con la stessa interfaccia di lettura
+    di `ExcelWriter` (`read_excel_header()` / `iter_excel_rows()`), così può essere usato da
+    `diff.DiffEngine` e da `SQLiteWriter` al posto di un file Excel.
+    Attributi:
+        filename (str): Nome del file. Default: "persone.parquet".
+        formato (str): "parquet" o "arrow", ricavato dall'estensione.
+    """
+
+    def __init__(self, filename="persone.parquet"):
+        """
+        Args:
+            filename (str): File `.parquet`, `.arrow` o `.feather`.
+        Raises:
+            ValueError: Se l'estensione non è riconosciuta.
+        """
+        estensione = os.path.splitext(filename)[1].lower()
+        if estensione not in FORMATI:
+            raise ValueError(f"Estensione non supportata: {estensione!r}. Valori ammessi: {tuple(FORMATI)}")
+        self.filename = filename
+        self.formato = FORMATI[estensione]
+
+    def exists(self):
+        """
+        Returns:
+            bool: True se il file esiste.
+        """
+        return os.path.exists(self.filename)
+
+    def write(self, data, batch_size=BATCH_SIZE, compression="zstd"):
+        """
+        Scrive le persone nel file un blocco alla volta, a memoria costante.
+        I blocchi colonnari (es. `DataGenerator.generate_bulk()`) vengono convertiti senza
+        passare da tuple Python.
+        Args:
+            data (Iterable): Persone in uno dei formati accettati da `batching.iter_row_batches()`.
+            batch_size (int): Righe per RecordBatch (e per row group Parquet).
+            compression (str): Compressione ("zstd", "snappy", "lz4", None). Per Arrow IPC solo "zstd" o "lz4".
+        Returns:
+            dict: 'righe', 'secondi', 'righe_al_secondo', 'byte', 'picco_rss_mb'.
+        """
+        import pyarrow as pa
+
+        start = time.perf_counter()
+        schema = _schema(pa)
+        totale = 0
+        temporaneo = self.filename + ".tmp"
+        try:
+            if self.formato == "parquet":
+                import pyarrow.parquet as pq
+
+                writer = pq.ParquetWriter(temporaneo, schema, compression=compression, use_dictionary=True)
+            else:
+                opzioni = pa.ipc.IpcWriteOptions(compression=compression)
+                # Formato stream: ogni blocco può avere il proprio dizionario (il formato file
+                # IPC ne ammette uno solo per colonna in tutto il file)
+                writer = pa.ipc.new_stream(temporaneo, schema, options=opzioni)
+            with writer:
+                for colonne in _iter_colonne(data, batch_size):
+                    batch = _record_batch(pa, schema, colonne)
+                    writer.write_batch(batch)
+                    totale += batch.num_rows
+            os.replace(temporaneo, self.filename)
+        finally:
+            if os.path.exists(temporaneo):
+                os.remove(temporaneo)
+
+        secondi = time.perf_counter() - start
+        stats = {
+            "righe": totale,
+            "secondi": secondi,
+            "righe_al_secondo": totale / secondi if secondi else 0.0,
+            "byte": os.path.getsize(self.filename),
+            "picco_rss_mb": peak_rss_mb(),
+        }
+        print(f"✅ File {self.formato} salvato come {self.filename}: {totale} righe, "
+              f"{stats['byte'] / 1024 / 1024:.1f} MB, {secondi:.2f}s ({stats['righe_al_secondo']:.0f} righe/s)")
+        return stats
+
+    def convert_excel(self, excel_file="persone.xlsx", backend="auto"):
+        """
+        Converte un file Excel nel formato colonnare, leggendolo a blocchi una sola volta.
+        Args:
+            excel_file (str): File Excel di origine.
+            backend (str): Backend di lettura (vedi `ExcelWriter.iter_excel_rows()`).
+        Returns:
+            dict: Statistiche di `write()`.
+        """
+        from excel import ExcelWriter
+
+        excel_writer = ExcelWriter(excel_file)
+        colonne = [col.lower() for col in excel_writer.read_excel_header(backend)]
+        # I file senza indirizzo strutturato vengono completati da `iter_row_batches()`
+        campi = CAMPI if all(campo in colonne for campo in CAMPI) else CAMPI_BASE
+        posizioni = [colonne.index(campo) for campo in campi]
+        return self.write([tuple(riga[p] if p < len(riga) else None for p in posizioni) for riga in batch]
+                          for batch in excel_writer.iter_excel_rows(backend))
+
+    def iter_batches(self, batch_size=BATCH_SIZE):
+        """
+        Restituisce i RecordBatch del file, letto con memory-map.
+        Args:
+            batch_size (int): Righe per blocco (solo Parquet; Arrow IPC mantiene i blocchi scritti).
+        Yields:
+            pyarrow.RecordBatch: Blocchi del file.
+        """
+        import pyarrow as pa
+
+        if self.formato == "parquet":
+            import pyarrow.parquet as pq
+
+            yield from pq.ParquetFile(self.filename, memory_map=True).iter_batches(batch_size=batch_size)
+            return
+        with pa.memory_map(self.filename, "r") as source:
+            yield from _apri_ipc(pa, source)
+
+    def read_excel_header(self, backend=None):
+        """
+        Restituisce i nomi delle colonne (stessa interfaccia di `ExcelWriter.read_excel_header()`).
+        Args:
+            backend: Ignorato, presente per compatibilità.
+        Returns:
+            list[str]: Nomi delle colonne.
+        """
+        import pyarrow as pa
+
+        if self.formato == "parquet":
+            import pyarrow.parquet as pq
+
+            return list(pq.read_schema(self.filename, memory_map=True).names)
+        with pa.memory_map(self.filename, "r") as source:
+            return list(_apri_ipc(pa, source).schema.names)
+
+    def iter_excel_rows(self, backend=None, chunk_size=BATCH_SIZE):
+        """
+        Restituisce le righe a blocchi di tuple (stessa interfaccia di `ExcelWriter.iter_excel_rows()`).
+        Args:
+            backend: Ignorato, presente per compatibilità.
+            chunk_size (int): Righe per blocco.
+        Yields:
+            list[tuple]: Blocchi di righe nell'ordine delle colonne del file.
+        """
+        for batch in self.iter_batches(chunk_size):
+            yield list(zip(*(colonna.to_pylist() for colonna in batch.columns)))
+
+    def read_dataframe(self):
+        """
+        Legge l'intero file in un DataFrame pandas.
+        Returns:
+            pandas.DataFrame: Le persone, con le colonne di testo.
+        """
+        import pyarrow as pa
+
+        if self.formato == "parquet":
+            import pyarrow.parquet as pq
+
+            tabella = pq.read_table(self.filename, memory_map=True)
+        else:
+            with pa.memory_map(self.filename, "r") as source:
+                tabella = _apri_ipc(pa, source).read_all()
+        return tabella.to_pandas()
+
+    def compare_with_sql(self, db_name="persone.db", key="id", index_file=None, max_rows=20):
+        """
+        Confronta il file con la tabella SQLite `persone`, come `ExcelWriter.compare_excel_with_sql()`.
+        Args:
+            db_name (str): Database SQLite da confrontare.
+            key (str): Colonna usata per abbinare le righe ("id" o una chiave naturale come "email").
+            index_file (str, optional): File degli indici dei digest (vedi `diff.DiffEngine`).
+            max_rows (int): Numero massimo di righe stampate per ciascuna categoria.
+        Returns:
+            DiffResult | None: Il risultato del confronto, None in caso di errore.
+        """
+        from diff import DiffEngine
+
+        try:
+            if not os.path.exists(db_name):
+                print(f"⚠️ Il file {db_name} non esiste, impossibile confrontare con {self.filename}.")
+                return None
+            engine = DiffEngine(self, db_name, key=key, index_file=index_file)
+            try:
+                result = engine.compare()
+            except ValueError as e:
+                print(f"⚠️ Attenzione: {e}")
+                return None
+            engine.print_report(result, max_rows, sorgente=self.formato.capitalize())
+            return result
+        except Exception as e:
+            print(f"❌ Errore durante il confronto: {e}")
+            return None
+
+
+def _apri_ipc(pa, source):
+    """
+    Apre un file Arrow IPC in formato stream (quello scritto da `write()`) o in formato file
+    (es. Feather v2 scritto da altri programmi).
+    Returns:
+        Lettore iterabile di RecordBatch con `schema` e `read_all()`.
+    """
+    try:
+        return pa.ipc.open_stream(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_file(source)
+
+
+def _schema(pa):
+    """
+    Schema delle persone: colonne di testo, a dizionario quelle di `COLONNE_DIZIONARIO`.
+    """
+    return pa.schema([
+        pa.field(nome, pa.dictionary(pa.int32(), pa.string()) if campo in COLONNE_DIZIONARIO else pa.string())
+        for campo, nome in zip(CAMPI, INTESTAZIONE)
+    ])
+
+
+def _iter_colonne(data, batch_size):
+    """
+    Restituisce i dati come liste (o array NumPy) di colonne nell'ordine di `CAMPI`, un blocco alla volta.
+    """
+    if isinstance(data, PersonBatch):
+        for inizio in range(0, len(data), batch_size):
+            yield [data.column(campo, inizio, inizio + batch_size) for campo in CAMPI]
+        return
+    if is_columnar(data):
+        data = [data]
+    data = iter(data)
+    primo = next(data, None)
+    if primo is None:
+        return
+    data = itertools.chain([primo], data)
+    if is_columnar(primo) and "via" in primo:
+        for blocco in data:
+            yield [blocco[campo] for campo in CAMPI]
+        return
+    for batch in iter_row_batches(data, batch_size):
+        yield [list(colonna) for colonna in zip(*batch)]
+
+
+def _record_batch(pa, schema, colonne):
+    """
+    Costruisce un RecordBatch dalle colonne, codificando a dizionario quelle previste dallo schema.
+    """
+    array = []
+    for campo, valori in zip(schema, colonne):
+        if hasattr(valori, "dtype") and valori.dtype.kind == "U":
+            valori = valori.astype(object)
+        colonna = pa.array(valori, type=pa.string())
+        if pa.types.is_dictionary(campo.type):
+            colonna = colonna.dictionary_encode().cast(campo.type)
+        array.append(colonna)
+    return pa.RecordBatch.from_arrays(array, schema=schema)
@@ -1,30 +1,175 @@
+import hashlib
+import itertools
 import os
 import sqlite3
+import sys
+import time
+from collections import deque
 
-import pandas as pd
-from cryptography.fernet import Fernet
+from batching import CAMPI, iter_row_batches
+from columnar import FORMATI, ColumnarWriter
+from fieldcrypto import CAMPI_CIFRATI, FieldCipher
+from keys import key_manager
+from person import CAMPI_BASE, CAMPI_INDIRIZZO, completa_riga, scomponi_indirizzo
+from perf import misurato, span_corrente
+from pool import ConnectionPool, EncryptedMemoryPool, remove_wal_files
+from streamcrypto import encrypt_file, format_stats
+
+# Struttura della tabella `persone`, uguale alle colonne del file Excel
+SQL_CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS persone (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Nome TEXT,
+            Cognome TEXT,
+            Indirizzo TEXT,
+            Email TEXT,
+            Telefono TEXT,
+            Via TEXT,
+            Numero TEXT,
+            Cap TEXT,
+            Citta TEXT,
+            Provincia TEXT
+        )
+        """
+SQL_INSERT = ("INSERT INTO persone (Nome, Cognome, Indirizzo, Email, Telefono, Via, Numero, Cap, Citta, Provincia) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+# Indici secondari della tabella `persone` (nome → colonne)
+INDICI = {
+    "idx_persone_cognome": "Cognome",
+    "idx_persone_email": "Email",
+    "idx_persone_geo": "Provincia, Cap, Citta",
+    "idx_persone_cap_citta": "Cap, Citta",
+    "idx_persone_localita": "Citta, Provincia",
+}
+# Indici su espressioni ricavate da Indirizzo delle versioni precedenti, sostituiti dalle colonne strutturate
+INDICI_OBSOLETI = ("idx_persone_cap", "idx_persone_citta")
+# Filtri di `query_persone()`: nome → (colonna, confronto per prefisso, indice).
+# L'ordine è quello di selettività: l'indice del primo filtro indicato viene imposto con INDEXED BY.
+FILTRI = {
+    "email": ("Email", True, "idx_persone_email"),
+    "cap": ("Cap", False, "idx_persone_cap_citta"),
+    "cognome": ("Cognome", True, "idx_persone_cognome"),
+    "citta": ("Citta", True, "idx_persone_localita"),
+    "provincia": ("Provincia", False, "idx_persone_geo"),
+}
+# Numero di persone per provincia e città, aggiornato dai trigger di `TRIGGER_CONTEGGI` a ogni
+# modifica di `persone` (provincia e città mancanti sono registrate come stringa vuota)
+SQL_CREATE_CONTEGGI = """
+        CREATE TABLE IF NOT EXISTS persone_conteggi (
+            Provincia TEXT NOT NULL,
+            Citta TEXT NOT NULL,
+            Persone INTEGER NOT NULL,
+            PRIMARY KEY (Provincia, Citta)
+        ) WITHOUT ROWID
+        """
+_SQL_CONTEGGIO_PIU = """
+            INSERT INTO persone_conteggi VALUES (ifnull(NEW.Provincia, ''), ifnull(NEW.Citta, ''), 1)
+                ON CONFLICT (Provincia, Citta) DO UPDATE SET Persone = Persone + 1;"""
+_SQL_CONTEGGIO_MENO = """
+            UPDATE persone_conteggi SET Persone = Persone - 1
+                WHERE Provincia = ifnull(OLD.Provincia, '') AND Citta = ifnull(OLD.Citta, '');
+            DELETE FROM persone_conteggi
+                WHERE Provincia = ifnull(OLD.Provincia, '') AND Citta = ifnull(OLD.Citta, '') AND Persone <= 0;"""
+TRIGGER_CONTEGGI = {
+    "trg_persone_conteggi_insert": f"AFTER INSERT ON persone BEGIN{_SQL_CONTEGGIO_PIU}\n        END",
+    "trg_persone_conteggi_delete": f"AFTER DELETE ON persone BEGIN{_SQL_CONTEGGIO_MENO}\n        END",
+    "trg_persone_conteggi_update": ("AFTER UPDATE OF Provincia, Citta ON persone "
+                                    "WHEN OLD.Provincia IS NOT NEW.Provincia OR OLD.Citta IS NOT NEW.Citta "
+                                    f"BEGIN{_SQL_CONTEGGIO_MENO}{_SQL_CONTEGGIO_PIU}\n        END"),
+}
+# Tabella con Indirizzo, Email e Telefono cifrati per valore e i rispettivi indici ciechi (HMAC),
+# usata con `encrypt_fields=True` (vedi `fieldcrypto`). Non ha le colonne dell'indirizzo
+# strutturato, che lascerebbero l'indirizzo in chiaro.
+SQL_CREATE_TABLE_CIFRATA = """
+        CREATE TABLE IF NOT EXISTS persone_cifrate (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Nome TEXT,
+            Cognome TEXT,
+            Indirizzo BLOB,
+            Email BLOB,
+            Telefono BLOB,
+            Indirizzo_hmac BLOB,
+            Email_hmac BLOB,
+            Telefono_hmac BLOB
+        )
+        """
+SQL_INSERT_CIFRATA = ("INSERT INTO persone_cifrate (Nome, Cognome, Indirizzo, Email, Telefono, "
+                      "Indirizzo_hmac, Email_hmac, Telefono_hmac) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+INDICI_CIFRATI = {f"idx_persone_cifrate_{campo}": f"{campo.capitalize()}_hmac" for campo in CAMPI_CIFRATI}
+# PRAGMA usati durante l'importazione massiva: journal in memoria, nessun fsync
+# intermedio, cache da 256 MB e tabelle temporanee in RAM
+PRAGMA_IMPORT = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": -262144,
+    "temp_store": "MEMORY",
+}
+# Numero di righe per ogni chiamata a executemany durante l'importazione
+IMPORT_CHUNK_SIZE = 50_000
+# Stato dell'ultima sincronizzazione di ogni file Excel (vedi `SQLiteWriter.sync_from_excel()`)
+SQL_CREATE_SYNC_STATO = """
+        CREATE TABLE IF NOT EXISTS sync_stato (
+            file TEXT PRIMARY KEY,
+            chiave TEXT,
+            mtime_ns INTEGER,
+            dimensione INTEGER,
+            sha256 TEXT,
+            sincronizzato REAL
+        )
+        """
 
 class SQLiteWriter:
     """
     Crea, importando i dati da un file Excel, e gestisce un un database SQLite per l'archiviazione, la crittografia e la gestione di dati personali.
     Attributi:
         db_name (str): Nome del file database SQLite. Default: "persone.db".
+        encrypted (bool): Se True il database è solo cifrato su disco ("<db_name>.enc") e viene usato in memoria.
     """
 
-    def __init__(self, db_name="persone.db"):
+    def __init__(self, db_name="persone.db", encrypted=False, path_key="psw.key", field_key="campi.key"):
         """
         Inizializza un'istanza della classe SQLiteWriter.
         Args:
             db_name (str): Nome del file database SQLite da gestire. Default: "persone.db".
+            encrypted (bool): Se True lavora sul file cifrato "<db_name>.enc": il database viene
+            decifrato in memoria (mai in chiaro su disco), tenuto in cache tra le query e
+            ricifrato solo quando una transazione modifica i dati (vedi `pool.EncryptedMemoryPool`).
+            path_key (str): Chiave usata in modalità `encrypted`. Default: "psw.key".
+            field_key (str): Chiave della crittografia per campo (`encrypt_fields=True`),
+            generata al primo utilizzo. Default: "campi.key".
         """
         self.db_name = db_name
+        self.encrypted = encrypted
+        # Connessioni riusate tra le chiamate (vedi pool.ConnectionPool)
+        if encrypted:
+            self._pool = EncryptedMemoryPool(db_name + ".enc", path_key)
+        else:
+            self._pool = ConnectionPool(db_name)
+        # Generazione del pool in cui è stata verificata l'esistenza della tabella `persone`
+        self._schema_generation = None
+        # Tempi delle ultime query eseguite con `query_persone()` / `iter_persone()`
+        self.query_log = deque(maxlen=100)
+        self.field_key = field_key
+        # (chiave, FieldCipher) della crittografia per campo, ricreato solo se la chiave cambia
+        self._field_cipher = None
 
-    def read_from_excel_and_insert_to_sql(self, excel_file="persone.xlsx"):
+    @misurato
+    def read_from_excel_and_insert_to_sql(self, excel_file="persone.xlsx", bulk=True, backend="auto",
+                                          encrypt_fields=False, sync=False):
         """
         Verifica l'esistenza e legge i dati da un file Excel e li inserisce nel database SQLite,
         sovrascrivendo i dati esistenti nel caso fossero già presenti.
         Args:
-            excel_file (str): file Excel da leggere.
+            excel_file (str): file Excel da leggere (o file Parquet/Arrow, vedi `columnar`).
+            bulk (bool): Se True (default) usa l'importazione massiva `bulk_insert()` in
+            un'unica transazione; se False usa `DataFrame.to_sql` di pandas.
+            backend (str): Backend di lettura del file Excel (vedi `ExcelWriter.iter_excel_rows()`).
+            encrypt_fields (bool): Se True importa nella tabella `persone_cifrate` cifrando
+            Indirizzo, Email e Telefono (sempre con l'importazione massiva).
+            sync (bool): Se True esegue invece la sincronizzazione incrementale `sync_from_excel()`,
+            che mantiene gli id e aggiorna solo le righe cambiate.
+        Returns:
+            dict | None: Statistiche dell'importazione massiva (vedi `bulk_insert()`) o della sincronizzazione.
         Comportamento:
             - Cancella i dati esistenti nel database.
             - Ricrea la tabella `persone` con struttura coerente con l'Excel.
@@ -32,86 +177,264 @@ class SQLiteWriter:
         """
         if not os.path.exists(excel_file):
             print(f"⚠️ Il file Excel '{excel_file}' non esiste.")
-            return
+            return None
+
+        if sync:
+            return self.sync_from_excel(excel_file, backend=backend)
 
         try:
+            excel_writer = open_reader(excel_file)
+            # I file colonnari vengono importati sempre in modalità massiva
+            if bulk or encrypt_fields or isinstance(excel_writer, ColumnarWriter):
+                colonne = excel_writer.read_excel_header(backend)
+                stats = self.bulk_insert(excel_writer.iter_excel_rows(backend, chunk_size=IMPORT_CHUNK_SIZE),
+                                         columns=colonne, encrypt_fields=encrypt_fields)
+                print(f"✅ Dati importati con successo da '{excel_file}' in '{self.db_name}': "
+                      f"{stats['righe']} righe in {stats['secondi']:.2f}s "
+                      f"({stats['righe_al_secondo']:.0f} righe/s, di cui inserimento "
+                      f"{stats['secondi_inserimento']:.2f}s).")
+                return stats
+
             # Legge il file Excel
+            import pandas as pd
+
             df = pd.read_excel(excel_file, sheet_name=0, dtype=str)
             # Rinomina colonne rimuovendo eventuali spazi invisibili
             df.columns = [col.strip() for col in df.columns]
+            # File del formato precedente: l'indirizzo strutturato viene ricavato da Indirizzo
+            if not all(campo.capitalize() in df.columns for campo in CAMPI_INDIRIZZO):
+                parti = [scomponi_indirizzo(indirizzo) for indirizzo in df["Indirizzo"]]
+                for i, campo in enumerate(CAMPI_INDIRIZZO):
+                    df[campo.capitalize()] = [parte[i] for parte in parti]
             # Pulisce il database
             self.delete_all_data()
             self.create_table()
-            # Connessione al database
-            conn = sqlite3.connect(self.db_name)
-            # Inserisce i dati in SQL
-            df.to_sql("persone", conn, if_exists="append", index=False)
-            conn.commit()
-            conn.close()
+            # Inserisce i dati in SQL con una connessione del pool
+            with self._pool.connection() as conn:
+                df.to_sql("persone", conn, if_exists="append", index=False)
 
             print(f"✅ Dati importati con successo da '{excel_file}' in '{self.db_name}'.")
 
         except Exception as e:
             print(f"❌ Errore durante la lettura o scrittura dei dati: {e}")
+        return None
 
-    def crypto_db(self, path_key="psw.key"):
+    @misurato
+    def sync_from_excel(self, excel_file="persone.xlsx", key="email", backend="auto", force=False):
+        """
+        Sincronizzazione incrementale dal file Excel: le righe vengono abbinate a quelle del database
+        tramite una chiave naturale, inserite o aggiornate con `INSERT ... ON CONFLICT DO UPDATE`
+        solo se cambiate, e vengono eliminate solo le persone non più presenti nel file.
+        Gli id delle righe esistenti non cambiano.
+        Args:
+            excel_file (str): File Excel da sincronizzare.
+            key (str): Campo usato come chiave naturale (uno tra `CAMPI`). Default: "email".
+            backend (str): Backend di lettura del file Excel (vedi `ExcelWriter.iter_excel_rows()`).
+            force (bool): Se True sincronizza anche se il file non è cambiato dall'ultima volta.
+        Returns:
+            dict | None: Numero di righe 'inserite', 'aggiornate', 'eliminate', 'invariate',
+            'scartate' (senza chiave o con chiave duplicata nel file), più 'file_invariato' e 'secondi'.
+        Comportamento:
+            - Registra nella tabella `sync_stato` mtime, dimensione e SHA-256 del file: se il file
+              non è cambiato dall'ultima sincronizzazione non viene nemmeno letto.
+            - Le righe del file senza chiave vengono scartate; a parità di chiave vale l'ultima.
+            - Le persone del database senza chiave, non potendo essere abbinate, vengono eliminate.
+            - Tutto avviene in un'unica transazione.
+        """
+        if not os.path.exists(excel_file):
+            print(f"⚠️ Il file Excel '{excel_file}' non esiste.")
+            return None
+        if key not in CAMPI:
+            raise ValueError(f"chiave non valida: {key} (valori ammessi: {', '.join(CAMPI)})")
+
+        start = time.perf_counter()
+        colonna = key.capitalize()
+        altre = [campo.capitalize() for campo in CAMPI if campo != key]
+        percorso = os.path.abspath(excel_file)
+        stat = os.stat(excel_file)
+        stats = {"inserite": 0, "aggiornate": 0, "eliminate": 0, "invariate": 0, "scartate": 0,
+                 "file_invariato": False}
+        try:
+            with self._pool.connection() as conn:
+                self._ensure_table(conn)
+                conn.execute(SQL_CREATE_SYNC_STATO)
+                stato = conn.execute("SELECT chiave, mtime_ns, dimensione, sha256 FROM sync_stato WHERE file = ?",
+                                     (percorso,)).fetchone()
+                # Stessi mtime e dimensione: il file non viene nemmeno letto; altrimenti decide l'hash
+                sha256 = None
+                if not force and stato is not None and stato[0] == key:
+                    if stato[1:3] == (stat.st_mtime_ns, stat.st_size):
+                        sha256 = stato[3]
+                    else:
+                        sha256 = _sha256_file(excel_file)
+                if sha256 is not None and sha256 == stato[3]:
+                    stats["file_invariato"] = True
+                    stats["invariate"] = conn.execute("SELECT COUNT(*) FROM persone").fetchone()[0]
+                    conn.execute("UPDATE sync_stato SET mtime_ns = ?, dimensione = ? WHERE file = ?",
+                                 (stat.st_mtime_ns, stat.st_size, percorso))
+                else:
+                    sha256 = sha256 or _sha256_file(excel_file)
+                    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_persone_sync_{key} ON persone({colonna})")
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN")
+                    stats.update(_sync_rows(conn, open_reader(excel_file), backend, key, colonna, altre))
+                    conn.execute("INSERT OR REPLACE INTO sync_stato VALUES (?, ?, ?, ?, ?, ?)",
+                                 (percorso, key, stat.st_mtime_ns, stat.st_size, sha256, time.time()))
+        except sqlite3.IntegrityError as e:
+            print(f"❌ Impossibile usare '{key}' come chiave: valori duplicati nel database ({e}).")
+            return None
+        except Exception as e:
+            print(f"❌ Errore durante la sincronizzazione: {e}")
+            return None
+
+        stats["secondi"] = time.perf_counter() - start
+        if stats["file_invariato"]:
+            print(f"ℹ️ '{excel_file}' non è cambiato dall'ultima sincronizzazione ({stats['invariate']} righe).")
+        else:
+            print(f"✅ Sincronizzazione di '{excel_file}' completata in {stats['secondi']:.2f}s: "
+                  f"{stats['inserite']} inserite, {stats['aggiornate']} aggiornate, "
+                  f"{stats['eliminate']} eliminate, {stats['invariate']} invariate, {stats['scartate']} scartate.")
+        return stats
+
+    @misurato
+    def bulk_insert(self, data, columns=None, replace=True, encrypt_fields=False, exclusive=True):
+        """
+        Importazione massiva nella tabella `persone` con un'unica connessione e un'unica transazione.
+        Args:
+            data (Iterable): Batch di righe (tuple) o qualsiasi sorgente accettata da
+            `batching.iter_row_batches()`.
+            columns (list[str], optional): Colonne a cui corrispondono i valori delle tuple
+            (es. l'intestazione del file Excel). Default: le colonne di `CAMPI`. Se mancano quelle
+            dell'indirizzo strutturato vengono ricavate da Indirizzo.
+            replace (bool): Se True sostituisce tutti i dati esistenti e riazzera gli id.
+            encrypt_fields (bool): Se True scrive nella tabella `persone_cifrate` (vedi `fieldcrypto`).
+            exclusive (bool): Se True chiude le connessioni del pool e imposta i PRAGMA di `PRAGMA_IMPORT`.
+            Se False usa una connessione del pool senza cambiare i PRAGMA: è più lento, ma le altre
+            connessioni possono continuare a leggere (WAL) durante l'importazione. Default: True.
+        Returns:
+            dict: 'righe', 'secondi', 'secondi_inserimento', 'secondi_indici', 'righe_al_secondo'.
+        Comportamento:
+            - Con `exclusive` imposta i PRAGMA di `PRAGMA_IMPORT` per la durata dell'importazione.
+            - Elimina gli indici e i trigger di `persone_conteggi`, inserisce le righe con
+              `executemany` a blocchi e ricrea indici e conteggi solo al termine del caricamento.
+            - In caso di errore annulla la transazione: il database resta com'era.
+        """
+        posizioni = None if columns is None else _posizioni_colonne(columns)
+        cifratore = self._cifratore() if encrypt_fields else None
+        start = time.perf_counter()
+        if self.encrypted or not exclusive:
+            # Database in memoria (i PRAGMA non servono, il file cifrato viene salvato al termine)
+            # o lettori concorrenti: la transazione resta isolata dalle loro letture
+            with self._pool.connection() as conn:
+                totale, inserimento, secondi_indici = _bulk_load(conn, data, posizioni, replace, cifratore)
+        else:
+            # Il cambio di journal_mode richiede che non ci siano altre connessioni aperte
+            self._pool.close()
+            conn = sqlite3.connect(self.db_name, isolation_level=None)
+            try:
+                journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                try:
+                    for pragma, valore in PRAGMA_IMPORT.items():
+                        conn.execute(f"PRAGMA {pragma} = {valore}")
+                    totale, inserimento, secondi_indici = _bulk_load(conn, data, posizioni, replace, cifratore)
+                finally:
+                    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            finally:
+                conn.close()
+
+        secondi = time.perf_counter() - start
+        return {
+            "righe": totale,
+            "secondi": secondi,
+            "secondi_inserimento": inserimento,
+            "secondi_indici": secondi_indici,
+            "righe_al_secondo": totale / secondi if secondi else 0.0,
+        }
+
+    @misurato
+    def crypto_db(self, path_key="psw.key", remove_original=None):
         """
         Crittografa il file SQLite (`.db`) e salva il risultato in un file `.enc`.
         Args:
             path_key (str): Percorso del file contenente la chiave di crittografia. Se non esiste, viene generata.
+            remove_original (bool, optional): Se True elimina il file `.db` originale, se False lo mantiene,
+            senza chiedere nulla. Default: None (lo chiede all'utente).
+        Returns:
+            dict | None: Statistiche della crittografia (vedi `streamcrypto.encrypt_file()`), None in caso di errore.
         Comportamento:
-            - Crittografa il contenuto del database.
+            - Crea una copia coerente del database con `VACUUM INTO`, che comprende le transazioni
+              confermate ancora nel WAL anche mentre altre connessioni stanno leggendo.
+            - Crittografa la copia a blocchi con AES-GCM (vedi `streamcrypto`) e la elimina.
             - Salva il file crittografato come "<db_name>.enc".
-            - Chiede all'utente se eliminare il file `.db` originale.
+            - Chiede all'utente se eliminare il file `.db` originale (con i file `-wal` e `-shm`).
         """
+        if self.encrypted:
+            print(f"ℹ️ In modalità cifrata il database è salvato solo in {self._pool.encrypted_path}.")
+            return
+
         if not os.path.exists(self.db_name):
             print(f"⚠️ Il file {self.db_name} non esiste, impossibile crittografare.")
             return
 
-        # Genera la key se non esiste
-        if not os.path.exists(path_key):
-            key = Fernet.generate_key()
-            with open(path_key, "wb") as key_file:
-                key_file.write(key)
+        # Genera la key se non esiste (le chiavi già lette sono in cache nel key manager)
+        try:
+            chiave, generata = key_manager.get_or_create(path_key)
+        except Exception as e:
+            print(f"❌ Errore nella lettura della key {path_key}: {e}")
+            return
+        if generata:
             print(f"🔐 Key generata e salvata in {path_key}")
-        else:
-            with open(path_key, "rb") as key_file:
-                key = key_file.read()
-
-        fernet = Fernet(key)
-
-        # Legge il contenuto del file .db
-        with open(self.db_name, "rb") as file:
-            original = file.read()
-
-        encrypted = fernet.encrypt(original)
+        key = chiave.key
 
+        # Cifra a blocchi una copia coerente del database: il file .db da solo non contiene
+        # le transazioni ancora nel WAL, che non viene riportato finché ci sono lettori
         encrypted_filename = self.db_name + ".enc"
-        with open(encrypted_filename, "wb") as enc_file:
-            enc_file.write(encrypted)
+        copia = self.db_name + ".snapshot"
+        try:
+            _copia_coerente(self.db_name, copia)
+            stats = encrypt_file(copia, encrypted_filename, key)
+        except Exception as e:
+            print(f"❌ Errore durante la crittografia: {e}")
+            return
+        finally:
+            if os.path.exists(copia):
+                os.remove(copia)
 
-        print(f"✅ File crittografato salvato come {encrypted_filename}")
+        print(f"✅ File crittografato salvato come {encrypted_filename} ({format_stats(stats)})")
 
-        scelta = input(f"❓ Vuoi eliminare il file DB originale {self.db_name}? (S/N): ").strip().lower()
-        if scelta == "s":
+        if remove_original is None:
+            scelta = input(f"❓ Vuoi eliminare il file DB originale {self.db_name}? (S/N): ").strip().lower()
+            remove_original = scelta == "s"
+        if remove_original:
+            self.close()
             try:
                 os.remove(self.db_name)
+                for suffisso in ("-wal", "-shm"):
+                    if os.path.exists(self.db_name + suffisso):
+                        os.remove(self.db_name + suffisso)
                 print(f"🗑️ File {self.db_name} eliminato.")
             except Exception as e:
                 print(f"❌ Errore durante l'eliminazione di {self.db_name}: {e}")
         else:
             print(f"ℹ️ Il file {self.db_name} è stato mantenuto.")
+        return stats
 
-    def decrypto_db(self, path_key="psw.key", suppress_prompt=False):
+    @misurato
+    def decrypto_db(self, path_key="psw.key", suppress_prompt=False, remove_encrypted=None):
         """
         Verifica la presenza e Decrittografa un database SQlite `.enc` generato da `crypto_excel()`
         dopodichè ripristina il file SQLite originale.
         Args:
-            path_key (str): Percorso del file contenente la chiave di crittografia.
+            path_key (str | list[str]): Percorso del file contenente la chiave di crittografia,
+            o elenco di chiavi candidate (es. dopo una rotazione, vedi `keys.KeyManager.rotate()`).
             suppress_prompt (bool): Se True, non elimina il file `.enc` dopo la decrittografia.
+            remove_encrypted (bool, optional): Se True elimina il file `.enc`, se False lo mantiene,
+            senza chiedere nulla. Default: None (lo chiede all'utente, se non c'è `suppress_prompt`).
+        Returns:
+            dict | None: Statistiche della decrittografia, None in caso di errore.
         Comportamento:
             - Legge la chiave dal file.
-            - Decritta il contenuto e sovrascrive il file `.db`.
+            - Decritta il contenuto (formato a blocchi o vecchio formato Fernet) e sovrascrive il file `.db`.
             - Chiede se eliminare il file `.enc`.
         """
         encrypted_filename = self.db_name + ".enc"
@@ -120,62 +443,84 @@ class SQLiteWriter:
             print(f"⚠️ Il file crittografato {encrypted_filename} non esiste.")
             return
 
-        if not os.path.exists(path_key):
+        if not key_manager.get_many(path_key):
             print(f"⚠️ Il file della key {path_key} non esiste, impossibile decrittografare.")
             return
 
-        with open(path_key, "rb") as key_file:
-            key = key_file.read()
-
-        fernet = Fernet(key)
-
-        with open(encrypted_filename, "rb") as file_enc:
-            encrypted = file_enc.read()
-
+        # Chiude le connessioni al vecchio file ed elimina un eventuale WAL non più valido
+        self.close()
+        remove_wal_files(self.db_name)
+        # Decifra a blocchi (o dal vecchio formato Fernet): il file viene sostituito solo se tutto è valido
         try:
-            decrypted = fernet.decrypt(encrypted)
+            stats = key_manager.decrypt_file(encrypted_filename, self.db_name, path_key)
         except Exception as e:
-            print(f"❌ Errore nella decrittografia: {e}")
+            print(f"❌ Errore nella decrittografia: {e or type(e).__name__}")
             return
 
-        with open(self.db_name, "wb") as dec_file:
-            dec_file.write(decrypted)
-        print(f"✅ File decrittografato e salvato come {self.db_name}")
+        print(f"✅ File decrittografato e salvato come {self.db_name} ({format_stats(stats)})")
 
-        if suppress_prompt:
-            return
+        if remove_encrypted is None and suppress_prompt:
+            return stats
 
-        # Chiede se eliminare il file .enc al termine
-        while True:
+        # Chiede se eliminare il file .enc al termine, se il chiamante non l'ha già deciso
+        while remove_encrypted is None:
             scelta = input(f"❓ Vuoi eliminare il file crittografato {encrypted_filename}? (S/N): ").strip().lower()
-            if scelta == "s":
-                try:
-                    os.remove(encrypted_filename)
-                    print(f"🗑️ File eliminato.")
-                except Exception as e:
-                    print(f"❌ Errore durante l'eliminazione di {encrypted_filename}: {e}")
-                break
-            elif scelta == "n":
-                print(f"ℹ️ Il file è stato mantenuto.")
-                break
+            if scelta in ("s", "n"):
+                remove_encrypted = scelta == "s"
             else:
                 print("⚠️ Scelta non valida, riprova.")
+        if remove_encrypted:
+            try:
+                os.remove(encrypted_filename)
+                print(f"🗑️ File eliminato.")
+            except Exception as e:
+                print(f"❌ Errore durante l'eliminazione di {encrypted_filename}: {e}")
+        else:
+            print(f"ℹ️ Il file è stato mantenuto.")
+        return stats
 
     def db_exists(self):
         """
-        Controlla se il file del database SQLite esiste.
+        Controlla se il file del database SQLite (o, in modalità `encrypted`, il file cifrato) esiste.
         Returns:
             bool: True se il file esiste, False altrimenti.
         """
+        if self.encrypted:
+            return self._pool.exists()
         return os.path.exists(self.db_name)
 
     def connect(self):
         """
-            Apre, quando è necessario, una connessione al database SQLite e inizializza il cursore.
+            Apre, quando è necessario, una connessione dedicata al database SQLite e inizializza il cursore.
+            I metodi della classe usano invece le connessioni del pool (vedi `pool.ConnectionPool`).
         """
         self.connection = sqlite3.connect(self.db_name)
         self.cursor = self.connection.cursor()
 
+    def _ensure_table(self, conn, create=True):
+        """
+        Verifica (ed eventualmente crea) la tabella `persone` una sola volta per generazione del pool.
+        Args:
+            conn (sqlite3.Connection): Connessione del pool.
+            create (bool): Se True crea la tabella e gli indici quando mancano.
+        Returns:
+            bool: True se la tabella esiste.
+        """
+        if self._schema_generation == self._pool.generation:
+            return True
+        if create:
+            conn.execute(SQL_CREATE_TABLE)
+        elif conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='persone'").fetchone() is None:
+            return False
+        # Aggiunge colonne, indici e conteggi mancanti anche ai database creati da versioni precedenti
+        _aggiorna_schema(conn)
+        for indice, colonne in INDICI.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {indice} ON persone({colonne})")
+        _crea_conteggi(conn)
+        self._schema_generation = self._pool.generation
+        return True
+
+    @misurato
     def create_table(self):
         """
         Se non esiste già, crea la tabella `persone` nel database.
@@ -186,82 +531,339 @@ class SQLiteWriter:
            - Indirizzo
            - Email
            - Telefono
+           - Via, Numero, Cap, Citta, Provincia (indirizzo strutturato)
+        Crea inoltre gli indici e la tabella dei conteggi `persone_conteggi`.
         """
-        self.connect()
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS persone (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Nome TEXT,
-            Cognome TEXT,
-            Indirizzo TEXT,
-            Email TEXT,
-            Telefono TEXT
-        )
-        """)
-        self.connection.commit()
-        self.connection.close()
+        with self._pool.connection() as conn:
+            self._schema_generation = None
+            self._ensure_table(conn)
 
-    def write_to_db(self, data):
+    @misurato
+    def write_to_db(self, data, encrypt_fields=False):
         """
         Inserisce una lista di persone nella tabella `persone` del database.
         Args:
-            data (list[dict]): Lista di dizionari contenenti i campi:
+            data (list[dict] | Iterable): Lista di dizionari contenenti i campi:
             - 'nome', 'cognome', 'indirizzo', 'email', 'telefono'
+            - 'via', 'numero', 'cap', 'citta', 'provincia' (facoltativi, altrimenti ricavati da 'indirizzo')
+            oppure un `person.PersonBatch` o un qualsiasi iterabile di batch (vedi `batching.iter_row_batches()`).
+            encrypt_fields (bool): Se True cifra Indirizzo, Email e Telefono e scrive nella
+            tabella `persone_cifrate` (vedi `query_persone_cifrate()`).
         Comportamento:
-            - Apre la connessione al database.
-            - Inserisce ogni dizionario come una nuova riga nella tabella `persone`.
-            - Salva le modifiche (commit) e chiude la connessione.
+            - Prende una connessione dal pool e crea la tabella se non è già stata verificata.
+            - Inserisce i dati un batch alla volta con `executemany`, senza caricarli tutti in memoria.
+            - Salva le modifiche (commit) e restituisce la connessione al pool.
             - Stampa un messaggio di conferma al termine dell'inserimento.
         """
-        self.connect()
-        for person in data:
-            self.cursor.execute("""
-            INSERT INTO persone (nome, cognome, indirizzo, email, telefono)
-            VALUES (?, ?, ?, ?, ?)
-            """, (person["nome"], person["cognome"], person["indirizzo"], person["email"], person["telefono"]))
-        self.connection.commit()
-        self.connection.close()
-        print("✅ Dati salvati nel database SQLite")
+        totale = 0
+        cifratore = self._cifratore() if encrypt_fields else None
+        with self._pool.connection() as conn:
+            if cifratore is None:
+                self._ensure_table(conn)
+            else:
+                _crea_tabella_cifrata(conn)
+            if cifratore is None:
+                _invalida_sync(conn, indici=True)
+            for batch in iter_row_batches(data):
+                if cifratore is None:
+                    conn.executemany(SQL_INSERT, batch)
+                else:
+                    conn.executemany(SQL_INSERT_CIFRATA, cifratore.encrypt_rows(batch))
+                totale += len(batch)
+        span_corrente().add(righe=totale)
+        print(f"✅ Dati salvati nel database SQLite ({totale} righe)")
 
+    @misurato
     def read_from_db(self):
         """
         Legge e stampa tutte le persone presenti nella tabella `persone`.
         Comportamento:
             - Verifica se il database e la tabella esistono.
-            - Stampa tutte le righe trovate o un messaggio se vuoto.
+            - Stampa tutte le righe trovate, un blocco alla volta (vedi `iter_persone()`), o un messaggio se vuoto.
         """
-        if not os.path.exists(self.db_name):
+        if not self.db_exists():
             print(f"⚠️ Il file {self.db_name} non esiste. Non ci sono dati da leggere.")
             return
 
         try:
-            self.connect()
-
-            # Controllo che la tabella esista
-            self.cursor.execute("""
-                    SELECT name FROM sqlite_master WHERE type='table' AND name='persone';
-                    """)
-            table_exists = self.cursor.fetchone()
-
-            if not table_exists:
-                print("⚠️ La tabella 'persone' non esiste nel database.")
-                self.connection.close()
-                return
-
-            self.cursor.execute("SELECT * FROM persone")
-            persone = self.cursor.fetchall()
-            if persone:
-                print("\n--- Contenuto del Database ---")
-                for pers in persone:
-                    print(pers)
-            else:
-                print("❌ Il Database è vuoto.")
+            with self._pool.connection() as conn:
+                # Controllo che la tabella esista
+                if not self._ensure_table(conn, create=False):
+                    print("⚠️ La tabella 'persone' non esiste nel database.")
+                    return
 
-            self.connection.close()
+            vuoto = True
+            for persone in self.iter_persone():
+                if vuoto:
+                    print("\n--- Contenuto del Database ---")
+                    vuoto = False
+                # Un'unica scrittura per blocco invece di una print per riga
+                sys.stdout.write("".join(f"{pers}\n" for pers in persone))
+                span_corrente().add(righe=len(persone))
+            if vuoto:
+                print("❌ Il Database è vuoto.")
 
         except Exception as e:
             print(f"❌ Errore durante la lettura dal database: {e}")
 
+    @misurato
+    def query_persone(self, cognome=None, email=None, citta=None, cap=None, provincia=None, after_id=0, limit=100):
+        """
+        Restituisce una pagina di persone con paginazione per chiave (keyset): ogni pagina parte
+        dall'ultima riga della precedente con una ricerca sull'indice, invece di scorrere le righe
+        già lette come farebbe OFFSET. Senza filtri le righe sono in ordine di id, con un filtro
+        nell'ordine dell'indice usato (vedi `_build_query()`).
+        Args:
+            cognome (str, optional): Prefisso del cognome (maiuscole/minuscole distinte).
+            email (str, optional): Prefisso dell'email.
+            citta (str, optional): Prefisso della città.
+            cap (str, optional): CAP esatto.
+            provincia (str, optional): Sigla esatta della provincia (es. "MI").
+            after_id (int): Id dell'ultima riga della pagina precedente. Default: 0 (prima pagina).
+            Se quella riga viene eliminata tra una pagina e l'altra la paginazione si interrompe.
+            limit (int): Numero massimo di righe della pagina.
+        Returns:
+            tuple[list[tuple], int | None]: Le righe della pagina e l'`after_id` della pagina
+            successiva (None se non ci sono altre righe).
+        """
+        sql, params = self._build_query(cognome, email, citta, cap, provincia, after_id)
+        sql += " LIMIT ?"
+        start = time.perf_counter()
+        with self._pool.connection() as conn:
+            self._ensure_table(conn)
+            righe = conn.execute(sql, params + [limit]).fetchall()
+        self._log_query(sql, params, len(righe), time.perf_counter() - start)
+        span_corrente().add(righe=len(righe))
+        next_id = righe[-1][0] if len(righe) == limit else None
+        return righe, next_id
+
+    @misurato
+    def iter_persone(self, cognome=None, email=None, citta=None, cap=None, provincia=None, fetch_size=1000):
+        """
+        Restituisce a blocchi tutte le persone che soddisfano i filtri, nell'ordine di `query_persone()`,
+        leggendo il cursore con `fetchmany` invece di caricare tutto con `fetchall`.
+        Args:
+            cognome, email, citta, cap, provincia: Filtri come in `query_persone()`.
+            fetch_size (int): Numero di righe lette per ogni `fetchmany`.
+        Yields:
+            list[tuple]: Blocchi di al massimo `fetch_size` righe.
+        """
+        sql, params = self._build_query(cognome, email, citta, cap, provincia)
+        start = time.perf_counter()
+        totale = 0
+        with self._pool.connection() as conn:
+            self._ensure_table(conn)
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    righe = cursor.fetchmany(fetch_size)
+                    if not righe:
+                        break
+                    totale += len(righe)
+                    yield righe
+            finally:
+                cursor.close()
+                self._log_query(sql, params, totale, time.perf_counter() - start)
+
+    @misurato
+    def export_to_excel(self, excel_file="persone.xlsx", cognome=None, email=None, citta=None, cap=None,
+                        provincia=None, rows_per_sheet=None, rows_per_file=None, fetch_size=IMPORT_CHUNK_SIZE):
+        """
+        Esporta le persone del database in uno o più file Excel a memoria costante: le righe
+        della SELECT vengono lette con `fetchmany` (vedi `iter_persone()`) e passate man mano
+        a `ExcelWriter.write_to_excel_streaming()`, senza caricare la tabella in memoria.
+        Il file ha lo stesso formato di quelli importati (senza la colonna id); con estensione
+        `.parquet`, `.arrow` o `.feather` viene scritto un file colonnare (vedi `columnar`).
+        Args:
+            excel_file (str): File Excel da creare. Default: "persone.xlsx".
+            cognome, email, citta, cap, provincia: Filtri facoltativi come in `query_persone()`.
+            rows_per_sheet (int, optional): Righe massime per foglio, intestazione compresa.
+            Default: il limite di Excel.
+            rows_per_file (int, optional): Se indicato, divide l'esportazione in più file
+            "<nome>_1.xlsx", "<nome>_2.xlsx", ... con al massimo questo numero di persone.
+            fetch_size (int): Righe lette dal database per ogni `fetchmany`.
+        Returns:
+            dict | None: 'righe', 'file' (elenco dei file creati), 'secondi', 'righe_al_secondo'.
+        """
+        from excel import MAX_RIGHE_FOGLIO, ExcelWriter
+
+        if not self.db_exists():
+            print(f"⚠️ Il file {self.db_name} non esiste. Non ci sono dati da esportare.")
+            return None
+
+        start = time.perf_counter()
+        righe = (riga[1:] for blocco in self.iter_persone(cognome, email, citta, cap, provincia, fetch_size)
+                 for riga in blocco)
+        base, estensione = os.path.splitext(excel_file)
+        file_creati = []
+        totale = 0
+        try:
+            prima = next(righe, None)
+            while True:
+                if rows_per_file is None:
+                    nome, parte = excel_file, righe
+                else:
+                    nome = f"{base}_{len(file_creati) + 1}{estensione}"
+                    parte = itertools.islice(righe, rows_per_file - 1)
+                if prima is not None:
+                    parte = itertools.chain([prima], parte)
+                if estensione.lower() in FORMATI:
+                    stats = ColumnarWriter(nome).write(_a_blocchi(parte, fetch_size), batch_size=fetch_size)
+                else:
+                    stats = ExcelWriter(nome).write_to_excel_streaming(_a_blocchi(parte, fetch_size),
+                                                                       rows_per_sheet or MAX_RIGHE_FOGLIO)
+                file_creati.append(nome)
+                totale += stats["righe"]
+                prima = next(righe, None)
+                if prima is None:
+                    break
+        except Exception as e:
+            print(f"❌ Errore durante l'esportazione in Excel: {e}")
+            return None
+        finally:
+            righe.close()
+
+        secondi = time.perf_counter() - start
+        return {
+            "righe": totale,
+            "file": file_creati,
+            "secondi": secondi,
+            "righe_al_secondo": totale / secondi if secondi else 0.0,
+        }
+
+    @misurato
+    def explain_query(self, cognome=None, email=None, citta=None, cap=None, provincia=None, after_id=0):
+        """
+        Restituisce il piano di esecuzione SQLite della query con i filtri indicati,
+        utile per verificare che venga usato un indice e non una scansione completa
+        (né un ordinamento, "USE TEMP B-TREE FOR ORDER BY").
+        Args:
+            after_id (int): Se indicato, il piano delle pagine successive alla prima.
+        Returns:
+            list[str]: Righe di `EXPLAIN QUERY PLAN`.
+        """
+        sql, params = self._build_query(cognome, email, citta, cap, provincia, after_id)
+        with self._pool.connection() as conn:
+            self._ensure_table(conn)
+            return [riga[3] for riga in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    def _build_query(self, cognome, email, citta, cap, provincia=None, after_id=0):
+        """
+        Costruisce la SELECT con i filtri richiesti e la condizione di paginazione.
+        I prefissi diventano intervalli `>= prefisso AND < prefisso successivo`, così SQLite può
+        usare gli indici; l'indice del filtro più selettivo viene imposto con INDEXED BY, altrimenti
+        senza LIMIT SQLite preferirebbe scorrere tutta la tabella in ordine di id.
+        Le righe sono restituite nell'ordine di quell'indice (le sue colonne, poi id) e non di id,
+        che richiederebbe di ordinare tutte le righe trovate a ogni pagina. Le pagine successive
+        ripartono dalla posizione nell'indice della riga `after_id`, letta per chiave primaria:
+        `(colonne, id) > (riga after_id)` con il limite superiore del filtro è una ricerca O(log n).
+        Il filtro stesso e gli altri filtri restano come controlli con `+colonna`, che SQLite non
+        usa per scegliere l'intervallo dell'indice né considera costanti per l'ordinamento.
+        Returns:
+            tuple[str, list]: SQL e parametri (senza LIMIT).
+        """
+        valori = {"cognome": cognome, "email": email, "citta": citta, "cap": cap, "provincia": provincia}
+        condizioni, params = [], []
+        indexed_by, ordine = "", "id"
+        for nome, (colonna, prefisso, indice) in FILTRI.items():
+            valore = valori[nome]
+            if valore is None or valore == "":
+                continue
+            if not indexed_by:
+                indexed_by, ordine = f" INDEXED BY {indice}", f"{INDICI[indice]}, id"
+                if after_id:
+                    superiore = valore[:-1] + chr(ord(valore[-1]) + 1) if prefisso else valore
+                    condizioni.append(f"({ordine}) > (SELECT {ordine} FROM persone WHERE id = ?)")
+                    condizioni.append(f"{colonna} {'<' if prefisso else '<='} ?")
+                    params += [after_id, superiore]
+                    colonna = "+" + colonna
+            else:
+                colonna = "+" + colonna
+            if prefisso:
+                condizioni.append(f"{colonna} >= ? AND {colonna} < ?")
+                params += [valore, valore[:-1] + chr(ord(valore[-1]) + 1)]
+            else:
+                condizioni.append(f"{colonna} = ?")
+                params.append(valore)
+        if not indexed_by:
+            condizioni.append("id > ?")
+            params.append(after_id)
+        return f"SELECT * FROM persone{indexed_by} WHERE {' AND '.join(condizioni)} ORDER BY {ordine}", params
+
+    @misurato
+    def query_conteggi(self, provincia=None, per_citta=False):
+        """
+        Restituisce il numero di persone per provincia o per città leggendo la tabella
+        `persone_conteggi`, mantenuta aggiornata a ogni inserimento: non serve scorrere `persone`.
+        Args:
+            provincia (str, optional): Solo la provincia indicata (con `per_citta`, le sue città).
+            per_citta (bool): Se True conta per provincia e città, altrimenti solo per provincia.
+        Returns:
+            list[tuple]: Righe (provincia, persone) oppure (provincia, città, persone), in ordine alfabetico.
+        """
+        condizione, params = ("WHERE Provincia = ?", [provincia]) if provincia is not None else ("", [])
+        if per_citta:
+            sql = f"SELECT Provincia, Citta, Persone FROM persone_conteggi {condizione} ORDER BY Provincia, Citta"
+        else:
+            sql = (f"SELECT Provincia, SUM(Persone) FROM persone_conteggi {condizione} "
+                   f"GROUP BY Provincia ORDER BY Provincia")
+        start = time.perf_counter()
+        with self._pool.connection() as conn:
+            self._ensure_table(conn)
+            righe = conn.execute(sql, params).fetchall()
+        self._log_query(sql, params, len(righe), time.perf_counter() - start)
+        return righe
+
+    @misurato
+    def query_persone_cifrate(self, email=None, telefono=None, indirizzo=None, limit=100):
+        """
+        Cerca per uguaglianza nella tabella `persone_cifrate` usando gli indici ciechi:
+        il valore cercato viene trasformato nel suo HMAC e confrontato con la colonna indicizzata,
+        senza decifrare la tabella. Vengono decifrate solo le righe restituite.
+        Args:
+            email (str, optional): Email esatta (maiuscole/minuscole indifferenti).
+            telefono (str, optional): Numero di telefono esatto (spazi ignorati).
+            indirizzo (str, optional): Indirizzo esatto.
+            limit (int): Numero massimo di righe restituite.
+        Returns:
+            list[tuple]: Righe (id, nome, cognome, indirizzo, email, telefono) in chiaro, in ordine di id.
+        """
+        cifratore = self._cifratore()
+        valori = {"email": email, "telefono": telefono, "indirizzo": indirizzo}
+        condizioni, params = [], []
+        for campo in CAMPI_CIFRATI:
+            if valori[campo] is not None:
+                condizioni.append(f"{campo.capitalize()}_hmac = ?")
+                params.append(cifratore.blind_index(campo, valori[campo]))
+        if not condizioni:
+            raise ValueError("indicare almeno uno tra email, telefono e indirizzo")
+        sql = (f"SELECT id, Nome, Cognome, Indirizzo, Email, Telefono FROM persone_cifrate "
+               f"WHERE {' AND '.join(condizioni)} ORDER BY id LIMIT ?")
+        start = time.perf_counter()
+        with self._pool.connection() as conn:
+            _crea_tabella_cifrata(conn)
+            righe = conn.execute(sql, params + [limit]).fetchall()
+        self._log_query(sql, ["<hmac>"] * len(params), len(righe), time.perf_counter() - start)
+        return [cifratore.decrypt_row(riga) for riga in righe]
+
+    def _cifratore(self):
+        """
+        Restituisce il FieldCipher della chiave `field_key`, creato di nuovo solo se la chiave cambia.
+        """
+        chiave, generata = key_manager.get_or_create(self.field_key)
+        if generata:
+            print(f"🔐 Key generata e salvata in {self.field_key}")
+        if self._field_cipher is None or self._field_cipher[0] is not chiave:
+            self._field_cipher = (chiave, FieldCipher(chiave.key))
+        return self._field_cipher[1]
+
+    def _log_query(self, sql, params, righe, secondi):
+        """
+        Registra in `query_log` il tempo di esecuzione di una query.
+        """
+        self.query_log.append({"sql": sql, "params": params, "righe": righe, "secondi": secondi})
+
+    @misurato
     def delete_all_data(self):
         """
         Elimina tutti i dati dalla tabella `persone` e resetta l'autoincrement.
@@ -269,24 +871,312 @@ class SQLiteWriter:
             - Rimuove tutte le righe dalla tabella.
             - Reimposta il contatore ID a 1.
         """
-        if not os.path.exists(self.db_name):
+        if not self.db_exists():
            return
 
         try:
-            self.connect()
-            self.cursor.execute("DELETE FROM persone;")
-            self.cursor.execute("DELETE FROM sqlite_sequence WHERE name='persone';")
-            self.connection.commit()
-            self.connection.close()
+            with self._pool.connection() as conn:
+                # Senza i trigger dei conteggi SQLite svuota la tabella senza visitare ogni riga
+                _sospendi_conteggi(conn)
+                conn.execute("DELETE FROM persone;")
+                conn.execute("DELETE FROM sqlite_sequence WHERE name='persone';")
+                _crea_conteggi(conn)
+                _invalida_sync(conn)
           #  print("✅ Tutte le persone sono state eliminate dal database!")
 
         except Exception as e:
             print(f"❌ Errore durante l'eliminazione dei dati: {e}")
 
-def close(self):
+    def close(self):
         """
-        Chiude la connessione al database se esiste
+        Chiude le connessioni del pool e l'eventuale connessione aperta con `connect()`.
         """
+        self._pool.close()
+        self._schema_generation = None
         if hasattr(self, 'connection'):
             self.connection.close()
+            del self.connection
             print("✅ Connessione SQLite chiusa")
+
+
+def _invalida_sync(conn, indici=False):
+    """
+    Dimentica lo stato delle sincronizzazioni dopo una modifica della tabella `persone` fatta
+    senza `sync_from_excel()`, così la sincronizzazione successiva non salta il file.
+    Args:
+        conn (sqlite3.Connection): Connessione in uso.
+        indici (bool): Se True elimina anche gli indici univoci creati per le chiavi naturali.
+    """
+    conn.execute("DROP TABLE IF EXISTS sync_stato")
+    if indici:
+        nomi = conn.execute("SELECT name FROM sqlite_master WHERE type='index' "
+                            "AND name LIKE 'idx_persone_sync_%'").fetchall()
+        for (nome,) in nomi:
+            conn.execute(f"DROP INDEX {nome}")
+
+
+def _sync_rows(conn, excel_writer, backend, key, colonna, altre):
+    """
+    Esegue la sincronizzazione di `SQLiteWriter.sync_from_excel()` in una transazione già aperta:
+    carica le righe del file in una tabella temporanea indicizzata sulla chiave e applica
+    inserimenti, aggiornamenti ed eliminazioni con poche istruzioni SQL.
+    Returns:
+        dict: Conteggi 'inserite', 'aggiornate', 'eliminate', 'invariate', 'scartate'.
+    """
+    colonne = ", ".join(campo.capitalize() for campo in CAMPI)
+    segnaposto = ", ".join("?" * len(CAMPI))
+    posizioni = _posizioni_colonne(excel_writer.read_excel_header(backend))
+    indice_chiave = CAMPI.index(key)
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS sync_excel ({colonne}, PRIMARY KEY ({colonna}))")
+    conn.execute("DELETE FROM temp.sync_excel")
+
+    lette = 0
+    for batch in _iter_import_batches(excel_writer.iter_excel_rows(backend, chunk_size=IMPORT_CHUNK_SIZE),
+                                      posizioni):
+        lette += len(batch)
+        conn.executemany(f"INSERT OR REPLACE INTO temp.sync_excel ({colonne}) VALUES ({segnaposto})",
+                         (riga for riga in batch if riga[indice_chiave] not in (None, "")))
+    nel_file = conn.execute("SELECT COUNT(*) FROM temp.sync_excel").fetchone()[0]
+
+    diversa = " OR ".join(f"p.{col} IS NOT s.{col}" for col in altre)
+    inserite = conn.execute(f"SELECT COUNT(*) FROM temp.sync_excel s WHERE NOT EXISTS "
+                            f"(SELECT 1 FROM persone p WHERE p.{colonna} = s.{colonna})").fetchone()[0]
+    aggiornate = conn.execute(f"SELECT COUNT(*) FROM temp.sync_excel s JOIN persone p "
+                              f"ON p.{colonna} = s.{colonna} WHERE {diversa}").fetchone()[0]
+
+    # "WHERE true" evita l'ambiguità tra ON CONFLICT e una JOIN ... ON nella SELECT
+    aggiorna = ", ".join(f"{col} = excluded.{col}" for col in altre)
+    cambiata = " OR ".join(f"persone.{col} IS NOT excluded.{col}" for col in altre)
+    conn.execute(f"INSERT INTO persone ({colonne}) SELECT {colonne} FROM temp.sync_excel WHERE true "
+                 f"ON CONFLICT({colonna}) DO UPDATE SET {aggiorna} WHERE {cambiata}")
+    eliminate = conn.execute(f"DELETE FROM persone WHERE NOT EXISTS "
+                             f"(SELECT 1 FROM temp.sync_excel s WHERE s.{colonna} = persone.{colonna})").rowcount
+    conn.execute("DROP TABLE temp.sync_excel")
+    return {
+        "inserite": inserite,
+        "aggiornate": aggiornate,
+        "eliminate": eliminate,
+        "invariate": nel_file - inserite - aggiornate,
+        "scartate": lette - nel_file,
+    }
+
+
+def open_reader(path):
+    """
+    Restituisce il lettore adatto al file da importare: `ColumnarWriter` per i file Parquet/Arrow,
+    altrimenti `ExcelWriter`. Entrambi offrono `read_excel_header()` e `iter_excel_rows()`.
+    L'`ExcelWriter` non usa la cache dei workbook: le importazioni leggono il file una volta
+    sola, e la cache terrebbe in memoria fino a `cache.MAX_BYTES` di righe.
+    """
+    from excel import ExcelWriter
+
+    if os.path.splitext(path)[1].lower() in FORMATI:
+        return ColumnarWriter(path)
+    return ExcelWriter(path, cache=False)
+
+
+def iter_file_batches(path, backend="auto", chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Legge le persone di un file Excel, Parquet o Arrow a blocchi, con i valori ordinati secondo
+    `CAMPI` qualunque sia l'ordine delle colonne del file (l'indirizzo strutturato, se manca,
+    viene ricavato da Indirizzo).
+    Args:
+        path (str): File da leggere.
+        backend (str): Backend di lettura del file Excel (vedi `ExcelWriter.iter_excel_rows()`).
+        chunk_size (int): Righe per blocco.
+    Yields:
+        list[tuple]: Blocchi di righe.
+    Raises:
+        ValueError: Se mancano colonne necessarie.
+    """
+    lettore = open_reader(path)
+    posizioni = _posizioni_colonne(lettore.read_excel_header(backend))
+    yield from _iter_import_batches(lettore.iter_excel_rows(backend, chunk_size=chunk_size), posizioni)
+
+
+def _a_blocchi(righe, dimensione):
+    """
+    Raggruppa un iteratore di righe in liste di al massimo `dimensione` righe.
+    """
+    righe = iter(righe)
+    while True:
+        blocco = list(itertools.islice(righe, dimensione))
+        if not blocco:
+            return
+        yield blocco
+
+
+def _posizioni_colonne(columns):
+    """
+    Restituisce la posizione di ciascuno dei `CAMPI` tra le colonne indicate (es. l'intestazione Excel).
+    Se manca una delle colonne dell'indirizzo strutturato (file del formato precedente) restituisce
+    solo quelle dei `CAMPI_BASE`: le altre vengono ricavate da Indirizzo da `_iter_import_batches()`.
+    Raises:
+        ValueError: Se manca una delle colonne di base.
+    """
+    colonne = [col.strip().lower() for col in columns]
+    mancanti = [campo for campo in CAMPI_BASE if campo not in colonne]
+    if mancanti:
+        raise ValueError(f"colonne mancanti nei dati da importare: {mancanti}")
+    campi = CAMPI if all(campo in colonne for campo in CAMPI_INDIRIZZO) else CAMPI_BASE
+    return [colonne.index(campo) for campo in campi]
+
+
+def _copia_coerente(db_name, path):
+    """
+    Scrive in `path` una copia del database letta in un'unica transazione (`VACUUM INTO`):
+    comprende le modifiche confermate ancora nel WAL, non blocca le altre connessioni ed è
+    in modalità rollback journal, quindi si apre anche deserializzata in memoria.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    try:
+        conn.execute("VACUUM INTO ?", (path,))
+    finally:
+        conn.close()
+
+
+def _sha256_file(path, chunk_size=1024 * 1024):
+    """
+    Calcola l'hash SHA-256 di un file leggendolo a blocchi.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for blocco in iter(lambda: file.read(chunk_size), b""):
+            digest.update(blocco)
+    return digest.hexdigest()
+
+
+def _crea_tabella_cifrata(conn):
+    """
+    Crea, se mancano, la tabella `persone_cifrate` e gli indici sulle colonne HMAC.
+    """
+    conn.execute(SQL_CREATE_TABLE_CIFRATA)
+    for indice, colonna in INDICI_CIFRATI.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {indice} ON persone_cifrate({colonna})")
+
+
+def _aggiorna_schema(conn):
+    """
+    Aggiorna una tabella `persone` creata da versioni precedenti: aggiunge le colonne
+    dell'indirizzo strutturato, le compila ricavandole da Indirizzo ed elimina gli indici
+    sulle espressioni che non servono più.
+    """
+    presenti = {riga[1].lower() for riga in conn.execute("PRAGMA table_info(persone)")}
+    mancanti = [campo for campo in CAMPI_INDIRIZZO if campo not in presenti]
+    if mancanti:
+        for campo in mancanti:
+            conn.execute(f"ALTER TABLE persone ADD COLUMN {campo.capitalize()} TEXT")
+        conn.create_function("parte_indirizzo", 2, lambda indirizzo, i: scomponi_indirizzo(indirizzo)[i],
+                             deterministic=True)
+        assegnazioni = ", ".join(f"{campo.capitalize()} = parte_indirizzo(Indirizzo, {i})"
+                                 for i, campo in enumerate(CAMPI_INDIRIZZO))
+        conn.execute(f"UPDATE persone SET {assegnazioni}")
+        # La tabella dei conteggi va ricalcolata con le nuove colonne
+        _sospendi_conteggi(conn)
+    for indice in INDICI_OBSOLETI:
+        conn.execute(f"DROP INDEX IF EXISTS {indice}")
+
+
+def _sospendi_conteggi(conn):
+    """
+    Elimina i trigger che aggiornano `persone_conteggi`, per le operazioni massive su `persone`.
+    I conteggi vengono poi ricalcolati da `_crea_conteggi()`.
+    """
+    for trigger in TRIGGER_CONTEGGI:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def _crea_conteggi(conn):
+    """
+    Crea, se mancano, la tabella `persone_conteggi` e i trigger che la aggiornano a ogni
+    inserimento, modifica ed eliminazione in `persone`. Se la tabella è nuova o i trigger
+    mancavano (es. dopo `_sospendi_conteggi()`) i conteggi vengono ricalcolati da zero.
+    """
+    conn.execute(SQL_CREATE_CONTEGGI)
+    presenti = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger' "
+                                                 "AND tbl_name='persone'")}
+    if all(trigger in presenti for trigger in TRIGGER_CONTEGGI):
+        return
+    _sospendi_conteggi(conn)
+    conn.execute("DELETE FROM persone_conteggi")
+    conn.execute("INSERT INTO persone_conteggi SELECT ifnull(Provincia, ''), ifnull(Citta, ''), COUNT(*) "
+                 "FROM persone GROUP BY 1, 2")
+    for trigger, definizione in TRIGGER_CONTEGGI.items():
+        conn.execute(f"CREATE TRIGGER {trigger} {definizione}")
+
+
+def _bulk_load(conn, data, posizioni, replace, cifratore=None):
+    """
+    Esegue l'importazione massiva di `SQLiteWriter.bulk_insert()` su una connessione già aperta,
+    in un'unica transazione esplicita annullata in caso di errore. Con un `cifratore`
+    (FieldCipher) le righe vengono cifrate e scritte nella tabella `persone_cifrate`.
+    Returns:
+        tuple[int, float, float]: Righe inserite, secondi di inserimento e di creazione degli indici.
+    """
+    if cifratore is None:
+        tabella, create, insert, indici = "persone", SQL_CREATE_TABLE, SQL_INSERT, INDICI
+    else:
+        tabella, create, insert, indici = ("persone_cifrate", SQL_CREATE_TABLE_CIFRATA,
+                                           SQL_INSERT_CIFRATA, INDICI_CIFRATI)
+    inserimento = 0.0
+    totale = 0
+    try:
+        conn.execute("BEGIN")
+        conn.execute(create)
+        for indice in indici:
+            conn.execute(f"DROP INDEX IF EXISTS {indice}")
+        if cifratore is None:
+            _aggiorna_schema(conn)
+            # I conteggi vengono ricalcolati una sola volta al termine invece che riga per riga
+            _sospendi_conteggi(conn)
+            # Gli indici univoci della sincronizzazione verrebbero violati da chiavi duplicate
+            _invalida_sync(conn, indici=True)
+        if replace:
+            conn.execute(f"DELETE FROM {tabella}")
+            conn.execute(f"DELETE FROM sqlite_sequence WHERE name='{tabella}'")
+
+        for batch in _iter_import_batches(data, posizioni):
+            t = time.perf_counter()
+            if cifratore is not None:
+                batch = cifratore.encrypt_rows(batch)
+            conn.executemany(insert, batch)
+            inserimento += time.perf_counter() - t
+            totale += len(batch)
+
+        t = time.perf_counter()
+        for indice, colonne_indice in indici.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {indice} ON {tabella}({colonne_indice})")
+        if cifratore is None:
+            _crea_conteggi(conn)
+        secondi_indici = time.perf_counter() - t
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return totale, inserimento, secondi_indici
+
+
+def _iter_import_batches(data, posizioni=None):
+    """
+    Restituisce i batch da importare. Se sono indicate le `posizioni` delle colonne,
+    `data` deve contenere batch di tuple (es. da `ExcelWriter.iter_excel_rows()`) i cui
+    valori vengono riordinati secondo la tabella; i batch già nell'ordine giusto passano senza copie.
+    """
+    if posizioni is None:
+        yield from iter_row_batches(data, IMPORT_CHUNK_SIZE)
+        return
+
+    larghezza = len(CAMPI)
+    identita = posizioni == list(range(larghezza))
+    vuote = (None,) * (max(posizioni) + 1)
+    for batch in data:
+        if identita and all(len(riga) == larghezza for riga in batch):
+            yield batch
+        elif len(posizioni) < larghezza:
+            # Senza indirizzo strutturato: viene ricavato da Indirizzo
+            yield [completa_riga(tuple((riga + vuote)[pos] for pos in posizioni)) for riga in batch]
+        else:
+            yield [tuple((riga + vuote)[pos] for pos in posizioni) for riga in batch]
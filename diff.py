@@ -0,0 +1,319 @@
+"""
+Motore di confronto incrementale tra il file Excel e la tabella SQLite `persone`.
+
+Entrambe le sorgenti vengono lette in streaming e ogni riga viene ridotta a un digest
+(BLAKE2b a 16 byte) indicizzato per chiave: `id` (la posizione della riga nel file Excel
+se il file non ha una colonna `id`) oppure una chiave naturale configurabile come `email`.
+La memoria occupata dipende quindi solo dall'indice chiave → digest e non dal contenuto
+delle righe. In un'unica passata vengono individuate le righe inserite (solo in Excel),
+eliminate (solo nel DB) e modificate (stessa chiave, contenuto diverso).
+
+Gli indici possono essere salvati su un file accanto al file Excel: a un nuovo confronto
+viene riletta solo la sorgente il cui file è cambiato (dimensione o data di modifica).
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+
+# Versione del formato del file indice
+_VERSIONE_INDICE = 1
+# Separatore tra i campi usato per calcolare il digest di una riga
+_SEPARATORE = "\x1f"
+
+
+class DiffResult:
+    """
+    Risultato di un confronto.
+    Attributi:
+        key (str): Chiave usata per abbinare le righe.
+        inserted (list): Chiavi presenti solo nel file Excel.
+        deleted (list): Chiavi presenti solo nel database.
+        modified (list): Chiavi presenti in entrambi ma con contenuto diverso.
+        unchanged (int): Numero di righe identiche.
+        duplicates (int): Righe scartate perché con chiave già vista (vale la prima).
+        rescanned (list[str]): Sorgenti rilette ("excel", "db"); le altre provengono dall'indice salvato.
+    """
+
+    def __init__(self, key, inserted, deleted, modified, unchanged, duplicates, rescanned):
+        self.key = key
+        self.inserted = inserted
+        self.deleted = deleted
+        self.modified = modified
+        self.unchanged = unchanged
+        self.duplicates = duplicates
+        self.rescanned = rescanned
+
+    def has_differences(self):
+        """
+        Returns:
+            bool: True se esiste almeno una riga inserita, eliminata o modificata.
+        """
+        return bool(self.inserted or self.deleted or self.modified)
+
+    def __repr__(self):
+        return (f"DiffResult(key={self.key!r}, inserted={len(self.inserted)}, deleted={len(self.deleted)}, "
+                f"modified={len(self.modified)}, unchanged={self.unchanged})")
+
+
+class DiffEngine:
+    """
+    Confronta un file Excel con la tabella `persone` di un database SQLite tramite digest per riga.
+    Attributi:
+        excel_writer (ExcelWriter): Writer del file Excel da confrontare (ne usa i backend di lettura);
+        va bene anche un `columnar.ColumnarWriter`, che offre gli stessi metodi di lettura.
+        db_name (str): Nome del database SQLite.
+        key (str): Colonna chiave, "id" oppure una chiave naturale (es. "email").
+        index_file (str | None): File in cui salvare gli indici; None per non salvarli.
+        backend (str): Backend di lettura del file Excel (vedi `ExcelWriter.iter_excel_rows()`).
+    """
+
+    def __init__(self, excel_writer, db_name="persone.db", key="id", index_file=None, backend="auto"):
+        """
+        Inizializza il motore di confronto.
+        Args:
+            excel_writer (ExcelWriter): Writer del file Excel da confrontare.
+            db_name (str): Nome del database SQLite.
+            key (str): Colonna chiave. Default: "id".
+            index_file (str, optional): File indice; se None gli indici non vengono salvati.
+            backend (str): Backend di lettura del file Excel.
+        """
+        self.excel_writer = excel_writer
+        self.db_name = db_name
+        self.key = key.lower()
+        self.index_file = index_file
+        self.backend = backend
+
+    def columns(self):
+        """
+        Restituisce le colonne confrontate: quelle dell'intestazione Excel, in minuscolo, esclusa `id`.
+        Returns:
+            list[str]: Nomi delle colonne.
+        """
+        return [col.lower() for col in self.excel_writer.read_excel_header(self.backend) if col.lower() != "id"]
+
+    def compare(self):
+        """
+        Esegue il confronto, riusando gli indici salvati per le sorgenti non modificate.
+        Returns:
+            DiffResult: Righe inserite, eliminate e modificate.
+        Raises:
+            ValueError: Se le colonne del file Excel o la chiave non esistono nel database.
+        """
+        salvato = self._load_index()
+        rescanned = []
+
+        impronta_excel = _impronta(self.excel_writer.filename)
+        if salvato.get("excel", (None,))[0] == impronta_excel:
+            colonne, excel_index, duplicati_excel = salvato["excel"][1:]
+        else:
+            colonne = self.columns()
+            excel_index, duplicati_excel = self._scan_excel(colonne)
+            rescanned.append("excel")
+
+        # In WAL le modifiche confermate restano in "<db>-wal" finché non vengono riportate nel file
+        impronta_db = _impronta(self.db_name), _impronta(self.db_name + "-wal")
+        if salvato.get("db", (None, None))[:2] == (impronta_db, colonne):
+            db_index, duplicati_db = salvato["db"][2:]
+        else:
+            db_index, duplicati_db = self._scan_db(colonne)
+            rescanned.append("db")
+
+        if rescanned and self.index_file:
+            self._save_index({
+                "excel": (impronta_excel, colonne, excel_index, duplicati_excel),
+                "db": (impronta_db, colonne, db_index, duplicati_db),
+            })
+
+        inserted, modified = [], []
+        unchanged = 0
+        for chiave, digest in excel_index.items():
+            digest_db = db_index.get(chiave)
+            if digest_db is None:
+                inserted.append(chiave)
+            elif digest_db != digest:
+                modified.append(chiave)
+            else:
+                unchanged += 1
+        deleted = [chiave for chiave in db_index if chiave not in excel_index]
+
+        return DiffResult(self.key, inserted, deleted, modified, unchanged,
+                          duplicati_excel + duplicati_db, rescanned)
+
+    def excel_rows(self, keys, limit=None):
+        """
+        Restituisce le righe del file Excel corrispondenti alle chiavi indicate.
+        Args:
+            keys (Iterable): Chiavi da cercare.
+            limit (int, optional): Numero massimo di righe restituite.
+        Returns:
+            dict: Chiave → dizionario colonna/valore.
+        """
+        cercate = set(list(keys)[:limit] if limit is not None else keys)
+        if not cercate:
+            return {}
+        colonne = [col.lower() for col in self.excel_writer.read_excel_header(self.backend)]
+        trovate = {}
+        for chiave, riga in self._iter_excel_keyed(colonne):
+            if chiave in cercate and chiave not in trovate:
+                trovate[chiave] = dict(zip(colonne, riga))
+                if len(trovate) == len(cercate):
+                    break
+        return trovate
+
+    def db_rows(self, keys, limit=None):
+        """
+        Restituisce le righe del database corrispondenti alle chiavi indicate.
+        Args:
+            keys (Iterable): Chiavi da cercare.
+            limit (int, optional): Numero massimo di righe restituite.
+        Returns:
+            dict: Chiave → dizionario colonna/valore.
+        """
+        cercate = list(keys)[:limit] if limit is not None else list(keys)
+        trovate = {}
+        conn = sqlite3.connect(self.db_name)
+        try:
+            cursor = conn.cursor()
+            for chiave in cercate:
+                cursor.execute(f"SELECT * FROM persone WHERE {self.key} IS ? LIMIT 1", (chiave,))
+                riga = cursor.fetchone()
+                if riga is not None:
+                    trovate[chiave] = dict(zip([d[0].lower() for d in cursor.description], riga))
+        finally:
+            conn.close()
+        return trovate
+
+    def print_report(self, result, max_rows=20, sorgente="Excel"):
+        """
+        Stampa le righe presenti solo nel file, solo nel DB e quelle modificate.
+        Args:
+            result (DiffResult): Risultato di `compare()`.
+            max_rows (int): Numero massimo di righe stampate per ciascuna categoria.
+            sorgente (str): Nome del file confrontato usato nei messaggi (es. "Excel", "Parquet").
+        """
+        print(f"\n📄 Righe presenti solo in {sorgente}: {len(result.inserted)}")
+        for chiave, riga in self.excel_rows(result.inserted, limit=max_rows).items():
+            print(f"{chiave}, {riga}")
+        print(f"\n📄 Righe presenti solo nel DB: {len(result.deleted)}")
+        for chiave, riga in self.db_rows(result.deleted, limit=max_rows).items():
+            print(f"{chiave}, {riga}")
+        print(f"\n✏️ Righe modificate: {len(result.modified)}")
+        righe_file = self.excel_rows(result.modified, limit=max_rows)
+        for chiave, riga in self.db_rows(result.modified, limit=max_rows).items():
+            print(f"{chiave}, DB: {riga}")
+            print(f"{chiave}, {sorgente}: {righe_file.get(chiave)}")
+        if result.duplicates:
+            print(f"⚠️ {result.duplicates} righe ignorate perché con chiave '{self.key}' duplicata.")
+
+    def _iter_excel_keyed(self, colonne):
+        """
+        Restituisce le coppie (chiave, riga) del file Excel. Se la chiave è "id" e il file
+        non ha una colonna `id`, la chiave è la posizione della riga (1, 2, ...), che coincide
+        con l'id assegnato dall'importazione in SQLite.
+        """
+        if self.key in colonne:
+            pos = colonne.index(self.key)
+            converti = int if self.key == "id" else str
+            for chunk in self.excel_writer.iter_excel_rows(self.backend):
+                for riga in chunk:
+                    yield converti(riga[pos]) if riga[pos] is not None else None, riga
+        elif self.key == "id":
+            posizione = 0
+            for chunk in self.excel_writer.iter_excel_rows(self.backend):
+                for riga in chunk:
+                    posizione += 1
+                    yield posizione, riga
+        else:
+            raise ValueError(f"La colonna chiave '{self.key}' non è presente nel file Excel.")
+
+    def _scan_excel(self, colonne):
+        """
+        Legge il file Excel in streaming e costruisce l'indice chiave → digest.
+        """
+        header = [col.lower() for col in self.excel_writer.read_excel_header(self.backend)]
+        posizioni = [header.index(col) for col in colonne]
+        indice = {}
+        duplicati = 0
+        for chiave, riga in self._iter_excel_keyed(header):
+            if chiave in indice:
+                duplicati += 1
+                continue
+            indice[chiave] = _digest(riga[pos] if pos < len(riga) else None for pos in posizioni)
+        return indice, duplicati
+
+    def _scan_db(self, colonne, fetch_size=10_000):
+        """
+        Legge la tabella `persone` in streaming e costruisce l'indice chiave → digest.
+        """
+        conn = sqlite3.connect(self.db_name)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(persone)")
+            colonne_db = {riga[1].lower() for riga in cursor.fetchall()}
+            mancanti = [col for col in colonne + [self.key] if col not in colonne_db]
+            if mancanti:
+                raise ValueError(f"le seguenti colonne non sono presenti nel DB: {mancanti}")
+
+            cursor.execute(f"SELECT {self.key}, {', '.join(colonne)} FROM persone")
+            indice = {}
+            duplicati = 0
+            while True:
+                righe = cursor.fetchmany(fetch_size)
+                if not righe:
+                    break
+                for riga in righe:
+                    chiave = riga[0] if self.key == "id" or riga[0] is None else str(riga[0])
+                    if chiave in indice:
+                        duplicati += 1
+                        continue
+                    indice[chiave] = _digest(riga[1:])
+            return indice, duplicati
+        finally:
+            conn.close()
+
+    def _load_index(self):
+        """
+        Carica gli indici salvati, se compatibili con la configurazione corrente.
+        """
+        if not self.index_file or not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, "rb") as file:
+                salvato = pickle.load(file)
+        except Exception:
+            return {}
+        if (salvato.get("versione") != _VERSIONE_INDICE or salvato.get("key") != self.key
+                or salvato.get("backend") != self.backend):
+            return {}
+        return salvato
+
+    def _save_index(self, indici):
+        """
+        Salva gli indici in modo atomico (file temporaneo + rinomina).
+        """
+        indici.update(versione=_VERSIONE_INDICE, key=self.key, backend=self.backend)
+        temporaneo = self.index_file + ".tmp"
+        with open(temporaneo, "wb") as file:
+            pickle.dump(indici, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaneo, self.index_file)
+
+
+def _digest(valori):
+    """
+    Calcola il digest stabile di una riga: le celle vuote valgono come stringa vuota.
+    """
+    testo = _SEPARATORE.join("" if valore is None else str(valore) for valore in valori)
+    return hashlib.blake2b(testo.encode("utf-8"), digest_size=16).digest()
+
+
+def _impronta(path):
+    """
+    Restituisce l'impronta di un file (percorso assoluto, dimensione, data di modifica),
+    oppure None se il file non esiste.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
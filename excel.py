@@ -1,8 +1,23 @@
 import os
 import sqlite3
-import pandas as pd
-from cryptography.fernet import Fernet
-from openpyxl import Workbook
+import sys
+import time
+
+from batching import iter_row_batches
+from cache import CachedWorkbook, workbook_cache
+from keys import key_manager
+from perf import misurato, peak_rss_mb, span_corrente
+from pool import remove_wal_files
+from streamcrypto import encrypt_file, format_stats
+
+# Numero massimo di righe di un foglio Excel (intestazione compresa)
+MAX_RIGHE_FOGLIO = 1_048_576
+# Intestazione dei fogli Excel, nello stesso ordine di `batching.CAMPI`
+INTESTAZIONE = ["Nome", "Cognome", "Indirizzo", "Email", "Telefono", "Via", "Numero", "Cap", "Citta", "Provincia"]
+# Backend di lettura disponibili: "auto" sceglie il più veloce installato
+BACKENDS = ("auto", "calamine", "openpyxl", "pandas")
+# Numero di righe per blocco restituito dai backend di lettura
+CHUNK_SIZE = 5000
 
 class ExcelWriter:
     """
@@ -10,80 +25,93 @@ class ExcelWriter:
     contenente dati personali inoltre la sua comparazione con un database SQLite.
     Attributi:
         filename (str): Nome del file Excel da gestire. Default: "persone.xlsx"
+        cache (bool): Se True le letture riusano il contenuto già letto (vedi `cache.WorkbookCache`).
+        sidecar (bool): Se True la cache viene salvata anche su disco, accanto al file Excel.
     """
-    def __init__(self, filename = "persone.xlsx"):
+    def __init__(self, filename = "persone.xlsx", cache=True, sidecar=False):
         """
         Inizializza un'istanza della classe ExcelWriter.
         Args:
             filename (str): Il nome del file Excel da gestire. Default: "persone.xlsx".
+            cache (bool): Riusa il contenuto del file finché non cambia. Default: True.
+            sidecar (bool): Salva la cache anche nel file "<filename>.cache". Default: False.
         """
         self.filename = filename
+        self.cache = cache
+        self.sidecar = sidecar
 
-    def crypto_excel(self, path_key="key.key"):
+    @misurato
+    def crypto_excel(self, path_key="key.key", remove_original=None):
         """
         Crittografa il file Excel associato all'istanza e salva il risultato come file `.enc`.
         Args:
             path_key (str): Percorso del file contenente la chiave di crittografia.
             Se non esiste, verrà generata e salvata.
+            remove_original (bool, optional): Se True elimina il file originale, se False lo mantiene,
+            senza chiedere nulla. Default: None (lo chiede all'utente).
+        Returns:
+            dict | None: Statistiche della crittografia (vedi `streamcrypto.encrypt_file()`), None in caso di errore.
         Comportamento:
             - Genera una chiave se non esiste.
-            - Cripta il file Excel (`self.filename`) e salva un file `.enc`.
+            - Cripta il file Excel (`self.filename`) a blocchi con AES-GCM (vedi `streamcrypto`) e salva un file `.enc`.
             - Chiede all'utente se eliminare il file originale dopo la crittografia.
         """
         if not os.path.exists(self.filename):
             print(f"⚠️ Il file Excel {self.filename} non esiste, impossibile crittografare.")
             return
 
-        # Genera la key se non esiste
-        if not os.path.exists(path_key):
-            key = Fernet.generate_key()
-            with open(path_key, "wb") as key_file:
-                key_file.write(key)
+        # Genera la key se non esiste (le chiavi già lette sono in cache nel key manager)
+        try:
+            chiave, generata = key_manager.get_or_create(path_key)
+        except Exception as e:
+            print(f"❌ Errore nella lettura della key {path_key}: {e}")
+            return
+        if generata:
             print(f"🔐 Key generata e salvata in {path_key}")
-        else:
-            with open(path_key, "rb") as key_file:
-                key = key_file.read()
-        fernet = Fernet(key)
-
-        # Leggi il contenuto del file excel
-        with open(self.filename, "rb") as file:
-            original = file.read()
-
-        encrypted = fernet.encrypt(original)
-
-        # Salva il file crittografato con estensione .enc
+        key = chiave.key
+        # Cifra il file excel a blocchi e salva il file crittografato con estensione .enc
         encrypted_filename = self.filename + ".enc"
-        with open(encrypted_filename, "wb") as enc_file:
-            enc_file.write(encrypted)
+        try:
+            stats = encrypt_file(self.filename, encrypted_filename, key)
+        except Exception as e:
+            print(f"❌ Errore durante la crittografia: {e}")
+            return
 
-        print(f"✅ File crittografato salvato come {encrypted_filename}")
+        print(f"✅ File crittografato salvato come {encrypted_filename} ({format_stats(stats)})")
 
-        # Chiede se eliminare il file originale
-        while True:
+        # Chiede se eliminare il file originale, se il chiamante non l'ha già deciso
+        while remove_original is None:
             scelta = input(f"❓ Vuoi eliminare il file Excel originale {self.filename}? (S/N): ").strip().lower()
-            if scelta == "s":
-                try:
-                    os.remove(self.filename)
-                    print(f"🗑️ File {self.filename} eliminato.")
-                except Exception as e:
-                    print(f"❌ Errore durante l'eliminazione di {self.filename}: {e}")
-                break
-            elif scelta == "n":
-                print(f"ℹ️ Il file {self.filename} è stato mantenuto.")
-                break
+            if scelta in ("s", "n"):
+                remove_original = scelta == "s"
             else:
                 print("⚠️ Scelta non valida, riprova.")
+        if remove_original:
+            try:
+                os.remove(self.filename)
+                print(f"🗑️ File {self.filename} eliminato.")
+            except Exception as e:
+                print(f"❌ Errore durante l'eliminazione di {self.filename}: {e}")
+        else:
+            print(f"ℹ️ Il file {self.filename} è stato mantenuto.")
+        return stats
 
-    def decrypto_excel(self, path_key="key.key", suppress_prompt=False):
+    @misurato
+    def decrypto_excel(self, path_key="key.key", suppress_prompt=False, remove_encrypted=None):
         """
         Verifica la presenza e Decrittografa un file Excel`.enc` generato da `crypto_excel()`
         dopodichè ripristina il file Excel originale.
         Args:
-            path_key (str): Percorso del file contenente la chiave di crittografia.
+            path_key (str | list[str]): Percorso del file contenente la chiave di crittografia,
+            o elenco di chiavi candidate (es. dopo una rotazione, vedi `keys.KeyManager.rotate()`).
             suppress_prompt (bool): Se True, non elimina il file `.enc` dopo la decrittografia.
+            remove_encrypted (bool, optional): Se True elimina il file `.enc`, se False lo mantiene,
+            senza chiedere nulla. Default: None (lo chiede all'utente, se non c'è `suppress_prompt`).
+        Returns:
+            dict | None: Statistiche della decrittografia, None in caso di errore.
         Comportamento:
             - Verifica la presenza di file Excel e chiave.
-            - Se la chiave è corretta ripristina il file Excel.
+            - Se la chiave è corretta ripristina il file Excel (formato a blocchi o vecchio formato Fernet).
             - Chiede se eliminare il file `.enc`.
         """
         encrypted_filename = self.filename + ".enc"
@@ -92,46 +120,38 @@ class ExcelWriter:
             print(f"⚠️ Il file crittografato {encrypted_filename} non esiste.")
             return
 
-        if not os.path.exists(path_key):
+        if not key_manager.get_many(path_key):
             print(f"⚠️ Il file della key {path_key} non esiste, impossibile decrittografare.")
             return
 
-        with open(path_key, "rb") as key_file:
-            key = key_file.read()
-
-        fernet = Fernet(key)
-
-        with open(encrypted_filename, "rb") as file_enc:
-            encrypted = file_enc.read()
-
+        # Decifra a blocchi (o dal vecchio formato Fernet): il file viene sostituito solo se tutto è valido
         try:
-            decrypted = fernet.decrypt(encrypted)
+            stats = key_manager.decrypt_file(encrypted_filename, self.filename, path_key)
         except Exception as e:
-            print(f"❌ Errore nella decrittografia: {e}")
+            print(f"❌ Errore nella decrittografia: {e or type(e).__name__}")
             return
 
-        with open(self.filename, "wb") as dec_file:
-            dec_file.write(decrypted)
-        print(f"✅ File decrittografato e salvato come {self.filename}")
+        print(f"✅ File decrittografato e salvato come {self.filename} ({format_stats(stats)})")
 
-        if suppress_prompt:
-            return
+        if remove_encrypted is None and suppress_prompt:
+            return stats
 
-        # Chiede se eliminare il file .enc al termine
-        while True:
+        # Chiede se eliminare il file .enc al termine, se il chiamante non l'ha già deciso
+        while remove_encrypted is None:
             scelta = input(f"❓ Vuoi eliminare il file crittografato {encrypted_filename}? (S/N): ").strip().lower()
-            if scelta == "s":
-                try:
-                    os.remove(encrypted_filename)
-                    print(f"🗑️ File eliminato.")
-                except Exception as e:
-                    print(f"❌ Errore durante l'eliminazione di {encrypted_filename}: {e}")
-                break
-            elif scelta == "n":
-                print(f"ℹ️ Il file è stato mantenuto.")
-                break
+            if scelta in ("s", "n"):
+                remove_encrypted = scelta == "s"
             else:
                 print("⚠️ Scelta non valida, riprova.")
+        if remove_encrypted:
+            try:
+                os.remove(encrypted_filename)
+                print(f"🗑️ File eliminato.")
+            except Exception as e:
+                print(f"❌ Errore durante l'eliminazione di {encrypted_filename}: {e}")
+        else:
+            print(f"ℹ️ Il file è stato mantenuto.")
+        return stats
 
     def excel_exists(self):
         """
@@ -141,100 +161,300 @@ class ExcelWriter:
         """
         return os.path.exists(self.filename)
 
+    @misurato
     def write_to_excel(self, data):
         """
         Scrive una lista di persone in un file Excel.
         Args:
-            data (list[dict]): Lista di dizionari, ciascuno contiene:
+            data (list[dict] | Iterable): Lista di dizionari, ciascuno contiene:
             - 'nome'
             - 'cognome'
             - 'indirizzo'
             - 'email'
             'telefono'
+            oppure un `person.PersonBatch` o un qualsiasi iterabile di batch
+            (vedi `batching.iter_row_batches()`), consumato un blocco alla volta.
+        Raises:
+            ValueError: Se le righe non entrano in un solo foglio (limite di Excel, 1.048.576 righe).
         Comportamento:
-            - Crea un nuovo file Excel con intestazioni e dati.
+            - Crea un nuovo file Excel con intestazioni e dati in un solo foglio.
             - Sovrascrive eventuali file con lo stesso nome.
+            - Il workbook resta interamente in memoria fino al salvataggio: per grandi
+              volumi usare `write_to_excel_streaming()`, a memoria costante e su più fogli.
         """
+        from openpyxl import Workbook
+
         workbook = Workbook()
         sheet = workbook.active
         sheet.title = "Persone"
         # Scrive l'intestazione
-        sheet.append(["Nome", "Cognome", "Indirizzo", "Email", "Telefono"])
+        sheet.append(INTESTAZIONE)
         # Scrive i dati
-        for person in data:
-            sheet.append([person["nome"], person["cognome"], person["indirizzo"],person["email"], person["telefono"]])
+        for batch in iter_row_batches(data):
+            if sheet.max_row + len(batch) > MAX_RIGHE_FOGLIO:
+                raise ValueError(f"Oltre {MAX_RIGHE_FOGLIO - 1} righe non entrano in un solo foglio: "
+                                 "usare write_to_excel_streaming()")
+            for row in batch:
+                sheet.append(row)
         # Salva il file
         workbook.save(self.filename)
+        workbook_cache.invalidate(self.filename)
+        span_corrente().add(righe=sheet.max_row - 1, byte=os.path.getsize(self.filename))
         print(f"✅ File Excel salvato come {self.filename}")
 
-    def read_from_excel(self):
+    @misurato
+    def write_to_excel_streaming(self, data, rows_per_sheet=MAX_RIGHE_FOGLIO):
+        """
+        Scrive le persone in un file Excel a memoria costante usando un workbook
+        openpyxl in modalità `write_only`: le righe vengono serializzate man mano
+        invece di restare in memoria come celle fino al salvataggio.
+        Args:
+            data (Iterable): Righe o batch di persone in uno dei formati accettati
+            da `batching.iter_row_batches()`.
+            rows_per_sheet (int): Righe massime per foglio, intestazione compresa.
+            Superato il limite (di default quello di Excel, 1.048.576) si passa a un nuovo foglio.
+        Returns:
+            dict: Statistiche dell'esportazione: 'righe', 'fogli', 'byte', 'secondi', 'righe_al_secondo', 'picco_rss_mb'.
+        Comportamento:
+            - Sovrascrive eventuali file con lo stesso nome.
+            - I fogli successivi al primo si chiamano "Persone_2", "Persone_3", ...
+        """
+        start = time.perf_counter()
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = None
+        fogli = 0
+        righe_foglio = rows_per_sheet
+        totale = 0
+
+        for batch in iter_row_batches(data):
+            for row in batch:
+                # Crea un nuovo foglio quando quello corrente è pieno
+                if righe_foglio >= rows_per_sheet:
+                    fogli += 1
+                    sheet = workbook.create_sheet("Persone" if fogli == 1 else f"Persone_{fogli}")
+                    sheet.append(INTESTAZIONE)
+                    righe_foglio = 1
+                sheet.append(row)
+                righe_foglio += 1
+            totale += len(batch)
+
+        if sheet is None:
+            # Nessuna riga: salva comunque un foglio con la sola intestazione
+            fogli = 1
+            workbook.create_sheet("Persone").append(INTESTAZIONE)
+        workbook.save(self.filename)
+        workbook_cache.invalidate(self.filename)
+
+        secondi = time.perf_counter() - start
+        stats = {
+            "righe": totale,
+            "fogli": fogli,
+            "byte": os.path.getsize(self.filename),
+            "secondi": secondi,
+            "righe_al_secondo": totale / secondi if secondi else 0.0,
+            "picco_rss_mb": peak_rss_mb(),
+        }
+        rss = f"{stats['picco_rss_mb']:.1f} MB" if stats["picco_rss_mb"] is not None else "n/d"
+        print(f"✅ File Excel salvato come {self.filename}: {totale} righe in {fogli} fogli, "
+              f"{secondi:.2f}s ({stats['righe_al_secondo']:.0f} righe/s, picco RSS {rss})")
+        return stats
+
+    @misurato
+    def iter_excel_rows(self, backend="auto", chunk_size=CHUNK_SIZE):
+        """
+        Legge il file Excel in modo incrementale e restituisce le righe a blocchi di tuple,
+        senza costruire un DataFrame. Vengono letti tutti i fogli del file, saltando
+        l'intestazione di ciascuno (vedi `write_to_excel_streaming()`).
+        Args:
+            backend (str): Uno tra `BACKENDS`:
+            - "calamine": parser Rust `python-calamine`, il più veloce (se installato);
+            - "openpyxl": openpyxl in modalità `read_only`, riga per riga;
+            - "pandas": `pd.read_excel` come in precedenza;
+            - "auto": "calamine" se installato, altrimenti "openpyxl".
+            chunk_size (int): Numero massimo di righe per blocco.
+        Yields:
+            list[tuple]: Blocchi di righe; i valori sono stringhe, le celle vuote sono None.
+        Comportamento:
+            - Con `cache` attiva, se il file non è cambiato dalla lettura precedente (stessa
+              impronta) le righe vengono restituite dalla cache senza analizzare il file.
+            - Altrimenti le righe lette vengono memorizzate per colonne man mano che arrivano,
+              finché rientrano nel limite di memoria della cache.
+            - Per le letture singole di file grandi conviene `cache=False`: niente hash del file
+              prima della prima riga e niente copia delle righe in memoria.
+        """
+        backend = _scegli_backend(backend)
+        if not self.cache:
+            yield from self._leggi_righe(backend, chunk_size)
+            return
+
+        impronta = workbook_cache.fingerprint(self.filename)
+        voce = workbook_cache.get(self.filename, backend, impronta, self.sidecar)
+        if voce is not None:
+            yield from voce.iter_rows(chunk_size)
+            return
+
+        intestazione = []
+        colonne = []
+        righe = 0
+        limite = None
+        for chunk in self._leggi_righe(backend, chunk_size, intestazione):
+            if colonne is not None:
+                blocco = CachedWorkbook.from_rows([], chunk)
+                if limite is None:
+                    # Righe massime memorizzabili, stimate dal primo blocco
+                    limite = workbook_cache.max_bytes / (blocco.nbytes / len(chunk))
+                # Le righe più larghe di quelle già lette aggiungono colonne vuote
+                colonne.extend([None] * righe for _ in range(len(blocco.colonne) - len(colonne)))
+                for colonna, valori in zip(colonne, blocco.colonne):
+                    colonna.extend(valori)
+                for colonna in colonne[len(blocco.colonne):]:
+                    colonna.extend([None] * len(chunk))
+                righe += len(chunk)
+                if righe > limite:
+                    colonne = None
+            yield chunk
+        if colonne is not None:
+            workbook_cache.put(self.filename, backend, impronta,
+                               CachedWorkbook(intestazione, colonne or [[] for _ in intestazione]), self.sidecar)
+
+    def _leggi_righe(self, backend, chunk_size, intestazione=None):
+        """
+        Analizza il file con il backend indicato (già risolto) e restituisce le righe a blocchi.
+        Args:
+            backend (str): Backend di lettura.
+            chunk_size (int): Numero massimo di righe per blocco.
+            intestazione (list, optional): Se indicata, vi viene aggiunta l'intestazione del primo foglio.
+        """
+        fogli = _LETTORI[backend](self.filename)
+        chunk = []
+        for righe in fogli:
+            # La prima riga di ogni foglio è l'intestazione
+            header = next(righe, None)
+            if intestazione is not None and not intestazione and header is not None:
+                intestazione.extend(_intestazione(header))
+            for riga in righe:
+                valori = tuple(_cella_str(valore) for valore in riga)
+                # Salta le righe completamente vuote
+                if any(valore is not None for valore in valori):
+                    chunk.append(valori)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+
+    @misurato
+    def read_excel_header(self, backend="auto"):
+        """
+        Restituisce l'intestazione (prima riga del primo foglio) del file Excel, senza spazi.
+        Args:
+            backend (str): Backend di lettura (vedi `iter_excel_rows()`).
+        Returns:
+            list[str]: Nomi delle colonne.
+        """
+        backend = _scegli_backend(backend)
+        if self.cache:
+            voce = workbook_cache.get(self.filename, backend, sidecar=self.sidecar)
+            if voce is not None:
+                return list(voce.header)
+        for righe in _LETTORI[backend](self.filename):
+            return _intestazione(next(righe, []))
+        return []
+
+    @misurato
+    def read_excel_dataframe(self, backend="auto"):
+        """
+        Legge il file Excel in un DataFrame di stringhe usando il backend scelto.
+        Args:
+            backend (str): Backend di lettura (vedi `iter_excel_rows()`).
+        Returns:
+            pandas.DataFrame: Tutte le righe del file, con le colonne dell'intestazione.
+        """
+        colonne = self.read_excel_header(backend)
+        import pandas as pd
+
+        righe = [riga[:len(colonne)] for chunk in self.iter_excel_rows(backend) for riga in chunk]
+        return pd.DataFrame(righe, columns=colonne, dtype=object)
+
+    @misurato
+    def read_from_excel(self, backend="auto", page_size=None):
         """
         Legge e stampa a video il contenuto del file Excel riga per riga.
+        Args:
+            backend (str): Backend di lettura (vedi `iter_excel_rows()`).
+            page_size (int, optional): Se indicato, dopo ogni pagina di `page_size` righe
+            chiede all'utente se continuare.
         Comportamento:
             - Verifica l'esistenza del file.
-            - Legge il file con Pandas.
-            - Stampa ogni riga.
+            - Legge il file a blocchi con il backend scelto.
+            - Stampa ogni riga, un blocco alla volta.
         """
         if not os.path.exists(self.filename): # verifica se esiste il file Excel
             print(f"⚠️ Il file Excel {self.filename} non esiste.")
             return
         try:
-            df = pd.read_excel(self.filename, dtype=str)
-            df.columns = [col.strip() for col in df.columns]
-            if not df.empty:
-                print("\n--- Contenuto del File Excel ---")
-                for index, row in df.iterrows():
-                    print(f"{index + 1}, {tuple(row)}")
-            else:
+            indice = 0
+            stampate = 0
+            for chunk in self.iter_excel_rows(backend, chunk_size=page_size or CHUNK_SIZE):
+                if indice == 0:
+                    print("\n--- Contenuto del File Excel ---")
+                # Un'unica scrittura per blocco invece di una print per riga
+                sys.stdout.write("".join(f"{indice + n}, {riga}\n" for n, riga in enumerate(chunk, start=1)))
+                indice += len(chunk)
+                stampate += len(chunk)
+                span_corrente().add(righe=len(chunk))
+                if page_size and stampate >= page_size:
+                    stampate = 0
+                    if input("⏎ Invio per continuare, 'q' per terminare: ").strip().lower() == "q":
+                        break
+            if indice == 0:
                 print("⚠️ Il file Excel è vuoto.")
         except Exception as e:
             print(f"❌ Errore durante la lettura del file Excel: {e}")
 
-    def compare_excel_with_sql(self, db_name="persone.db"):
+    @misurato
+    def compare_excel_with_sql(self, db_name="persone.db", backend="auto", key="id", index_file=None, max_rows=20):
         """
         Confronta i dati tra il file Excel e la tabella SQLite 'persone'.
         Args:
             db_name (str): Nome del database SQLite da confrontare.
+            backend (str): Backend di lettura del file Excel (vedi `iter_excel_rows()`).
+            key (str): Colonna usata per abbinare le righe: "id" (posizione nel file Excel
+            se manca la colonna) oppure una chiave naturale come "email".
+            index_file (str, optional): File in cui salvare gli indici dei digest, così un nuovo
+            confronto rilegge solo la sorgente modificata. Default: nessun salvataggio.
+            max_rows (int): Numero massimo di righe stampate per ciascuna categoria.
+        Returns:
+            DiffResult | None: Il risultato del confronto, None in caso di errore.
         Comportamento:
-            - Normalizza i nomi delle colonne.
-            - Stampa le righe presenti solo in Excel o solo nel DB.
+            - Confronta le righe tramite digest per chiave (vedi `diff.DiffEngine`).
+            - Stampa le righe presenti solo in Excel, solo nel DB e quelle modificate.
         """
+        from diff import DiffEngine
+
         try:
             #controlla l'esistenza del database
             if not os.path.exists(db_name):
                 print(f"⚠️ Il file {db_name} non esiste, impossibile confrontare con Excel.")
-                return
-
-            df_excel = pd.read_excel(self.filename, dtype=str)
-            df_excel.columns = [col.strip() for col in df_excel.columns]
-            conn = sqlite3.connect(db_name)
-            df_db = pd.read_sql_query("SELECT * FROM persone", conn)
-            df_db.columns = [col.strip() for col in df_db.columns]
-
-            # Normalizza le colonne in minuscolo per confronto robusto
-            df_excel.columns = [col.lower() for col in df_excel.columns]
-            df_db.columns = [col.lower() for col in df_db.columns]
-            missing_cols = [col for col in df_excel.columns if col not in df_db.columns]
-
-            if missing_cols:
-                print(f"⚠️ Attenzione: le seguenti colonne non sono presenti nel DB: {missing_cols}")
-                return
-
-            df_db = df_db[df_excel.columns]
-            only_in_excel = pd.concat([df_excel, df_db, df_db]).drop_duplicates(keep=False)
-            only_in_db = pd.concat([df_db, df_excel, df_excel]).drop_duplicates(keep=False)
-            print("\n📄 Righe presenti solo in Excel:")
-            print(only_in_excel)
-            print("\n📄 Righe presenti solo nel DB:")
-            print(only_in_db)
+                return None
+
+            engine = DiffEngine(self, db_name, key=key, index_file=index_file, backend=backend)
+            try:
+                result = engine.compare()
+            except ValueError as e:
+                print(f"⚠️ Attenzione: {e}")
+                return None
+
+            engine.print_report(result, max_rows)
+            return result
 
         except Exception as e:
             print(f"❌ Errore durante il confronto: {e}")
+            return None
 
-        finally:
-            if 'conn' in locals():
-                conn.close()
-
+    @misurato
     def delete_excel_and_db(self, db_filename="persone.db"):
         """
         Elimina sia il file Excel che il database SQLite, se esistono.
@@ -248,6 +468,7 @@ class ExcelWriter:
         try:
             if os.path.exists(self.filename):
                 os.remove(self.filename)
+                workbook_cache.invalidate(self.filename)
                 print(f"✅ File {self.filename} eliminato con successo.")
             else:
                 print(f"⚠️ File {self.filename} non trovato.")
@@ -262,6 +483,7 @@ class ExcelWriter:
                         print(f"❌ Impossibile chiudere connessione residua: {e}")
 
                     os.remove(db_filename)
+                    remove_wal_files(db_filename)
                     print(f"✅ File {db_filename} eliminato con successo.")
                 except PermissionError as pe:
                     print(f"❌ Errore: il file {db_filename} è ancora in uso. Chiudi tutti i programmi che lo utilizzano e riprova.")
@@ -270,4 +492,80 @@ class ExcelWriter:
             else:
                 print(f"⚠️ File {db_filename} non trovato.")
         except Exception as e:
-            print(f"❌ Errore durante l'eliminazione dei file: {e}")
\ No newline at end of file
+            print(f"❌ Errore durante l'eliminazione dei file: {e}")
+
+
+def _scegli_backend(backend):
+    """
+    Risolve il backend "auto" e verifica che il backend richiesto sia valido.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend di lettura non valido: {backend!r}. Valori ammessi: {BACKENDS}")
+    if backend == "auto":
+        try:
+            import python_calamine  # noqa: F401
+            return "calamine"
+        except ImportError:
+            return "openpyxl"
+    return backend
+
+
+def _intestazione(riga):
+    """
+    Normalizza la riga di intestazione: nomi senza spazi, celle vuote escluse.
+    """
+    return [str(col).strip() for col in riga if col not in (None, "")]
+
+
+def _fogli_calamine(filename):
+    """
+    Restituisce un iteratore di righe per ogni foglio, letto con `python-calamine`.
+    """
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(filename)
+    for nome in workbook.sheet_names:
+        yield iter(workbook.get_sheet_by_name(nome).iter_rows())
+
+
+def _fogli_openpyxl(filename):
+    """
+    Restituisce un iteratore di righe per ogni foglio, letto con openpyxl in modalità `read_only`.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _fogli_pandas(filename):
+    """
+    Restituisce un iteratore di righe per ogni foglio, letto con `pd.read_excel`.
+    """
+    import pandas as pd
+
+    for df in pd.read_excel(filename, sheet_name=None, dtype=str, header=None).values():
+        yield df.itertuples(index=False, name=None)
+
+
+_LETTORI = {
+    "calamine": _fogli_calamine,
+    "openpyxl": _fogli_openpyxl,
+    "pandas": _fogli_pandas,
+}
+
+
+def _cella_str(valore):
+    """
+    Converte il valore di una cella in stringa come `pd.read_excel(dtype=str)`:
+    le celle vuote diventano None e i numeri interi non hanno la parte decimale.
+    """
+    if valore is None or valore == "" or valore != valore:  # valore != valore: NaN
+        return None
+    if isinstance(valore, float) and valore.is_integer():
+        return str(int(valore))
+    return str(valore)
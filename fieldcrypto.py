@@ -0,0 +1,145 @@
+"""
+Crittografia a livello di campo per la tabella `persone_cifrate`.
+
+I campi sensibili (Indirizzo, Email, Telefono) vengono cifrati valore per valore con
+AES-256-GCM; accanto a ciascuno viene salvato un indice cieco (blind index), cioè un HMAC-SHA256
+del valore normalizzato. Le ricerche per uguaglianza confrontano l'HMAC del valore cercato con la
+colonna indicizzata, senza decifrare la tabella; vengono decifrate solo le righe restituite.
+
+Le due chiavi (cifratura e HMAC) sono derivate con HKDF dalla chiave Fernet del file indicato,
+come in `streamcrypto`, quindi un normale file di chiave del progetto è sufficiente.
+"""
+import base64
+import binascii
+import hmac
+import os
+
+# Campi cifrati, nell'ordine delle colonne della tabella `persone_cifrate`
+CAMPI_CIFRATI = ("indirizzo", "email", "telefono")
+# Byte dell'HMAC salvati come indice cieco
+BLIND_INDEX_SIZE = 16
+_NONCE_SIZE = 12
+
+
+class FieldCipher:
+    """
+    Cifra e decifra i singoli campi di una persona e ne calcola gli indici ciechi.
+    """
+
+    def __init__(self, key):
+        """
+        Args:
+            key (bytes): Chiave Fernet (come letta dal file di chiave).
+        Raises:
+            ValueError: Se la chiave non è una chiave Fernet valida.
+        """
+        try:
+            segreto = base64.urlsafe_b64decode(key)
+        except (binascii.Error, TypeError):
+            segreto = b""
+        if len(segreto) != 32:
+            raise ValueError("La chiave Fernet deve essere di 32 byte codificati in base64 url-safe.")
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        materiale = HKDF(algorithm=hashes.SHA256(), length=64, salt=None,
+                         info=b"pw-field-aes256gcm-hmac").derive(segreto)
+        self._aesgcm = AESGCM(materiale[:32])
+        self._hmac_key = materiale[32:]
+
+    def encrypt(self, campo, valore):
+        """
+        Cifra un valore; il nome del campo è autenticato, quindi un valore non può essere
+        spostato in un'altra colonna.
+        Args:
+            campo (str): Nome del campo (es. "email").
+            valore (str | None): Valore in chiaro.
+        Returns:
+            bytes | None: Nonce + testo cifrato + tag, None se il valore è None.
+        """
+        if valore is None:
+            return None
+        nonce = os.urandom(_NONCE_SIZE)
+        return nonce + self._aesgcm.encrypt(nonce, str(valore).encode(), campo.encode())
+
+    def decrypt(self, campo, token):
+        """
+        Decifra un valore cifrato con `encrypt()`.
+        Args:
+            campo (str): Nome del campo usato in cifratura.
+            token (bytes | None): Valore cifrato.
+        Returns:
+            str | None: Valore in chiaro.
+        Raises:
+            cryptography.exceptions.InvalidTag: Se il valore è stato alterato o la chiave è diversa.
+        """
+        if token is None:
+            return None
+        return self._aesgcm.decrypt(token[:_NONCE_SIZE], token[_NONCE_SIZE:], campo.encode()).decode()
+
+    def blind_index(self, campo, valore):
+        """
+        Calcola l'indice cieco di un valore: HMAC-SHA256 (troncato) del valore normalizzato.
+        Args:
+            campo (str): Nome del campo.
+            valore (str | None): Valore in chiaro.
+        Returns:
+            bytes | None: `BLIND_INDEX_SIZE` byte, None se il valore è None.
+        """
+        if valore is None:
+            return None
+        messaggio = campo.encode() + b"\0" + _normalizza(campo, valore).encode()
+        return hmac.digest(self._hmac_key, messaggio, "sha256")[:BLIND_INDEX_SIZE]
+
+    def encrypt_rows(self, righe):
+        """
+        Prepara un batch di righe (nome, cognome, indirizzo, email, telefono) per `persone_cifrate`.
+        Eventuali campi successivi (indirizzo strutturato) vengono ignorati.
+        Args:
+            righe (list[tuple]): Righe in chiaro.
+        Returns:
+            list[tuple]: (nome, cognome, indirizzo, email, telefono cifrati, poi i tre indici ciechi).
+        """
+        # Un'unica lettura di byte casuali per tutti i nonce del batch invece di una per valore
+        nonces = os.urandom(_NONCE_SIZE * len(CAMPI_CIFRATI) * len(righe))
+        aes, chiave, digest = self._aesgcm.encrypt, self._hmac_key, hmac.digest
+        risultato = []
+        posizione = 0
+        for nome, cognome, *valori in righe:
+            cifrati, indici = [], []
+            for campo, valore in zip(CAMPI_CIFRATI, valori):
+                if valore is None:
+                    cifrati.append(None)
+                    indici.append(None)
+                    continue
+                nonce = nonces[posizione:posizione + _NONCE_SIZE]
+                posizione += _NONCE_SIZE
+                cifrati.append(nonce + aes(nonce, str(valore).encode(), campo.encode()))
+                messaggio = campo.encode() + b"\0" + _normalizza(campo, valore).encode()
+                indici.append(digest(chiave, messaggio, "sha256")[:BLIND_INDEX_SIZE])
+            risultato.append((nome, cognome, *cifrati, *indici))
+        return risultato
+
+    def decrypt_row(self, riga):
+        """
+        Decifra una riga letta da `persone_cifrate` (id, nome, cognome, indirizzo, email, telefono).
+        Returns:
+            tuple: La riga con i campi in chiaro, come quelle della tabella `persone`.
+        """
+        id_, nome, cognome, indirizzo, email, telefono = riga[:6]
+        return (id_, nome, cognome, self.decrypt("indirizzo", indirizzo),
+                self.decrypt("email", email), self.decrypt("telefono", telefono))
+
+
+def _normalizza(campo, valore):
+    """
+    Normalizza un valore prima dell'HMAC, così le ricerche non dipendono da spazi e maiuscole
+    dell'email o dalla formattazione del numero di telefono.
+    """
+    valore = str(valore).strip()
+    if campo == "email":
+        return valore.lower()
+    if campo == "telefono":
+        return "".join(valore.split())
+    return valore
@@ -1,12 +1,45 @@
-from faker import Faker
+from collections import deque
+from functools import lru_cache
+
+from perf import misurato
+from person import PersonBatch, componi_indirizzo
+
+# Dimensione di default dei pool di valori pre-campionati da Faker per la modalità bulk
+POOL_SIZE = 2000
+# Numero di persone per shard nella generazione parallela
+SHARD_SIZE = 100_000
+
+# Localizzazione dei dati generati da Faker
+LOCALE = "it_IT"
+
+# Istanza di DataGenerator del processo worker, creata una sola volta da `_init_worker()`
+_worker_generator = None
+
+
+def get_faker(locale=LOCALE):
+    """
+    Restituisce l'istanza di Faker della localizzazione, condivisa da tutto il processo.
+    Faker viene importato e l'istanza creata solo al primo utilizzo (costano oltre 100 ms),
+    non all'avvio del programma né a ogni nuovo `DataGenerator`.
+    """
+    return _crea_faker(locale)
+
+
+@lru_cache(maxsize=None)
+def _crea_faker(locale):
+    from faker import Faker
+
+    return Faker(locale)
+
 
 class DataGenerator:
     """
-    Classe per generare dati (nome, cognome, indirizzo, email, telefono),
+    Classe per generare dati (nome, cognome, indirizzo, email, telefono e indirizzo strutturato),
     sia automaticamente tramite la libreria Faker, sia manualmente tramite input da terminale.
     Attributi:
         count (int): Numero di persone da generare automaticamente.
-        fake (Faker): Istanza di Faker configurata per la localizzazione italiana ("it_IT").
+        fake (Faker): Istanza di Faker per la localizzazione italiana ("it_IT"), condivisa da tutti
+        i generatori (vedi `get_faker()`): `fake.seed_instance()` vale quindi per tutti.
     """
 
     def __init__(self, count=10):
@@ -15,9 +48,15 @@ class DataGenerator:
         Args:
             count (int, optional): Numero di persone da generare automaticamente. Default = 10.
         """
-        self.fake = Faker("it_IT")
         self.count = count
+        self._pools = None
+        self._pools_key = None
+
+    @property
+    def fake(self):
+        return get_faker()
 
+    @misurato
     def generate_data(self):
         """
         Genera una lista di dizionari contenenti dati casuali di persone con indirizzi italiani.
@@ -28,28 +67,242 @@ class DataGenerator:
            'indirizzo': Indirizzo completo in formato "<via> <numero>, <CAP> <città> <provincia>"
            'email': Indirizzo email fittizio
            'telefono': Numero di telefono fittizio
+           'via', 'numero', 'cap', 'citta', 'provincia': Parti dell'indirizzo
+        """
+        return [self._genera_persona() for _ in range(self.count)]
+
+    @misurato
+    def generate_batch(self, count=None):
+        """
+        Genera persone casuali come `generate_data()`, ma in un `PersonBatch` colonnare
+        invece che in una lista di dizionari.
+        Args:
+            count (int, optional): Numero di persone. Default: `self.count`.
+        Returns:
+            PersonBatch: Le persone generate.
+        """
+        count = self.count if count is None else count
+        return PersonBatch(self._genera_persona() for _ in range(count))
+
+    @misurato
+    def iter_batches(self, batch_size=1000, count=None):
         """
-        data = []
-
-        for _ in range(self.count):
-            nome = self.fake.first_name()
-            cognome = self.fake.last_name()
-            via = self.fake.street_name()
-            numero = self.fake.building_number()
-            cap = self.fake.postcode()
-            città = self.fake.city()
-            provincia = self.fake.state_abbr()
-            email = self.fake.free_email()
-
-            person = {
-                "nome": nome,
-                "cognome": cognome,
-                "indirizzo": f"{via} {numero}, {cap} {città} {provincia}",
-                "email": email,
-                "telefono": self.fake.phone_number(),
+        Genera le persone a blocchi di dimensione fissa invece di restituire un'unica lista,
+        così la memoria occupata dipende solo da `batch_size` e non dal numero totale di persone.
+        Args:
+            batch_size (int): Numero di persone per blocco (l'ultimo può essere più piccolo).
+            count (int, optional): Numero totale di persone. Default: `self.count`.
+        Yields:
+            list[dict]: Blocchi di persone nello stesso formato di `generate_data()`.
+        """
+        count = self.count if count is None else count
+        for start in range(0, count, batch_size):
+            yield [self._genera_persona() for _ in range(min(batch_size, count - start))]
+
+    def _genera_persona(self):
+        """
+        Genera i dati casuali di una singola persona.
+        Returns:
+            dict: Dizionario con i campi 'nome', 'cognome', 'indirizzo', 'email', 'telefono',
+            'via', 'numero', 'cap', 'citta', 'provincia'.
+        """
+        fake = self.fake
+        nome = fake.first_name()
+        cognome = fake.last_name()
+        via = fake.street_name()
+        numero = fake.building_number()
+        cap = fake.postcode()
+        coppie = _città_province()
+        if coppie:
+            città, provincia = fake.random.choice(coppie)
+        else:
+            città, provincia = fake.city(), fake.state_abbr()
+        email = fake.free_email()
+
+        return {
+            "nome": nome,
+            "cognome": cognome,
+            "indirizzo": componi_indirizzo(via, numero, cap, città, provincia),
+            "email": email,
+            "telefono": fake.phone_number(),
+            "via": via,
+            "numero": numero,
+            "cap": cap,
+            "citta": città,
+            "provincia": provincia,
+        }
+
+    def _build_pools(self, seed=None, pool_size=POOL_SIZE):
+        """
+        Pre-campiona da Faker i pool di valori usati dalla modalità bulk e li memorizza
+        nell'istanza: vengono ricostruiti solo se cambiano `seed` o `pool_size`.
+        Args:
+            seed (int, optional): Seme per rendere riproducibile il campionamento dei pool.
+            pool_size (int): Numero di valori da campionare per ciascun pool.
+        Returns:
+            dict: Pool di array NumPy ('nome', 'cognome', 'via', 'città', 'provincia', 'dominio')
+            più gli array 'nome_email'/'cognome_email' allineati ai nomi e già normalizzati;
+            'provincia' è allineato a 'città' ed è la provincia reale della città (vedi `_città_province()`).
+        """
+        import numpy as np
+
+        if self._pools is not None and self._pools_key == (seed, pool_size):
+            return self._pools
+
+        # Salva lo stato del generatore di Faker per non alterare generate_data()
+        fake = self.fake
+        state = fake.random.getstate()
+        if seed is not None:
+            fake.seed_instance(seed)
+        try:
+            nomi = [fake.first_name() for _ in range(pool_size)]
+            cognomi = [fake.last_name() for _ in range(pool_size)]
+            coppie = _città_province()
+            if coppie:
+                località = [fake.random.choice(coppie) for _ in range(pool_size)]
+            else:
+                località = [(fake.city(), fake.state_abbr()) for _ in range(pool_size)]
+            pools = {
+                "nome": np.array(nomi),
+                "cognome": np.array(cognomi),
+                "via": np.array([fake.street_name() for _ in range(pool_size)]),
+                "città": np.array([città for città, _ in località]),
+                "provincia": np.array([provincia for _, provincia in località]),
+                "dominio": np.array(sorted({fake.free_email_domain() for _ in range(pool_size)})),
+                "nome_email": np.array([_slug(n) for n in nomi]),
+                "cognome_email": np.array([_slug(c) for c in cognomi]),
             }
-            data.append(person)
-        return data
+        finally:
+            fake.random.setstate(state)
+
+        self._pools = pools
+        self._pools_key = (seed, pool_size)
+        return pools
+
+    def _bulk_batch(self, pools, rng, count, start=0):
+        """
+        Costruisce un blocco di `count` persone campionando per indice dai pool.
+        Args:
+            pools (dict): Pool restituiti da `_build_pools()`.
+            rng (numpy.random.Generator): Generatore casuale del blocco.
+            count (int): Numero di persone del blocco.
+            start (int): Posizione della prima persona nella sequenza complessiva,
+            usata per rendere univoche le email.
+        Returns:
+            dict[str, numpy.ndarray]: Colonne 'nome', 'cognome', 'indirizzo', 'email', 'telefono'
+            e quelle dell'indirizzo strutturato ('via', 'numero', 'cap', 'citta', 'provincia').
+        """
+        import numpy as np
+
+        char = np.char
+        size = len(pools["nome"])
+        idx_nome = rng.integers(0, size, count)
+        idx_cognome = rng.integers(0, size, count)
+        via = pools["via"][rng.integers(0, size, count)]
+        idx_città = rng.integers(0, size, count)
+        città = pools["città"][idx_città]
+        provincia = pools["provincia"][idx_città]
+        dominio = pools["dominio"][rng.integers(0, len(pools["dominio"]), count)]
+        numero = rng.integers(1, 1000, count).astype(str)
+        cap = char.zfill(rng.integers(10, 98169, count).astype(str), 5)
+        telefono = char.add("+39 ", rng.integers(3_000_000_000, 4_000_000_000, count).astype(str))
+        progressivo = np.arange(start, start + count).astype(str)
+
+        # "<via> <numero>, <CAP> <città> <provincia>"
+        indirizzo = char.add(char.add(char.add(via, " "), numero), ", ")
+        indirizzo = char.add(char.add(char.add(indirizzo, cap), " "), città)
+        indirizzo = char.add(char.add(indirizzo, " "), provincia)
+        # "<nome>.<cognome><progressivo>@<dominio>"
+        email = char.add(char.add(pools["nome_email"][idx_nome], "."), pools["cognome_email"][idx_cognome])
+        email = char.add(char.add(char.add(email, progressivo), "@"), dominio)
+
+        return {
+            "nome": pools["nome"][idx_nome],
+            "cognome": pools["cognome"][idx_cognome],
+            "indirizzo": indirizzo,
+            "email": email,
+            "telefono": telefono,
+            "via": via,
+            "numero": numero,
+            "cap": cap,
+            "citta": città,
+            "provincia": provincia,
+        }
+
+    @misurato
+    def generate_bulk(self, count=None, seed=None, pool_size=POOL_SIZE, as_frame=False, as_batch=False):
+        """
+        Genera grandi quantità di persone in modalità vettoriale: i valori testuali vengono
+        campionati da Faker una sola volta in pool e le righe sono costruite con NumPy
+        tramite campionamento per indice, senza chiamare Faker per ogni persona.
+        Args:
+            count (int, optional): Numero di persone da generare. Default: `self.count`.
+            seed (int, optional): Seme per ottenere sempre lo stesso risultato.
+            pool_size (int): Numero di valori pre-campionati per ciascun pool.
+            as_frame (bool): Se True restituisce un DataFrame pandas invece di un dizionario di array.
+            as_batch (bool): Se True restituisce un `PersonBatch` (più compatto in memoria).
+        Returns:
+            dict[str, numpy.ndarray] | pandas.DataFrame | PersonBatch: Struttura colonnare con le colonne
+            di `generate_data()` ('nome', 'cognome', 'indirizzo', 'email', 'telefono', 'via', 'numero',
+            'cap', 'citta', 'provincia').
+        """
+        import numpy as np
+
+        count = self.count if count is None else count
+        pools = self._build_pools(seed, pool_size)
+        columns = self._bulk_batch(pools, np.random.default_rng(seed), count)
+        if as_batch:
+            return PersonBatch.from_columns(columns)
+        if as_frame:
+            import pandas as pd
+            return pd.DataFrame(columns)
+        return columns
+
+    @misurato
+    def generate_parallel(self, count=None, seed=None, workers=None, shard_size=SHARD_SIZE, pool_size=POOL_SIZE):
+        """
+        Genera persone in parallelo su più processi, dividendo `count` in shard di
+        `shard_size` righe. Ogni worker crea una sola istanza di Faker con i pool già
+        campionati dal seme principale; ogni shard usa un seme derivato da (seed, indice shard).
+        I confini degli shard dipendono solo da `shard_size`, quindi il risultato è identico
+        qualunque sia il numero di worker.
+        Args:
+            count (int, optional): Numero totale di persone. Default: `self.count`.
+            seed (int, optional): Seme principale. Se None ne viene estratto uno casuale.
+            workers (int, optional): Numero di processi. Default: numero di CPU; con 1 lavora nel processo corrente.
+            shard_size (int): Numero di persone per shard.
+            pool_size (int): Numero di valori pre-campionati per ciascun pool.
+        Yields:
+            dict[str, numpy.ndarray]: Gli shard, nell'ordine, nello stesso formato di `generate_bulk()`.
+        """
+        import os
+        import numpy as np
+
+        count = self.count if count is None else count
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        workers = workers or os.cpu_count() or 1
+        shards = [(index, start, min(shard_size, count - start))
+                  for index, start in enumerate(range(0, count, shard_size))]
+
+        if workers == 1 or len(shards) <= 1:
+            pools = self._build_pools(seed, pool_size)
+            for index, start, size in shards:
+                yield self._bulk_batch(pools, _shard_rng(seed, index), size, start)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(seed, pool_size)) as executor:
+            # Mantiene al massimo 2 shard in volo per worker, così la memoria resta limitata
+            pending = deque()
+            for shard in shards:
+                pending.append(executor.submit(_generate_shard, seed, *shard))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
     def _inserisci_persona(self):
         """
@@ -58,13 +311,16 @@ class DataGenerator:
             dict: Un dizionario contenente i dati inseriti manualmente nei campi corretti.
         """
         person = {}
-        campi = ["nome", "cognome", "indirizzo", "email", "telefono"]
+        campi = ["nome", "cognome", "via", "numero", "cap", "citta", "provincia", "email", "telefono"]
         print("\n👤 Inserisci i dati della persona:\n")
         for campo in campi:
             valore = input(f"Inserisci {campo}: ").strip()
             person[campo] = valore
+        person["indirizzo"] = componi_indirizzo(person["via"], person["numero"], person["cap"],
+                                                person["citta"], person["provincia"])
         return person
 
+    @misurato
     def generate_manual_person(self):
        """
         Permette l'inserimento manuale interattivo di una o più persone tramite terminale.
@@ -76,8 +332,16 @@ class DataGenerator:
           list[dict]: Una lista di dizionari, ciascuno contenente i dati di una persona
           inserita manualmente. Se non viene autorizzato alcun inserimento, ritorna una lista vuota.
        """
-       data = []
+       return list(self.iter_manual_person())
 
+    @misurato
+    def iter_manual_person(self):
+       """
+        Versione a flusso di `generate_manual_person()`: restituisce ogni persona appena
+        viene inserita, così può essere passata direttamente ai writer Excel e SQLite.
+        Yields:
+          dict: I dati di una persona inserita manualmente.
+       """
        while True:
            # Ripete la richiesta fino a risposta valida
            autorizza = ""
@@ -87,11 +351,11 @@ class DataGenerator:
                     print("⚠️ Scelta non valida. Inserisci 'S' per sì o 'N' per no.")
            if autorizza == "s":
                person = self._inserisci_persona()
-               data.append(person)
                print("✅ Persona aggiunta.")
+               yield person
            else:
                print("❌ Inserimento non autorizzato.")
-               break
+               return
 
            # Anche qui: validazione dell'input per continuare
            continua = ""
@@ -101,8 +365,59 @@ class DataGenerator:
                     print("⚠️ Scelta non valida. Inserisci 'S' per sì o 'N' per no.")
                elif continua == "n":
                    print("ℹ️ Inserimento manuale terminato.")
-                   return data
+                   return
                elif continua == "s":
                    break  # Torna all'inizio del ciclo
 
-       return data
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def _città_province(locale=LOCALE):
+    """
+    Restituisce in ordine alfabetico le coppie (città, sigla della provincia) del provider di
+    indirizzi di Faker, ricavate da `cap_city_province` (tupla vuota se il provider non le ha).
+    Città e provincia vengono scelte insieme perché `fake.city()` e `fake.state_abbr()` sono
+    indipendenti. L'ordine è fissato perché il provider it_IT costruisce i propri elenchi da
+    insiemi, il cui ordine cambia da un processo all'altro (hash randomization, PYTHONHASHSEED).
+    """
+    for provider in get_faker(locale).get_providers():
+        cap_città = getattr(provider, "cap_city_province", None)
+        if cap_città:
+            return tuple(sorted({tuple(coppia) for coppie in cap_città.values() for coppia in coppie}))
+    return ()
+
+
+def _slug(testo):
+    """
+    Normalizza un nome per l'uso nella parte locale di un indirizzo email
+    (minuscolo, senza spazi, apostrofi o accenti).
+    """
+    import unicodedata
+
+    testo = unicodedata.normalize("NFKD", testo).encode("ascii", "ignore").decode("ascii")
+    return "".join(c for c in testo.lower() if c.isalnum())
+
+
+def _shard_rng(seed, index):
+    """
+    Restituisce il generatore casuale dello shard `index`, derivato dal seme principale.
+    """
+    import numpy as np
+
+    return np.random.default_rng(np.random.SeedSequence([seed, index]))
+
+
+def _init_worker(seed, pool_size):
+    """
+    Inizializza il processo worker: crea l'istanza di Faker e campiona i pool una sola volta.
+    """
+    global _worker_generator
+    _worker_generator = DataGenerator()
+    _worker_generator._build_pools(seed, pool_size)
+
+
+def _generate_shard(seed, index, start, count):
+    """
+    Genera uno shard nel processo worker usando i pool già pronti.
+    """
+    pools = _worker_generator._pools
+    return _worker_generator._bulk_batch(pools, _shard_rng(seed, index), count, start)
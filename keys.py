@@ -0,0 +1,208 @@
+"""
+Gestione delle chiavi di crittografia condivisa da `ExcelWriter` e `SQLiteWriter`.
+
+Le chiavi lette dai file (`key.key`, `psw.key`, ...) vengono tenute in una cache LRU
+indicizzata per percorso e data di modifica del file: un file di chiave già letto costa
+una sola `os.stat`, e se il file viene sostituito la chiave viene riletta.
+Permette inoltre di decifrare con più chiavi candidate (rotazione, come `MultiFernet`)
+e di ricifrare file `.enc` esistenti sotto una nuova chiave senza scrivere il testo in chiaro su disco.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import streamcrypto
+
+# Numero massimo di chiavi tenute in cache
+MAX_CHIAVI = 128
+
+
+class Chiave:
+    """
+    Chiave letta da un file, con gli oggetti crittografici già pronti.
+    Attributi:
+        path (str): File da cui è stata letta la chiave.
+        key (bytes): Chiave Fernet.
+        fernet (Fernet): Istanza Fernet per i vecchi file a token unico.
+        key_id (bytes): Identificativo della chiave nel formato a blocchi (vedi `streamcrypto`).
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        from cryptography.fernet import Fernet
+
+        self.fernet = Fernet(key)
+        self.key_id = streamcrypto.derive_key(key)[1]
+
+
+class KeyManager:
+    """
+    Cache LRU thread-safe delle chiavi, indicizzata per (percorso, mtime, dimensione) del file.
+    Attributi:
+        max_size (int): Numero massimo di chiavi in cache.
+        hits (int): Chiavi trovate in cache.
+        misses (int): Chiavi lette dal disco.
+    """
+
+    def __init__(self, max_size=MAX_CHIAVI):
+        """
+        Args:
+            max_size (int): Numero massimo di chiavi in cache. Default: `MAX_CHIAVI`.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Restituisce la chiave contenuta in `path`, dalla cache se il file non è cambiato.
+        Args:
+            path (str): File della chiave.
+        Returns:
+            Chiave: La chiave pronta all'uso.
+        Raises:
+            FileNotFoundError: Se il file non esiste.
+            ValueError: Se il file non contiene una chiave Fernet valida.
+        """
+        stat = os.stat(path)
+        voce = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            chiave = self._cache.get(voce)
+            if chiave is not None:
+                self._cache.move_to_end(voce)
+                self.hits += 1
+                return chiave
+
+        with open(path, "rb") as key_file:
+            chiave = Chiave(path, key_file.read().strip())
+        with self._lock:
+            self.misses += 1
+            self._cache[voce] = chiave
+            # Una sola versione per percorso: elimina quelle con mtime diverso
+            for vecchia in [v for v in self._cache if v[0] == voce[0] and v != voce]:
+                del self._cache[vecchia]
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return chiave
+
+    def get_or_create(self, path):
+        """
+        Restituisce la chiave contenuta in `path`, generandola e salvandola se il file non esiste.
+        Args:
+            path (str): File della chiave.
+        Returns:
+            tuple[Chiave, bool]: La chiave e True se è stata appena generata.
+        """
+        try:
+            return self.get(path), False
+        except FileNotFoundError:
+            from cryptography.fernet import Fernet
+
+            with open(path, "xb") as key_file:
+                key_file.write(Fernet.generate_key())
+            return self.get(path), True
+
+    def get_many(self, paths):
+        """
+        Restituisce le chiavi di più file, saltando quelli inesistenti.
+        Args:
+            paths (str | Iterable[str]): Uno o più file di chiave; il primo è la chiave principale.
+        Returns:
+            list[Chiave]: Le chiavi trovate, nell'ordine indicato.
+        """
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        chiavi = []
+        for path in paths:
+            try:
+                chiavi.append(self.get(path))
+            except FileNotFoundError:
+                continue
+        return chiavi
+
+    def decrypt_file(self, encrypted_path, path, key_paths, workers=None):
+        """
+        Decifra un file `.enc` provando le chiavi indicate: nel formato a blocchi la chiave
+        viene scelta tramite l'identificativo nell'intestazione, per i vecchi file Fernet
+        si usa `MultiFernet` con tutte le chiavi.
+        Args:
+            encrypted_path (str): File cifrato.
+            path (str): File in chiaro da creare.
+            key_paths (str | Iterable[str]): File delle chiavi candidate.
+            workers (int, optional): Thread di decifratura.
+        Returns:
+            dict: Statistiche di `streamcrypto.decrypt_file()`.
+        Raises:
+            FileNotFoundError: Se nessuna delle chiavi esiste.
+            ValueError: Se nessuna chiave corrisponde al file.
+        """
+        chiavi = self.get_many(key_paths)
+        if not chiavi:
+            raise FileNotFoundError(f"nessun file di chiave trovato tra {key_paths}")
+        key_id = streamcrypto.read_key_id(encrypted_path)
+        if key_id is None:
+            # Vecchio formato Fernet: la prima chiave valida viene provata da MultiFernet
+            from cryptography.fernet import MultiFernet
+
+            return streamcrypto.decrypt_file(encrypted_path, path, chiavi[0].key, workers,
+                                             fernet=MultiFernet([c.fernet for c in chiavi]))
+        for chiave in chiavi:
+            if chiave.key_id == key_id:
+                return streamcrypto.decrypt_file(encrypted_path, path, chiave.key, workers)
+        raise ValueError("nessuna delle chiavi indicate corrisponde a quella usata per crittografare il file")
+
+    def rotate(self, encrypted_paths, old_key_paths, new_key_path, workers=None):
+        """
+        Ricifra file `.enc` esistenti sotto una nuova chiave, blocco per blocco e senza
+        scrivere il testo in chiaro su disco (vedi `streamcrypto.reencrypt_stream()`).
+        I file già cifrati con la nuova chiave vengono saltati.
+        Args:
+            encrypted_paths (Iterable[str]): File `.enc` da ricifrare.
+            old_key_paths (str | Iterable[str]): File delle chiavi attuali.
+            new_key_path (str): File della nuova chiave (generata se non esiste).
+            workers (int, optional): Thread di cifratura/decifratura.
+        Returns:
+            dict: Numero di file 'ricifrati' e 'saltati'.
+        """
+        nuova, _ = self.get_or_create(new_key_path)
+        vecchie = self.get_many(old_key_paths)
+        workers = workers or os.cpu_count() or 1
+        ricifrati = saltati = 0
+        for encrypted_path in encrypted_paths:
+            key_id = streamcrypto.read_key_id(encrypted_path)
+            if key_id == nuova.key_id:
+                saltati += 1
+                continue
+            if key_id is None:
+                from cryptography.fernet import MultiFernet
+
+                vecchia = MultiFernet([c.fernet for c in vecchie])
+            else:
+                vecchia = next((c.key for c in vecchie if c.key_id == key_id), None)
+                if vecchia is None:
+                    raise ValueError(f"nessuna delle chiavi indicate corrisponde a {encrypted_path}")
+
+            temporaneo = encrypted_path + ".tmp"
+            try:
+                with open(encrypted_path, "rb") as source, open(temporaneo, "wb") as target:
+                    streamcrypto.reencrypt_stream(source, target, vecchia, nuova.key, workers=workers)
+                os.replace(temporaneo, encrypted_path)
+            finally:
+                if os.path.exists(temporaneo):
+                    os.remove(temporaneo)
+            ricifrati += 1
+        return {"ricifrati": ricifrati, "saltati": saltati}
+
+    def clear(self):
+        """
+        Svuota la cache delle chiavi.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+# Istanza condivisa da ExcelWriter e SQLiteWriter
+key_manager = KeyManager()
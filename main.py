@@ -8,24 +8,40 @@ Consente di:
 - Eliminare i file generati.
 
 Il menu guida l'utente passo-passo attraverso tutte le funzionalità offerte.
+Con degli argomenti il programma viene invece eseguito senza interazione come pipeline
+(vedi `cli.py`), ad esempio:
+
+    python main.py "generate --count 5000000 | to-sqlite | encrypt --yes"
 
 Moduli necessari:
 - generator.py: Generazione dati casuali o manuali
 - excel.py: Scrittura/lettura/confronto file Excel e genera dal file Excel un database SQLite contenente gli stessi dati
 - database.py: Scrittura/lettura/confronto database SQLite
+- cli.py: Pipeline non interattiva
 """
+import sys
+
 from database import SQLiteWriter
 from excel import ExcelWriter
 from generator import DataGenerator
+from person import PersonBatch
 
 if __name__ == "__main__":
 
+    # Con degli argomenti esegue la pipeline senza il menu
+    if len(sys.argv) > 1:
+        import cli
+
+        sys.exit(cli.main(sys.argv[1:]))
+
     # Inizializzazione Excel
     excel_writer = ExcelWriter()
     # Inizializzazione Sqlite
     sqlite_writer = SQLiteWriter()
-    # Lista che conterrà i dati generati
-    persone = []
+    # Generatore riusato da tutte le voci del menu (evita di ricreare Faker ogni volta)
+    generator = DataGenerator(count=10)
+    # Persone generate, memorizzate per colonne
+    persone = PersonBatch()
 
     while True:
         print("\n--- MENU ---")
@@ -47,19 +63,17 @@ if __name__ == "__main__":
 
         if scelta == "1":
            # Genera dati casuali
-            generator = DataGenerator(count=10)
-            persone = generator.generate_data()
+            persone = generator.generate_batch()
             print(f"✅ Sono state generate {len(persone)} persone.")
 
         elif scelta == "2":
             # Genera dati facendoli inserire manualmente all'utente
-            generator = DataGenerator()
-            persone = generator.generate_manual_person()
+            persone = PersonBatch(generator.iter_manual_person())
 
         elif scelta == "3":
-            # Genera file excel con dati generati
+            # Genera file excel con dati generati (workbook write-only, a memoria costante)
             if persone:
-                excel_writer.write_to_excel(persone)
+                excel_writer.write_to_excel_streaming(persone)
             else:
                 print("⚠️ Prima devi generare delle persone!")
 
@@ -102,6 +116,8 @@ if __name__ == "__main__":
             sqlite_writer.decrypto_db()
 
         elif scelta == "12":
+            # Chiude le connessioni del pool prima di eliminare il database
+            sqlite_writer.close()
             excel_writer.delete_excel_and_db()
 
         elif scelta == "13":
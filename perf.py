@@ -0,0 +1,426 @@
+"""
+Funzioni di supporto per misurare le prestazioni delle operazioni (tempo e memoria).
+
+Strumentazione delle operazioni: i metodi pubblici di `ExcelWriter`, `SQLiteWriter` e
+`DataGenerator` sono decorati con `misurato`, e un blocco di codice può essere misurato con
+`span()`. Per ogni operazione vengono registrati chiamate, errori, tempo (totale e massimo),
+righe e byte elaborati e, se richiesto, il picco di memoria allocata (`tracemalloc`);
+i dati si esportano in JSON (`metriche.to_json()`) o nel formato testuale di Prometheus
+(`metriche.to_prometheus()`). Con `profile_dir` ogni operazione di primo livello salva anche
+un profilo `cProfile` (`<operazione>-<n>.prof`, da aprire con `pstats` o snakeviz).
+Le funzioni generatore registrano solo tempo e righe (vedi `misurato`).
+
+La strumentazione è disattivata finché non si chiama `enable()`: a quel punto il costo per
+chiamata è un solo controllo di un attributo. Righe e byte sono letti dalle statistiche
+restituite ('righe', 'byte'), dalla lunghezza del risultato o dai blocchi prodotti dai
+generatori; il codice misurato può indicarli con `span_corrente().add()`, che ha la precedenza.
+"""
+import functools
+import os
+import re
+import sys
+import threading
+import time
+
+# Prefisso delle metriche esportate in formato Prometheus
+PREFISSO_PROMETHEUS = "persone_operazione"
+# Flag delle funzioni generatore (`inspect.CO_GENERATOR`, senza importare `inspect` all'avvio)
+_CO_GENERATOR = 0x20
+
+
+def peak_rss_mb():
+    """
+    Restituisce il picco di memoria residente (RSS) del processo corrente in MB.
+    Usa il modulo `resource` su Linux/macOS e, se installato, `psutil` sugli altri sistemi.
+    Returns:
+        float | None: Picco RSS in MB, oppure None se non è possibile misurarlo.
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss è in byte su macOS e in kilobyte su Linux
+        return picco / (1024 * 1024) if sys.platform == "darwin" else picco / 1024
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    # Su Windows `peak_wset` è il picco del working set
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+class Span:
+    """
+    Misura di un'esecuzione di un'operazione, da usare come context manager.
+    Attributi:
+        nome (str): Nome dell'operazione.
+        righe (int): Righe elaborate.
+        byte (int): Byte letti o scritti.
+    """
+    __slots__ = ("nome", "righe", "byte", "_registro", "_start", "_memoria", "_picco_figli", "_profilo",
+                 "_riportato")
+
+    def __init__(self, registro, nome):
+        self.nome = nome
+        self.righe = 0
+        self.byte = 0
+        self._registro = registro
+        self._start = None
+        self._memoria = None
+        self._picco_figli = 0
+        self._profilo = None
+        self._riportato = False
+
+    def add(self, righe=0, byte=0):
+        """
+        Aggiunge righe e byte elaborati all'operazione. Dopo la prima chiamata il valore
+        restituito dall'operazione non viene più usato per contarli (vedi `add_result()`).
+        """
+        self.righe += righe or 0
+        self.byte += byte or 0
+        self._riportato = True
+
+    def add_result(self, risultato):
+        """
+        Ricava righe e byte dal valore restituito dall'operazione (vedi `_conta()`),
+        se il codice misurato non li ha già indicati con `add()`.
+        """
+        if not self._riportato:
+            self.add(*_conta(risultato))
+
+    def __enter__(self):
+        pila = self._registro._pila()
+        if self._registro.memoria:
+            import tracemalloc
+
+            if tracemalloc.is_tracing():
+                corrente, picco = tracemalloc.get_traced_memory()
+                if pila:
+                    # Il picco del contenitore, azzerato da questo span, viene conservato a parte
+                    pila[-1]._picco_figli = max(pila[-1]._picco_figli, picco)
+                tracemalloc.reset_peak()
+                self._memoria = corrente
+        if not pila and self._registro.profile_dir and self._registro._profilo_lock.acquire(blocking=False):
+            import cProfile
+
+            self._profilo = cProfile.Profile()
+            self._profilo.enable()
+        pila.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valore, traceback):
+        secondi = time.perf_counter() - self._start
+        pila = self._registro._pila()
+        pila.pop()
+        picco = None
+        if self._memoria is not None:
+            import tracemalloc
+
+            if tracemalloc.is_tracing():
+                picco_assoluto = max(tracemalloc.get_traced_memory()[1], self._picco_figli)
+                picco = max(0, picco_assoluto - self._memoria)
+                if pila:
+                    pila[-1]._picco_figli = max(pila[-1]._picco_figli, picco_assoluto)
+        if self._profilo is not None:
+            self._profilo.disable()
+            try:
+                self._registro._salva_profilo(self.nome, self._profilo)
+            finally:
+                self._registro._profilo_lock.release()
+        self._registro.record(self.nome, secondi, self.righe, self.byte, picco, errore=tipo is not None)
+        return False
+
+
+class _SpanNullo:
+    """
+    Span usato quando la strumentazione è disattivata: non misura nulla.
+    """
+    __slots__ = ()
+    nome = None
+    righe = 0
+    byte = 0
+
+    def add(self, righe=0, byte=0):
+        pass
+
+    def add_result(self, risultato):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valore, traceback):
+        return False
+
+
+_SPAN_NULLO = _SpanNullo()
+
+
+class Metriche:
+    """
+    Registro thread-safe delle misure delle operazioni.
+    Attributi:
+        enabled (bool): Se False le operazioni non vengono misurate.
+        memoria (bool): Se True misura il picco di memoria allocata con `tracemalloc` (più lento).
+        Il picco è quello del processo: con operazioni in thread concorrenti include anche le loro allocazioni.
+        profile_dir (str | None): Cartella in cui salvare un profilo `cProfile` per operazione.
+        Memoria e profilo non sono misurati per le funzioni generatore (vedi `misurato`).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memoria = False
+        self.profile_dir = None
+        self._dati = {}
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        # cProfile misura un'operazione alla volta: le altre, se concorrenti, non vengono profilate
+        self._profilo_lock = threading.Lock()
+        self._profili = 0
+
+    def enable(self, memoria=False, profile_dir=None):
+        """
+        Attiva la strumentazione.
+        Args:
+            memoria (bool): Misura anche il picco di memoria allocata (avvia `tracemalloc`).
+            profile_dir (str, optional): Cartella dei profili `cProfile`, creata se non esiste.
+        """
+        import tracemalloc
+
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.memoria = memoria
+        self.profile_dir = profile_dir
+        self.enabled = True
+
+    def disable(self):
+        """
+        Disattiva la strumentazione (le misure già registrate restano disponibili).
+        """
+        import tracemalloc
+
+        self.enabled = False
+        if self.memoria and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memoria = False
+        self.profile_dir = None
+
+    def reset(self):
+        """
+        Elimina le misure registrate.
+        """
+        with self._lock:
+            self._dati.clear()
+
+    def span(self, nome):
+        """
+        Restituisce il context manager che misura il blocco come operazione `nome`.
+        """
+        return Span(self, nome) if self.enabled else _SPAN_NULLO
+
+    def current(self):
+        """
+        Restituisce lo span più interno aperto nel thread corrente (uno span nullo se non ce ne sono).
+        """
+        pila = getattr(self._locale, "pila", None)
+        return pila[-1] if pila else _SPAN_NULLO
+
+    def record(self, nome, secondi, righe=0, byte=0, picco=None, errore=False):
+        """
+        Registra un'esecuzione dell'operazione `nome`.
+        """
+        with self._lock:
+            dati = self._dati.get(nome)
+            if dati is None:
+                dati = self._dati[nome] = {"chiamate": 0, "errori": 0, "secondi": 0.0, "secondi_max": 0.0,
+                                           "righe": 0, "byte": 0, "picco_memoria_byte": None}
+            dati["chiamate"] += 1
+            dati["errori"] += errore
+            dati["secondi"] += secondi
+            dati["secondi_max"] = max(dati["secondi_max"], secondi)
+            dati["righe"] += righe
+            dati["byte"] += byte
+            if picco is not None:
+                dati["picco_memoria_byte"] = max(dati["picco_memoria_byte"] or 0, picco)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict[str, dict]: Per operazione: 'chiamate', 'errori', 'secondi', 'secondi_max',
+            'righe', 'byte', 'picco_memoria_byte' (None se la memoria non è misurata),
+            'righe_al_secondo' e 'mb_al_secondo'.
+        """
+        with self._lock:
+            dati = {nome: dict(valori) for nome, valori in sorted(self._dati.items())}
+        for valori in dati.values():
+            secondi = valori["secondi"]
+            valori["righe_al_secondo"] = valori["righe"] / secondi if secondi else 0.0
+            valori["mb_al_secondo"] = valori["byte"] / 1024 / 1024 / secondi if secondi else 0.0
+        return dati
+
+    def to_json(self, indent=2):
+        """
+        Returns:
+            str: Le misure di `snapshot()` in formato JSON.
+        """
+        import json
+
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: Le misure nel formato testuale di Prometheus, con l'operazione come etichetta.
+        """
+        dati = self.snapshot()
+        metriche = (
+            ("chiamate_total", "counter", "Esecuzioni dell'operazione", "chiamate"),
+            ("errori_total", "counter", "Esecuzioni terminate con un'eccezione", "errori"),
+            ("secondi_total", "counter", "Secondi spesi nell'operazione", "secondi"),
+            ("secondi_max", "gauge", "Durata massima di un'esecuzione", "secondi_max"),
+            ("righe_total", "counter", "Righe elaborate", "righe"),
+            ("byte_total", "counter", "Byte letti o scritti", "byte"),
+            ("picco_memoria_byte", "gauge", "Picco di memoria allocata da un'esecuzione", "picco_memoria_byte"),
+        )
+        righe = []
+        for suffisso, tipo, descrizione, campo in metriche:
+            nome = f"{PREFISSO_PROMETHEUS}_{suffisso}"
+            righe.append(f"# HELP {nome} {descrizione}")
+            righe.append(f"# TYPE {nome} {tipo}")
+            for operazione, valori in dati.items():
+                if valori[campo] is not None:
+                    etichetta = operazione.replace("\\", "\\\\").replace('"', '\\"')
+                    righe.append(f'{nome}{{operazione="{etichetta}"}} {valori[campo]}')
+        return "\n".join(righe) + "\n"
+
+    def save(self, path):
+        """
+        Salva le misure in formato Prometheus se il file ha estensione `.prom`, altrimenti in JSON.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+    def _pila(self):
+        pila = getattr(self._locale, "pila", None)
+        if pila is None:
+            pila = self._locale.pila = []
+        return pila
+
+    def _salva_profilo(self, nome, profilo):
+        with self._lock:
+            self._profili += 1
+            numero = self._profili
+        file = re.sub(r"[^\w.-]", "_", nome)
+        profilo.dump_stats(os.path.join(self.profile_dir, f"{file}-{numero}.prof"))
+
+
+def misurato(funzione=None, *, nome=None):
+    """
+    Decoratore che misura ogni chiamata della funzione come operazione `nome`
+    (default: "<Classe>.<metodo>"). Con la strumentazione disattivata chiama direttamente la funzione.
+    Per le funzioni generatore misura solo il tempo speso a produrre i valori (non quello di chi
+    li consuma) e conta le righe dei blocchi prodotti. Non usano uno `Span`, che resterebbe aperto
+    mentre il consumatore esegue altre operazioni: per loro non vengono registrati il picco di
+    memoria né il profilo `cProfile`, e le operazioni chiamate al loro interno non vi vengono annidate.
+    """
+    def decora(funzione):
+        operazione = nome or funzione.__qualname__
+
+        if funzione.__code__.co_flags & _CO_GENERATOR:
+            @functools.wraps(funzione)
+            def generatore(*args, **kwargs):
+                if not metriche.enabled:
+                    return (yield from funzione(*args, **kwargs))
+                return (yield from _misura_generatore(operazione, funzione(*args, **kwargs)))
+            return generatore
+
+        @functools.wraps(funzione)
+        def wrapper(*args, **kwargs):
+            if not metriche.enabled:
+                return funzione(*args, **kwargs)
+            with Span(metriche, operazione) as span:
+                risultato = funzione(*args, **kwargs)
+                span.add_result(risultato)
+            return risultato
+        return wrapper
+
+    return decora(funzione) if funzione is not None else decora
+
+
+def span(nome):
+    """
+    Misura un blocco di codice come operazione `nome` (vedi `Metriche.span()`).
+    """
+    return metriche.span(nome)
+
+
+def span_corrente():
+    """
+    Restituisce lo span aperto nel thread corrente, per aggiungere righe e byte elaborati.
+    """
+    return metriche.current()
+
+
+def _misura_generatore(operazione, generatore):
+    """
+    Inoltra i valori del generatore misurando il tempo speso al suo interno e le righe prodotte.
+    """
+    secondi = 0.0
+    righe = 0
+    errore = True
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                valore = next(generatore)
+            except StopIteration as fine:
+                secondi += time.perf_counter() - start
+                errore = False
+                return fine.value
+            secondi += time.perf_counter() - start
+            righe += _conta(valore, singolo=True)[0]
+            yield valore
+    except GeneratorExit:
+        # Il consumatore ha smesso di leggere prima della fine: non è un errore
+        errore = False
+        generatore.close()
+        raise
+    finally:
+        metriche.record(operazione, secondi, righe, errore=errore)
+
+
+def _conta(valore, singolo=False):
+    """
+    Ricava (righe, byte) da un valore restituito o prodotto da un'operazione:
+    - dizionario di statistiche con 'righe' e/o 'byte';
+    - blocco colonnare (dizionario di colonne o DataFrame): lunghezza delle colonne;
+    - lista o altra sequenza di righe (es. `PersonBatch`): la sua lunghezza;
+    - con `singolo`, qualsiasi altro valore conta come una riga (es. una persona prodotta da un generatore).
+    """
+    if isinstance(valore, dict):
+        if "righe" in valore or "byte" in valore:
+            righe, byte = valore.get("righe"), valore.get("byte")
+            return (righe if isinstance(righe, int) else 0), (byte if isinstance(byte, int) else 0)
+        colonna = next(iter(valore.values()), None)
+        if hasattr(colonna, "__len__") and not isinstance(colonna, str):
+            return len(colonna), 0
+        return int(singolo), 0
+    if hasattr(valore, "columns") and hasattr(valore, "__len__"):
+        return len(valore), 0
+    if isinstance(valore, (list, tuple)) and not (valore and isinstance(valore[0], str)):
+        return len(valore), 0
+    if valore is not None and not isinstance(valore, (str, bytes, bool, int, float)) and hasattr(valore, "__len__"):
+        return len(valore), 0
+    return int(singolo and valore is not None), 0
+
+
+# Registro condiviso da tutte le operazioni strumentate
+metriche = Metriche()
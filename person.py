@@ -0,0 +1,282 @@
+"""
+Rappresentazioni compatte di una persona e di un insieme di persone.
+
+- `Person`: record immutabile (NamedTuple) con gli stessi campi dei dizionari usati finora;
+  essendo una tupla di stringhe viene accettato ovunque è accettata una riga.
+- `PersonBatch`: contenitore colonnare. Nomi e cognomi, molto ripetuti, sono salvati come
+  tabella di stringhe uniche (interning) più un array di codici a 4 byte; gli altri campi,
+  quasi tutti diversi, sono concatenati in un unico buffer UTF-8 con un array di offset.
+  Una persona occupa così poche decine di byte invece delle diverse centinaia di un `dict`
+  con cinque oggetti `str`.
+
+Oltre all'indirizzo completo ogni persona ha i campi dell'indirizzo strutturato (via, numero,
+CAP, città, provincia). Per i dati nel formato precedente, con i soli cinque campi di base,
+vengono ricavati da `indirizzo` con `scomponi_indirizzo()`.
+"""
+from array import array
+from typing import NamedTuple
+
+# Campi di base, presenti anche nei dati del formato precedente
+CAMPI_BASE = ("nome", "cognome", "indirizzo", "email", "telefono")
+# Campi dell'indirizzo strutturato, ricavabili da "<via> <numero>, <CAP> <città> <provincia>"
+CAMPI_INDIRIZZO = ("via", "numero", "cap", "citta", "provincia")
+# Campi salvati come tabella di stringhe uniche + codici
+CAMPI_DIZIONARIO = ("nome", "cognome", "via", "numero", "cap", "citta", "provincia")
+
+
+class Person(NamedTuple):
+    """
+    Dati di una persona, nello stesso ordine delle colonne di Excel e della tabella `persone`.
+    """
+    nome: str
+    cognome: str
+    indirizzo: str
+    email: str
+    telefono: str
+    via: str
+    numero: str
+    cap: str
+    citta: str
+    provincia: str
+
+    @classmethod
+    def from_dict(cls, persona):
+        """
+        Crea il record da un dizionario con i campi 'nome', 'cognome', 'indirizzo', 'email', 'telefono'
+        e, facoltativamente, quelli dell'indirizzo strutturato (altrimenti ricavati da 'indirizzo').
+        """
+        return cls(*riga_da_dict(persona))
+
+
+def componi_indirizzo(via, numero, cap, citta, provincia):
+    """
+    Restituisce l'indirizzo completo nel formato "<via> <numero>, <CAP> <città> <provincia>".
+    """
+    return f"{via} {numero}, {cap} {citta} {provincia}"
+
+
+def scomponi_indirizzo(indirizzo):
+    """
+    Ricava i campi strutturati da un indirizzo nel formato di `componi_indirizzo()`.
+    Args:
+        indirizzo (str | None): Indirizzo completo.
+    Returns:
+        tuple: (via, numero, cap, citta, provincia); tutti None se l'indirizzo non è nel formato atteso.
+    """
+    if not indirizzo:
+        return (None,) * len(CAMPI_INDIRIZZO)
+    strada, separatore, località = indirizzo.rpartition(", ")
+    via, _, numero = strada.rpartition(" ")
+    cap, _, resto = località.partition(" ")
+    citta, _, provincia = resto.rpartition(" ")
+    if not (separatore and via and cap and citta):
+        return (None,) * len(CAMPI_INDIRIZZO)
+    return via, numero, cap, citta, provincia
+
+
+def completa_riga(riga):
+    """
+    Completa una riga con i soli `CAMPI_BASE` aggiungendo i campi dell'indirizzo strutturato.
+    Le righe già complete vengono restituite così come sono.
+    """
+    if len(riga) == len(Person._fields):
+        return riga
+    return tuple(riga) + scomponi_indirizzo(riga[2])
+
+
+def riga_da_dict(persona):
+    """
+    Converte un dizionario persona in una tupla ordinata secondo `Person._fields`.
+    """
+    if "via" in persona:
+        return tuple(persona.get(campo) for campo in Person._fields)
+    return completa_riga(tuple(persona[campo] for campo in CAMPI_BASE))
+
+
+class _ColonnaDizionario:
+    """
+    Colonna di stringhe molto ripetute: tabella dei valori unici e un codice per riga.
+    Il codice 0 rappresenta None.
+    """
+    __slots__ = ("valori", "indice", "codici")
+
+    def __init__(self):
+        self.valori = [None]
+        self.indice = {}
+        self.codici = array("I")
+
+    def append(self, valore):
+        if valore is None:
+            self.codici.append(0)
+            return
+        codice = self.indice.get(valore)
+        if codice is None:
+            codice = self.indice[valore] = len(self.valori)
+            self.valori.append(valore)
+        self.codici.append(codice)
+
+    def slice(self, start, stop):
+        valori = self.valori
+        return [valori[codice] for codice in self.codici[start:stop]]
+
+    def nbytes(self):
+        return (self.codici.itemsize * len(self.codici)
+                + sum(len(valore.encode()) for valore in self.valori[1:]) + 8 * len(self.valori))
+
+
+class _ColonnaTesto:
+    """
+    Colonna di stringhe quasi tutte diverse: un unico buffer UTF-8 e un array di offset.
+    I valori None sono registrati a parte (sono rari).
+    """
+    __slots__ = ("dati", "offset", "nulli")
+
+    def __init__(self):
+        self.dati = bytearray()
+        self.offset = array("Q", [0])
+        self.nulli = set()
+
+    def append(self, valore):
+        if valore is None:
+            self.nulli.add(len(self.offset) - 1)
+        else:
+            self.dati += valore.encode()
+        self.offset.append(len(self.dati))
+
+    def slice(self, start, stop):
+        dati, offset = self.dati, self.offset
+        valori = [dati[offset[i]:offset[i + 1]].decode() for i in range(start, stop)]
+        for i in self.nulli:
+            if start <= i < stop:
+                valori[i - start] = None
+        return valori
+
+    def nbytes(self):
+        return len(self.dati) + self.offset.itemsize * len(self.offset)
+
+
+class PersonBatch:
+    """
+    Insieme di persone memorizzato per colonne (vedi la descrizione del modulo).
+    Si usa come una sequenza di `Person` (`len`, indici, iterazione) e viene accettato
+    direttamente da `ExcelWriter`, `SQLiteWriter` e `ColumnarWriter`.
+    """
+    __slots__ = ("_colonne", "_righe")
+
+    def __init__(self, persone=()):
+        """
+        Args:
+            persone (Iterable): Persone iniziali: `Person`, tuple o dizionari.
+        """
+        self._colonne = [_ColonnaDizionario() if campo in CAMPI_DIZIONARIO else _ColonnaTesto()
+                         for campo in Person._fields]
+        self._righe = 0
+        self.extend(persone)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Crea il batch da un blocco colonnare (dizionario di liste/array o DataFrame),
+        come quelli di `DataGenerator.generate_bulk()`.
+        """
+        if "via" not in columns:
+            return cls(zip(*(_lista(columns[campo]) for campo in CAMPI_BASE)))
+        batch = cls()
+        # Una colonna alla volta, per non avere in memoria tutte le stringhe Python insieme
+        for colonna, campo in zip(batch._colonne, Person._fields):
+            valori = columns[campo]
+            valori = _lista(valori)
+            for valore in valori:
+                colonna.append(valore)
+            batch._righe = len(valori)
+        return batch
+
+    def append(self, persona):
+        """
+        Aggiunge una persona.
+        Args:
+            persona (Person | tuple | dict): Dati della persona.
+        """
+        if isinstance(persona, dict):
+            persona = riga_da_dict(persona)
+        elif len(persona) != len(self._colonne):
+            persona = completa_riga(persona)
+        for colonna, valore in zip(self._colonne, persona):
+            colonna.append(valore)
+        self._righe += 1
+
+    def extend(self, persone):
+        """
+        Aggiunge più persone.
+        Args:
+            persone (Iterable): `Person`, tuple o dizionari.
+        """
+        for persona in persone:
+            self.append(persona)
+
+    def column(self, campo, start=0, stop=None):
+        """
+        Restituisce i valori di un campo.
+        Args:
+            campo (str): Uno tra `Person._fields`.
+            start, stop (int): Intervallo di righe. Default: tutte.
+        Returns:
+            list[str]: I valori del campo.
+        """
+        stop = self._righe if stop is None else min(stop, self._righe)
+        return self._colonne[Person._fields.index(campo)].slice(start, stop)
+
+    def rows(self, start=0, stop=None):
+        """
+        Restituisce un intervallo di righe come tuple semplici (più veloci da creare di `Person`).
+        """
+        stop = self._righe if stop is None else min(stop, self._righe)
+        return list(zip(*(colonna.slice(start, stop) for colonna in self._colonne)))
+
+    def iter_batches(self, batch_size):
+        """
+        Restituisce le righe a blocchi di tuple, decodificando un blocco alla volta.
+        Args:
+            batch_size (int): Numero massimo di righe per blocco.
+        Yields:
+            list[tuple]: Blocchi di righe ordinate secondo `Person._fields`.
+        """
+        for start in range(0, self._righe, batch_size):
+            yield self.rows(start, start + batch_size)
+
+    @property
+    def nbytes(self):
+        """
+        int: Memoria occupata dai dati delle colonne (buffer, offset, codici e tabelle dei valori).
+        """
+        return sum(colonna.nbytes() for colonna in self._colonne)
+
+    def __len__(self):
+        return self._righe
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            start, stop, step = indice.indices(self._righe)
+            if step != 1:
+                raise ValueError("PersonBatch supporta solo intervalli con passo 1")
+            return PersonBatch(self.rows(start, stop))
+        if indice < 0:
+            indice += self._righe
+        if not 0 <= indice < self._righe:
+            raise IndexError("indice di PersonBatch fuori intervallo")
+        return Person(*(colonna.slice(indice, indice + 1)[0] for colonna in self._colonne))
+
+    def __iter__(self):
+        for batch in self.iter_batches(10_000):
+            for riga in batch:
+                yield Person(*riga)
+
+    def __repr__(self):
+        return f"PersonBatch({self._righe} persone, {self.nbytes / 1024 / 1024:.1f} MB)"
+
+
+def _lista(valori):
+    """
+    Converte una colonna (lista, array NumPy o Series pandas) in una lista di valori Python.
+    """
+    return valori.tolist() if hasattr(valori, "tolist") else list(valori)
@@ -0,0 +1,366 @@
+"""
+Pool di connessioni SQLite thread-safe usato da `SQLiteWriter`.
+
+Le connessioni restano aperte tra una chiamata e l'altra, in modalità WAL così più
+lettori possono lavorare in parallelo a un writer, e riusano gli statement già
+preparati (cache interna di `sqlite3` per testo SQL). Se il file del database viene
+eliminato o sostituito (ad esempio da `decrypto_db()`), le connessioni aperte sul file
+precedente vengono scartate automaticamente.
+
+`EncryptedMemoryPool` offre la stessa interfaccia per un database cifrato a riposo: il file
+`.enc` viene decifrato direttamente in un database SQLite in memoria e ricifrato solo
+quando una transazione modifica i dati, senza mai scrivere il database in chiaro su disco.
+"""
+import io
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import streamcrypto
+from keys import key_manager
+
+# Numero di statement preparati tenuti in cache da ogni connessione
+CACHED_STATEMENTS = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Connessione SQLite che ricorda la generazione del pool in cui è stata creata.
+    """
+    generazione = 0
+
+
+class ConnectionPool:
+    """
+    Pool di connessioni verso un singolo file SQLite.
+    Attributi:
+        db_name (str): File del database.
+        max_size (int): Numero massimo di connessioni aperte contemporaneamente.
+        timeout (float): Secondi di attesa per una connessione libera (e per i lock SQLite).
+        wal (bool): Se True le connessioni usano `journal_mode=WAL`.
+        generation (int): Incrementata a ogni invalidazione del pool; permette a chi usa il pool
+        di sapere quando ripetere controlli memorizzati (es. esistenza della tabella).
+    """
+
+    def __init__(self, db_name, max_size=5, timeout=30.0, wal=True):
+        """
+        Inizializza il pool senza aprire connessioni: vengono create al primo utilizzo.
+        Args:
+            db_name (str): File del database.
+            max_size (int): Numero massimo di connessioni. Default: 5.
+            timeout (float): Secondi di attesa per una connessione libera. Default: 30.
+            wal (bool): Attiva la modalità WAL. Default: True.
+        """
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.wal = wal
+        self.generation = 0
+        self._idle = []
+        self._created = 0
+        self._identita = None
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def connection(self):
+        """
+        Prende in prestito una connessione dal pool.
+        Alla chiusura del blocco `with` esegue il commit della transazione aperta
+        (o il rollback in caso di eccezione) e restituisce la connessione al pool.
+        Yields:
+            sqlite3.Connection: Connessione pronta all'uso.
+        Raises:
+            TimeoutError: Se nessuna connessione si libera entro `timeout` secondi.
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+
+    def close(self):
+        """
+        Chiude le connessioni inattive e invalida quelle in uso, che verranno chiuse alla restituzione.
+        Alla chiusura dell'ultima connessione SQLite riporta il WAL nel file del database.
+        """
+        with self._cond:
+            self._invalida()
+            self._identita = None
+
+    def _checkout(self):
+        """
+        Restituisce una connessione inattiva della generazione corrente o ne crea una nuova.
+        """
+        with self._cond:
+            identita = _identita_file(self.db_name)
+            if identita != self._identita:
+                # Il file è stato eliminato o sostituito: le connessioni aperte puntano al vecchio file
+                if self._identita is not None:
+                    self._invalida()
+                self._identita = identita
+
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if conn.generazione == self.generation:
+                        return conn
+                    conn.close()
+                    self._created -= 1
+                if self._created < self.max_size:
+                    self._created += 1
+                    generazione = self.generation
+                    break
+                if not self._cond.wait(self.timeout):
+                    raise TimeoutError(f"Nessuna connessione libera verso {self.db_name} entro {self.timeout}s")
+
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        conn.generazione = generazione
+        with self._cond:
+            if self._identita is None:
+                self._identita = _identita_file(self.db_name)
+        return conn
+
+    def _checkin(self, conn):
+        """
+        Restituisce una connessione al pool, chiudendola se appartiene a una generazione precedente.
+        """
+        with self._cond:
+            if conn.generazione == self.generation:
+                self._idle.append(conn)
+            else:
+                conn.close()
+                self._created -= 1
+            self._cond.notify()
+
+    def _connect(self):
+        """
+        Apre una nuova connessione configurata per il pool.
+        """
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS, factory=PooledConnection)
+        if self.wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _invalida(self):
+        """
+        Passa a una nuova generazione e chiude le connessioni inattive (da chiamare con il lock).
+        """
+        self.generation += 1
+        for conn in self._idle:
+            conn.close()
+        self._created -= len(self._idle)
+        self._idle = []
+        self._cond.notify_all()
+
+
+class EncryptedMemoryPool:
+    """
+    "Pool" con un'unica connessione a un database SQLite in memoria, caricato da un file cifrato
+    con `streamcrypto` (o dal vecchio formato Fernet) tramite `sqlite3.Connection.deserialize`.
+    La connessione resta in cache tra le chiamate, quindi le letture successive alla prima non
+    decifrano più il file; viene ricaricata solo se il file `.enc` cambia su disco.
+    Alla fine di un blocco `connection()` che ha modificato i dati il database viene serializzato,
+    cifrato e sostituito atomicamente al file `.enc`.
+    Attributi:
+        encrypted_path (str): File cifrato del database.
+        path_key (str): File della chiave (generata al primo salvataggio se non esiste).
+        timeout (float): Secondi di attesa per la connessione, usata da un thread alla volta.
+        generation (int): Incrementata a ogni ricaricamento, come in `ConnectionPool`.
+        stats (dict): Numero e secondi di caricamenti ('caricamenti', 'secondi_caricamento')
+        e di salvataggi ('salvataggi', 'secondi_salvataggio').
+    """
+
+    def __init__(self, encrypted_path, path_key="psw.key", timeout=30.0):
+        """
+        Inizializza il pool senza decifrare il file: avviene al primo utilizzo.
+        Args:
+            encrypted_path (str): File cifrato del database.
+            path_key (str): File della chiave di crittografia. Default: "psw.key".
+            timeout (float): Secondi di attesa per la connessione. Default: 30.
+        """
+        self.encrypted_path = encrypted_path
+        self.path_key = path_key
+        self.timeout = timeout
+        self.generation = 0
+        self.stats = {"caricamenti": 0, "secondi_caricamento": 0.0,
+                      "salvataggi": 0, "secondi_salvataggio": 0.0}
+        self._conn = None
+        self._identita = None
+        self._modifiche = None
+        self._lock = threading.RLock()
+
+    def exists(self):
+        """
+        Returns:
+            bool: True se il file cifrato esiste o il database in memoria è già stato creato.
+        """
+        return self._conn is not None or os.path.exists(self.encrypted_path)
+
+    @contextmanager
+    def connection(self):
+        """
+        Prende in prestito la connessione in memoria, caricandola se necessario.
+        Alla chiusura del blocco `with` esegue il commit (o il rollback in caso di eccezione)
+        e, se i dati sono cambiati, salva il database cifrato su disco.
+        Yields:
+            sqlite3.Connection: Connessione al database in memoria.
+        Raises:
+            TimeoutError: Se la connessione non si libera entro `timeout` secondi.
+        """
+        if not self._lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Connessione a {self.encrypted_path} non disponibile entro {self.timeout}s")
+        try:
+            conn = self._carica()
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if _stato(conn) != self._modifiche:
+                self._salva(conn)
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """
+        Chiude la connessione in memoria (i dati confermati sono già salvati nel file cifrato).
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._identita = None
+            self.generation += 1
+
+    def _carica(self):
+        """
+        Restituisce la connessione in cache, oppure decifra il file `.enc` in un nuovo database
+        in memoria se non è ancora stato caricato o è cambiato su disco (da chiamare con il lock).
+        """
+        identita = _identita_cifrato(self.encrypted_path)
+        if self._conn is not None and identita == self._identita:
+            return self._conn
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(":memory:", check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS, factory=PooledConnection)
+        if identita is not None:
+            chiave = key_manager.get(self.path_key)
+            dati = bytearray()
+            with open(self.encrypted_path, "rb") as source:
+                if source.read(len(streamcrypto.MAGIC)) == streamcrypto.MAGIC:
+                    source.seek(0)
+                    for blocco in streamcrypto.iter_decrypt_stream(source, chiave.key):
+                        dati += blocco
+                else:
+                    source.seek(0)
+                    dati = chiave.fernet.decrypt(source.read())
+            if dati:
+                conn.deserialize(_senza_wal(dati))
+            self.stats["caricamenti"] += 1
+            self.stats["secondi_caricamento"] += time.perf_counter() - start
+
+        if self._conn is not None:
+            self._conn.close()
+        self.generation += 1
+        conn.generazione = self.generation
+        self._conn = conn
+        self._identita = identita
+        self._modifiche = _stato(conn)
+        return conn
+
+    def _salva(self, conn):
+        """
+        Serializza il database in memoria, lo cifra e sostituisce atomicamente il file `.enc`.
+        """
+        start = time.perf_counter()
+        chiave, _ = key_manager.get_or_create(self.path_key)
+        temporaneo = self.encrypted_path + ".tmp"
+        try:
+            with open(temporaneo, "wb") as target:
+                streamcrypto.encrypt_stream(io.BytesIO(conn.serialize()), target, chiave.key)
+            os.replace(temporaneo, self.encrypted_path)
+        finally:
+            if os.path.exists(temporaneo):
+                os.remove(temporaneo)
+        self._identita = _identita_cifrato(self.encrypted_path)
+        self._modifiche = _stato(conn)
+        self.stats["salvataggi"] += 1
+        self.stats["secondi_salvataggio"] += time.perf_counter() - start
+
+
+def _identita_file(path):
+    """
+    Restituisce (device, inode) del file, oppure None se il file non esiste.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _senza_wal(dati):
+    """
+    Restituisce l'immagine del database con l'intestazione in modalità rollback journal.
+    I file `.db` del pool sono in WAL (byte 18 e 19 dell'intestazione = 2) e le versioni
+    precedenti di `crypto_db()` li cifravano così come sono: un database in memoria
+    deserializzato in WAL non può essere aperto.
+    """
+    dati = bytearray(dati)
+    if len(dati) >= 20 and dati[18] == 2 and dati[19] == 2:
+        dati[18] = dati[19] = 1
+    return bytes(dati)
+
+
+def _stato(conn):
+    """
+    Restituisce righe modificate e versione dello schema della connessione: se cambiano
+    dopo una transazione (anche solo per CREATE TABLE / INDEX) il database va salvato.
+    """
+    return conn.total_changes, conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def _identita_cifrato(path):
+    """
+    Restituisce (inode, dimensione, mtime) del file cifrato, oppure None se non esiste:
+    cambia anche quando il file viene riscritto sul posto.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def remove_wal_files(db_name):
+    """
+    Elimina gli eventuali file `-wal` e `-shm` rimasti accanto al database, così non
+    vengono applicati per errore a un nuovo file con lo stesso nome.
+    Args:
+        db_name (str): File del database.
+    """
+    for suffisso in ("-wal", "-shm"):
+        try:
+            os.remove(db_name + suffisso)
+        except FileNotFoundError:
+            pass
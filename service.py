@@ -0,0 +1,588 @@
+"""
+Servizio HTTP/JSON locale basato su asyncio che espone le operazioni del programma:
+generazione, interrogazione, importazione, confronto e crittografia.
+
+Il server usa solo la libreria standard (`asyncio.start_server` con un parser HTTP/1.1 minimo,
+con keep-alive) ed è pensato per essere usato su localhost:
+
+    python service.py --port 8765
+    curl -X POST localhost:8765/generate -d '{"count": 100000, "seed": 42}'
+    curl "localhost:8765/persone?provincia=MI&limit=10"
+
+Endpoint (i parametri arrivano dalla query string e/o da un corpo JSON):
+    GET  /health      stato del servizio e delle code
+    GET  /persone     pagina di persone (cognome, email, citta, cap, provincia, after_id, limit)
+    GET  /conteggi    persone per provincia (provincia, per_citta)
+    GET  /metrics     misure delle operazioni in formato Prometheus (con --metrics, vedi `perf.Metriche`)
+    POST /generate    genera persone nel database o in un file (count, seed, target, file, append)
+    POST /import      importa un file Excel/Parquet/Arrow (file, sync, key, append)
+    POST /compare     confronta un file con il database (file, key, max_rows)
+    POST /encrypt     cifra il file Excel o il database (target, file, path_key)
+
+Il lavoro bloccante (pandas, openpyxl, sqlite3, crittografia) non gira mai nel ciclo di eventi:
+- le letture (persone, conteggi, confronto) vanno in un pool di thread limitato (`letture`);
+- le modifiche (generazione, importazione, crittografia) passano da un'unica coda servita da un
+  solo thread, così le scritture su SQLite sono serializzate e non si contendono il lock del
+  database; grazie al WAL le letture continuano mentre una scrittura è in corso.
+Quando le code sono piene il servizio risponde subito 503 con `Retry-After` invece di accumulare
+richieste (back-pressure): letture in corso, scritture in coda, connessioni aperte e dimensione
+del corpo delle richieste sono limitate.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qsl, urlsplit
+
+from batching import CAMPI
+from perf import metriche
+
+# Porta predefinita del servizio
+PORTA = 8765
+# Thread per le letture (il pool di SQLiteWriter ha 5 connessioni: 4 lettori + lo scrittore)
+LETTURE = 4
+# Letture accettate contemporaneamente (in esecuzione + in attesa di un thread)
+MAX_LETTURE = 64
+# Scritture in attesa nella coda dello scrittore
+MAX_SCRITTURE = 8
+# Connessioni aperte contemporaneamente
+MAX_CONNESSIONI = 256
+# Dimensione massima del corpo di una richiesta
+MAX_CORPO = 1024 * 1024
+# Intestazioni massime per richiesta
+MAX_INTESTAZIONI = 100
+# Secondi di attesa di una richiesta (anche tra due richieste sulla stessa connessione)
+TIMEOUT_RICHIESTA = 30.0
+# Righe massime per pagina di /persone
+MAX_PAGINA = 1000
+# Persone massime per richiesta di /generate
+MAX_GENERA = 10_000_000
+# Secondi suggeriti ai client respinti per sovraccarico
+RITENTA_DOPO = 1
+
+_MOTIVI = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ErroreHttp(Exception):
+    """
+    Errore da restituire al client con il codice di stato indicato.
+    """
+
+    def __init__(self, stato, messaggio):
+        super().__init__(messaggio)
+        self.stato = stato
+
+
+class Occupato(ErroreHttp):
+    """
+    Richiesta respinta perché le code del servizio sono piene (503).
+    """
+
+    def __init__(self, messaggio):
+        super().__init__(503, messaggio)
+
+
+class DataService:
+    """
+    Servizio HTTP/JSON asincrono sui file di dati in una cartella (vedi la descrizione del modulo).
+    Attributi:
+        root (str): Cartella dei file; i percorsi indicati dai client sono relativi a questa
+        e non possono uscirne.
+        db_name (str): Database SQLite usato dal servizio.
+        excel_file (str): File predefinito di generazione, importazione, confronto e crittografia.
+        host (str), port (int): Indirizzo di ascolto (porta 0: scelta dal sistema, letta dopo `start()`).
+        stats (dict): Contatori delle richieste ('richieste', 'rifiutate', 'errori').
+    """
+
+    def __init__(self, root=".", db_name="persone.db", excel_file="persone.xlsx", host="127.0.0.1",
+                 port=PORTA, letture=LETTURE, max_letture=MAX_LETTURE, max_scritture=MAX_SCRITTURE,
+                 max_connessioni=MAX_CONNESSIONI):
+        """
+        Inizializza il servizio senza aprire la porta: avviene con `start()`.
+        Args:
+            root (str): Cartella dei file. Default: la cartella corrente.
+            db_name (str): Database SQLite, relativo a `root`. Default: "persone.db".
+            excel_file (str): File predefinito, relativo a `root`. Default: "persone.xlsx".
+            host (str): Indirizzo di ascolto. Default: "127.0.0.1" (solo localhost).
+            port (int): Porta di ascolto. Default: `PORTA`.
+            letture (int): Thread per le letture. Default: `LETTURE`.
+            max_letture (int): Letture accettate contemporaneamente. Default: `MAX_LETTURE`.
+            max_scritture (int): Scritture in attesa nella coda. Default: `MAX_SCRITTURE`.
+            max_connessioni (int): Connessioni aperte contemporaneamente. Default: `MAX_CONNESSIONI`.
+        """
+        from database import SQLiteWriter
+
+        self.root = os.path.abspath(root)
+        self.db_name = self._percorso(db_name)
+        self.excel_file = excel_file
+        self.host = host
+        self.port = port
+        self.max_letture = max_letture
+        self.max_scritture = max_scritture
+        self.max_connessioni = max_connessioni
+        self.sqlite = SQLiteWriter(self.db_name)
+        self.stats = {"richieste": 0, "rifiutate": 0, "errori": 0}
+        self._letture = ThreadPoolExecutor(max_workers=letture, thread_name_prefix="letture")
+        self._scrittore = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scrittore")
+        self._letture_in_corso = 0
+        self._connessioni = 0
+        self._coda = None
+        self._server = None
+        self._task_scrittore = None
+        self._rotte = {
+            ("GET", "/health"): self._health,
+            ("GET", "/persone"): self._persone,
+            ("GET", "/conteggi"): self._conteggi,
+            ("GET", "/metrics"): self._metrics,
+            ("POST", "/generate"): self._generate,
+            ("POST", "/import"): self._import,
+            ("POST", "/compare"): self._compare,
+            ("POST", "/encrypt"): self._encrypt,
+        }
+
+    async def start(self):
+        """
+        Apre la porta e avvia il task che serve la coda delle scritture.
+        """
+        self._coda = asyncio.Queue(maxsize=self.max_scritture)
+        self._task_scrittore = asyncio.create_task(self._servi_scritture())
+        self._server = await asyncio.start_server(self._gestisci_connessione, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"✅ Servizio in ascolto su http://{self.host}:{self.port} (cartella {self.root})")
+
+    async def stop(self):
+        """
+        Chiude la porta, attende le scritture già accettate e rilascia thread e connessioni.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._task_scrittore is not None:
+            await self._coda.join()
+            self._task_scrittore.cancel()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._letture.shutdown)
+        await loop.run_in_executor(None, self._scrittore.shutdown)
+        self.sqlite.close()
+
+    async def serve_forever(self):
+        """
+        Avvia il servizio e lo mantiene attivo fino all'interruzione (Ctrl+C).
+        """
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # --- Esecuzione del lavoro bloccante ---
+
+    async def _leggi(self, funzione, *args, **kwargs):
+        """
+        Esegue una lettura nel pool di thread delle letture.
+        Raises:
+            Occupato: Se ci sono già `max_letture` letture in corso o in attesa.
+        """
+        if self._letture_in_corso >= self.max_letture:
+            raise Occupato(f"troppe letture in corso ({self._letture_in_corso})")
+        self._letture_in_corso += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._letture, partial(funzione, *args, **kwargs))
+        finally:
+            self._letture_in_corso -= 1
+
+    async def _scrivi(self, funzione, *args, **kwargs):
+        """
+        Accoda una modifica allo scrittore unico e ne attende il risultato.
+        Raises:
+            Occupato: Se la coda delle scritture è piena.
+        """
+        risultato = asyncio.get_running_loop().create_future()
+        try:
+            self._coda.put_nowait((partial(funzione, *args, **kwargs), risultato))
+        except asyncio.QueueFull:
+            raise Occupato(f"coda delle scritture piena ({self._coda.qsize()})") from None
+        return await risultato
+
+    async def _servi_scritture(self):
+        """
+        Esegue le modifiche accodate una alla volta nel thread dello scrittore.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            funzione, risultato = await self._coda.get()
+            try:
+                valore = await loop.run_in_executor(self._scrittore, funzione)
+            except Exception as e:
+                if not risultato.done():
+                    risultato.set_exception(e)
+            else:
+                if not risultato.done():
+                    risultato.set_result(valore)
+            finally:
+                self._coda.task_done()
+
+    # --- Endpoint ---
+
+    async def _health(self, parametri):
+        return {
+            "stato": "ok",
+            "letture_in_corso": self._letture_in_corso,
+            "scritture_in_coda": self._coda.qsize(),
+            "connessioni": self._connessioni,
+            **self.stats,
+        }
+
+    async def _persone(self, parametri):
+        self._database_esistente()
+        limit = _intero(parametri, "limit", 100, 1, MAX_PAGINA)
+        righe, next_id = await self._leggi(
+            self.sqlite.query_persone, *(parametri.get(campo) for campo in ("cognome", "email", "citta", "cap")),
+            provincia=parametri.get("provincia"), after_id=_intero(parametri, "after_id", 0, 0), limit=limit)
+        colonne = ("id",) + CAMPI
+        return {"persone": [dict(zip(colonne, riga)) for riga in righe], "after_id": next_id}
+
+    async def _conteggi(self, parametri):
+        self._database_esistente()
+        per_citta = _booleano(parametri, "per_citta")
+        righe = await self._leggi(self.sqlite.query_conteggi, parametri.get("provincia"), per_citta)
+        colonne = ("provincia", "citta", "persone") if per_citta else ("provincia", "persone")
+        return {"conteggi": [dict(zip(colonne, riga)) for riga in righe]}
+
+    async def _metrics(self, parametri):
+        if _booleano(parametri, "json"):
+            return metriche.snapshot()
+        return metriche.to_prometheus()
+
+    async def _generate(self, parametri):
+        count = _intero(parametri, "count", 1000, 1, MAX_GENERA)
+        seed = parametri.get("seed")
+        seed = None if seed is None else _intero(parametri, "seed", 0)
+        target = parametri.get("target", "db")
+        if target not in ("db", "file"):
+            raise ErroreHttp(400, "target deve essere 'db' o 'file'")
+        percorso = self._percorso(parametri.get("file", self.excel_file))
+        append = _booleano(parametri, "append")
+        return await self._scrivi(_genera, self.sqlite, count, seed, target, percorso, append)
+
+    async def _import(self, parametri):
+        percorso = self._file_esistente(parametri.get("file", self.excel_file))
+        if _booleano(parametri, "sync"):
+            stats = await self._scrivi(self.sqlite.sync_from_excel, percorso, key=parametri.get("key", "email"))
+        else:
+            stats = await self._scrivi(_importa, self.sqlite, percorso, _booleano(parametri, "append"))
+        if stats is None:
+            raise ErroreHttp(500, f"importazione di {parametri.get('file', self.excel_file)} non riuscita")
+        return stats
+
+    async def _compare(self, parametri):
+        percorso = self._file_esistente(parametri.get("file", self.excel_file))
+        self._database_esistente()
+        return await self._leggi(_confronta, percorso, self.db_name, parametri.get("key", "id"),
+                                 _intero(parametri, "max_rows", 20, 0, MAX_PAGINA))
+
+    async def _encrypt(self, parametri):
+        target = parametri.get("target", "excel")
+        if target == "excel":
+            from excel import ExcelWriter
+
+            percorso = self._file_esistente(parametri.get("file", self.excel_file))
+            path_key = self._percorso(parametri.get("path_key", "key.key"))
+            stats = await self._scrivi(ExcelWriter(percorso).crypto_excel, path_key, remove_original=False)
+        elif target == "db":
+            # `crypto_db()` cifra una copia coerente (VACUUM INTO): le letture in corso possono
+            # continuare e le transazioni ancora nel WAL non vanno perse
+            path_key = self._percorso(parametri.get("path_key", "psw.key"))
+            stats = await self._scrivi(self.sqlite.crypto_db, path_key, remove_original=False)
+        else:
+            raise ErroreHttp(400, "target deve essere 'excel' o 'db'")
+        if stats is None:
+            raise ErroreHttp(500, "crittografia non riuscita")
+        return stats
+
+    # --- Protocollo HTTP ---
+
+    async def _gestisci_connessione(self, reader, writer):
+        """
+        Serve le richieste di una connessione finché il client la mantiene aperta (keep-alive).
+        """
+        if self._connessioni >= self.max_connessioni:
+            self.stats["rifiutate"] += 1
+            writer.write(_risposta(503, {"errore": "troppe connessioni"}, False))
+            await _chiudi(writer)
+            return
+        self._connessioni += 1
+        try:
+            while True:
+                try:
+                    richiesta = await asyncio.wait_for(_leggi_richiesta(reader), TIMEOUT_RICHIESTA)
+                except ErroreHttp as e:
+                    writer.write(_risposta(e.stato, {"errore": str(e)}, False))
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if richiesta is None:
+                    break
+                metodo, percorso, parametri, keep_alive = richiesta
+                stato, corpo = await self._esegui(metodo, percorso, parametri)
+                writer.write(_risposta(stato, corpo, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connessioni -= 1
+            await _chiudi(writer)
+
+    async def _esegui(self, metodo, percorso, parametri):
+        """
+        Esegue l'endpoint richiesto.
+        Returns:
+            tuple[int, dict]: Codice di stato e corpo JSON della risposta.
+        """
+        self.stats["richieste"] += 1
+        endpoint = self._rotte.get((metodo, percorso))
+        try:
+            if endpoint is None:
+                if any(rotta[1] == percorso for rotta in self._rotte):
+                    raise ErroreHttp(405, f"metodo {metodo} non ammesso per {percorso}")
+                raise ErroreHttp(404, f"endpoint {percorso} inesistente")
+            return 200, await endpoint(parametri)
+        except Occupato as e:
+            self.stats["rifiutate"] += 1
+            return e.stato, {"errore": str(e)}
+        except ErroreHttp as e:
+            return e.stato, {"errore": str(e)}
+        except ValueError as e:
+            return 400, {"errore": str(e)}
+        except Exception as e:
+            self.stats["errori"] += 1
+            print(f"❌ Errore durante {metodo} {percorso}: {e}")
+            return 500, {"errore": str(e)}
+
+    # --- Percorsi ---
+
+    def _percorso(self, nome):
+        """
+        Restituisce il percorso assoluto di un file nella cartella del servizio.
+        Raises:
+            ErroreHttp: Se il percorso esce da `root`.
+        """
+        percorso = os.path.abspath(os.path.join(self.root, str(nome)))
+        if os.path.commonpath([percorso, self.root]) != self.root:
+            raise ErroreHttp(400, f"percorso non ammesso: {nome!r}")
+        return percorso
+
+    def _database_esistente(self):
+        if not os.path.exists(self.db_name):
+            raise ErroreHttp(404, f"il database {os.path.basename(self.db_name)} non esiste")
+
+    def _file_esistente(self, nome):
+        percorso = self._percorso(nome)
+        if not os.path.exists(percorso):
+            raise ErroreHttp(400, f"il file {nome!r} non esiste")
+        return percorso
+
+
+def _genera(sqlite, count, seed, target, percorso, append):
+    """
+    Genera `count` persone a blocchi e le scrive nel database o nel file (Excel, Parquet o Arrow).
+    """
+    from batching import iter_row_batches
+    from generator import DataGenerator
+
+    start = time.perf_counter()
+    blocchi = DataGenerator(count).generate_parallel(count, seed=seed, workers=1)
+    if target == "db":
+        stats = sqlite.bulk_insert(iter_row_batches(blocchi), replace=not append, exclusive=False)
+    else:
+        from columnar import FORMATI, ColumnarWriter
+        from excel import ExcelWriter
+
+        if os.path.splitext(percorso)[1].lower() in FORMATI:
+            ColumnarWriter(percorso).write(blocchi)
+        else:
+            ExcelWriter(percorso).write_to_excel_streaming(iter_row_batches(blocchi))
+        stats = {"righe": count}
+    stats["secondi"] = time.perf_counter() - start
+    return stats
+
+
+def _importa(sqlite, percorso, append):
+    """
+    Importa un file nel database senza bloccare i lettori (vedi `SQLiteWriter.bulk_insert()`).
+    """
+    from database import iter_file_batches
+
+    return sqlite.bulk_insert(iter_file_batches(percorso), replace=not append, exclusive=False)
+
+
+def _confronta(percorso, db_name, key, max_rows):
+    """
+    Confronta un file con il database e restituisce i conteggi e le prime chiavi di ogni categoria.
+    """
+    from database import open_reader
+    from diff import DiffEngine
+
+    start = time.perf_counter()
+    result = DiffEngine(open_reader(percorso), db_name, key=key).compare()
+    return {
+        "key": result.key,
+        "inserite": len(result.inserted),
+        "eliminate": len(result.deleted),
+        "modificate": len(result.modified),
+        "invariate": result.unchanged,
+        "duplicate": result.duplicates,
+        "esempi": {"inserite": result.inserted[:max_rows], "eliminate": result.deleted[:max_rows],
+                   "modificate": result.modified[:max_rows]},
+        "secondi": time.perf_counter() - start,
+    }
+
+
+async def _leggi_richiesta(reader):
+    """
+    Legge una richiesta HTTP/1.1.
+    Returns:
+        tuple | None: (metodo, percorso, parametri, keep_alive), None se il client ha chiuso la connessione.
+        I parametri uniscono query string e corpo JSON (che prevale).
+    Raises:
+        ErroreHttp: Se la richiesta non è valida o supera i limiti.
+    """
+    try:
+        riga = await reader.readline()
+        if not riga:
+            return None
+        try:
+            metodo, destinazione, versione = riga.decode("latin-1").split()
+        except ValueError:
+            raise ErroreHttp(400, "riga di richiesta non valida") from None
+        intestazioni = {}
+        while True:
+            riga = await reader.readline()
+            if riga in (b"\r\n", b"\n", b""):
+                break
+            if len(intestazioni) >= MAX_INTESTAZIONI:
+                raise ErroreHttp(431, "troppe intestazioni")
+            nome, _, valore = riga.decode("latin-1").partition(":")
+            intestazioni[nome.strip().lower()] = valore.strip()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise ErroreHttp(431, "riga di intestazione troppo lunga") from None
+
+    try:
+        lunghezza = int(intestazioni.get("content-length", 0))
+    except ValueError:
+        raise ErroreHttp(400, "Content-Length non valido") from None
+    if lunghezza > MAX_CORPO:
+        raise ErroreHttp(413, f"corpo della richiesta oltre {MAX_CORPO} byte")
+    corpo = await reader.readexactly(lunghezza) if lunghezza > 0 else b""
+
+    url = urlsplit(destinazione)
+    parametri = dict(parse_qsl(url.query))
+    if corpo:
+        try:
+            dati = json.loads(corpo)
+        except ValueError:
+            raise ErroreHttp(400, "corpo JSON non valido") from None
+        if not isinstance(dati, dict):
+            raise ErroreHttp(400, "il corpo JSON deve essere un oggetto")
+        parametri.update(dati)
+
+    connessione = intestazioni.get("connection", "").lower()
+    keep_alive = connessione != "close" if versione == "HTTP/1.1" else connessione == "keep-alive"
+    return metodo.upper(), url.path.rstrip("/") or "/", parametri, keep_alive
+
+
+def _risposta(stato, corpo, keep_alive):
+    """
+    Serializza una risposta HTTP/1.1 con corpo JSON (o di testo, se `corpo` è una stringa).
+    """
+    if isinstance(corpo, str):
+        dati, tipo = corpo.encode(), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        dati, tipo = json.dumps(corpo, ensure_ascii=False, default=str).encode(), "application/json; charset=utf-8"
+    intestazioni = [
+        f"HTTP/1.1 {stato} {_MOTIVI.get(stato, '')}",
+        f"Content-Type: {tipo}",
+        f"Content-Length: {len(dati)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if stato == 503:
+        intestazioni.append(f"Retry-After: {RITENTA_DOPO}")
+    return ("\r\n".join(intestazioni) + "\r\n\r\n").encode("latin-1") + dati
+
+
+async def _chiudi(writer):
+    """
+    Chiude la connessione ignorando gli errori del client già disconnesso.
+    """
+    try:
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+def _intero(parametri, nome, default, minimo=None, massimo=None):
+    """
+    Legge un parametro intero, controllando l'intervallo ammesso.
+    Raises:
+        ErroreHttp: Se il valore non è un intero o è fuori intervallo.
+    """
+    valore = parametri.get(nome, default)
+    try:
+        valore = int(valore)
+    except (TypeError, ValueError):
+        raise ErroreHttp(400, f"{nome} deve essere un intero") from None
+    if (minimo is not None and valore < minimo) or (massimo is not None and valore > massimo):
+        raise ErroreHttp(400, f"{nome} deve essere compreso tra {minimo} e {massimo}")
+    return valore
+
+
+def _booleano(parametri, nome):
+    """
+    Legge un parametro booleano (true/false da JSON, oppure 1/0, si/no, true/false dalla query string).
+    """
+    valore = parametri.get(nome, False)
+    if isinstance(valore, str):
+        return valore.strip().lower() in ("1", "true", "si", "sì", "s", "yes")
+    return bool(valore)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servizio HTTP/JSON locale per generazione, query, "
+                                                 "importazione, confronto e crittografia")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORTA)
+    parser.add_argument("--root", default=".", help="cartella dei file (default: quella corrente)")
+    parser.add_argument("--db", default="persone.db")
+    parser.add_argument("--excel", default="persone.xlsx")
+    parser.add_argument("--letture", type=int, default=LETTURE, help="thread per le letture")
+    parser.add_argument("--max-letture", type=int, default=MAX_LETTURE)
+    parser.add_argument("--max-scritture", type=int, default=MAX_SCRITTURE)
+    parser.add_argument("--max-connessioni", type=int, default=MAX_CONNESSIONI)
+    parser.add_argument("--metrics", action="store_true", help="misura le operazioni ed espone GET /metrics")
+    parser.add_argument("--trace-memory", action="store_true", help="con --metrics misura anche la memoria allocata")
+    parser.add_argument("--profile", metavar="DIR", help="con --metrics salva un profilo cProfile per operazione")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metriche.enable(memoria=args.trace_memory, profile_dir=args.profile)
+
+    service = DataService(args.root, args.db, args.excel, args.host, args.port, args.letture,
+                          args.max_letture, args.max_scritture, args.max_connessioni)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\nℹ️ Servizio interrotto.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Crittografia a blocchi (streaming) dei file Excel e SQLite.
+
+Il file viene cifrato a blocchi di dimensione fissa con AES-256-GCM, così la memoria
+necessaria dipende solo da `CHUNK_SIZE` e non dalla dimensione del file. Lettura,
+cifratura e scrittura lavorano in pipeline: un thread legge i blocchi, un pool di thread
+li cifra in parallelo e il thread principale li scrive nell'ordine originale.
+
+Formato del file `.enc`:
+    intestazione: MAGIC (8 byte) | versione (1) | dimensione blocco (4) | id chiave (8) | prefisso nonce (7)
+    blocchi:      lunghezza cifrato (4) | cifrato + tag GCM (16)
+Il nonce di ogni blocco è prefisso + numero del blocco (4 byte) + flag di ultimo blocco (1 byte)
+e l'intestazione è autenticata come dato associato: blocchi riordinati, rimossi o troncati
+vengono rilevati in decrittografia.
+
+La chiave AES è derivata con HKDF dalla chiave Fernet già usata dal progetto (`key.key`,
+`psw.key`), quindi i file di chiave esistenti restano validi. I vecchi file `.enc` cifrati
+con un'unica chiamata a `Fernet.encrypt` vengono riconosciuti e decifrati come prima.
+
+Il pacchetto `cryptography` viene importato solo alla prima operazione crittografica.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+
+MAGIC = b"PWSTREAM"
+VERSIONE = 1
+# Dimensione di default dei blocchi in chiaro
+CHUNK_SIZE = 1024 * 1024
+_HEADER = struct.Struct(">8sBI8s7s")
+_LUNGHEZZA = struct.Struct(">I")
+_TAG_SIZE = 16
+
+
+@lru_cache(maxsize=64)
+def derive_key(key):
+    """
+    Deriva la chiave AES-256 e il suo identificativo da una chiave Fernet.
+    Args:
+        key (bytes): Chiave Fernet (come letta dal file di chiave).
+    Returns:
+        tuple[bytes, bytes]: Chiave AES (32 byte) e identificativo della chiave (8 byte).
+        Il risultato è memorizzato, quindi HKDF viene eseguito una sola volta per chiave.
+    Raises:
+        ValueError: Se la chiave non è una chiave Fernet valida.
+    """
+    try:
+        segreto = base64.urlsafe_b64decode(key)
+    except (binascii.Error, TypeError):
+        segreto = b""
+    if len(segreto) != 32:
+        raise ValueError("La chiave Fernet deve essere di 32 byte codificati in base64 url-safe.")
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    materiale = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                     info=b"pw-stream-aes256gcm").derive(segreto)
+    return materiale, hashlib.sha256(b"pw-stream-key-id" + materiale).digest()[:8]
+
+
+def is_stream_file(path):
+    """
+    Verifica se il file è nel formato a blocchi (e non un vecchio file Fernet).
+    Args:
+        path (str): File `.enc` da controllare.
+    Returns:
+        bool: True se il file inizia con `MAGIC`.
+    """
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def read_key_id(path):
+    """
+    Restituisce l'identificativo della chiave usata per un file a blocchi.
+    Args:
+        path (str): File `.enc` nel formato a blocchi.
+    Returns:
+        bytes | None: Identificativo (8 byte), None per i vecchi file Fernet.
+    """
+    with open(path, "rb") as file:
+        header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size or not header.startswith(MAGIC):
+        return None
+    return _HEADER.unpack(header)[3]
+
+
+def encrypt_stream(source, target, key, chunk_size=CHUNK_SIZE, workers=1, fasi=None):
+    """
+    Cifra il contenuto di un file aperto in lettura binaria e lo scrive su `target`.
+    Args:
+        source: Oggetto file (o BytesIO) da cui leggere il testo in chiaro.
+        target: Oggetto file su cui scrivere il file cifrato.
+        key (bytes): Chiave Fernet.
+        chunk_size (int): Dimensione dei blocchi in chiaro.
+        workers (int): Thread che cifrano i blocchi in parallelo (vedi `_pipeline()`).
+        fasi (dict, optional): Se indicato, vi vengono sommati i secondi di 'lettura', 'crittografia' e 'scrittura'.
+    Returns:
+        int: Byte in chiaro cifrati.
+    """
+    aes_key, key_id = derive_key(key)
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    aesgcm = AESGCM(aes_key)
+    header = _HEADER.pack(MAGIC, VERSIONE, chunk_size, key_id, os.urandom(7))
+    prefisso = header[-7:]
+    fasi = _fasi() if fasi is None else fasi
+    target.write(header)
+
+    def blocchi():
+        indice = 0
+        t = time.perf_counter()
+        blocco = source.read(chunk_size)
+        while True:
+            successivo = source.read(chunk_size) if blocco else b""
+            fasi["lettura"] += time.perf_counter() - t
+            ultimo = not successivo
+            yield indice, blocco, ultimo
+            if ultimo:
+                return
+            t = time.perf_counter()
+            blocco = successivo
+            indice += 1
+
+    def cifra(elemento):
+        indice, blocco, ultimo = elemento
+        cifrato = aesgcm.encrypt(_nonce(prefisso, indice, ultimo), blocco, header)
+        return len(blocco), _LUNGHEZZA.pack(len(cifrato)) + cifrato
+
+    totale = 0
+    for dimensione, frame in _pipeline(blocchi(), cifra, workers, fasi):
+        t = time.perf_counter()
+        target.write(frame)
+        fasi["scrittura"] += time.perf_counter() - t
+        totale += dimensione
+    return totale
+
+
+def decrypt_stream(source, target, key, workers=1, fasi=None):
+    """
+    Decifra un file nel formato a blocchi scrivendo il testo in chiaro su `target`.
+    Args:
+        source: Oggetto file posizionato all'inizio del file cifrato.
+        target: Oggetto file su cui scrivere il testo in chiaro.
+        key (bytes): Chiave Fernet.
+        workers (int): Thread che decifrano i blocchi in parallelo (vedi `_pipeline()`).
+        fasi (dict, optional): Se indicato, vi vengono sommati i secondi di 'lettura', 'crittografia' e 'scrittura'.
+    Returns:
+        int: Byte in chiaro scritti.
+    Raises:
+        ValueError: Se il formato non è valido, la chiave è diversa o il file è troncato.
+        cryptography.exceptions.InvalidTag: Se un blocco è stato alterato.
+    """
+    fasi = _fasi() if fasi is None else fasi
+    totale = 0
+    for blocco in iter_decrypt_stream(source, key, workers, fasi):
+        t = time.perf_counter()
+        target.write(blocco)
+        fasi["scrittura"] += time.perf_counter() - t
+        totale += len(blocco)
+    return totale
+
+
+def iter_decrypt_stream(source, key, workers=1, fasi=None):
+    """
+    Decifra un file nel formato a blocchi restituendo i blocchi in chiaro, nell'ordine,
+    senza scriverli: usato da `decrypt_stream()` e per ricifrare un file in memoria limitata.
+    Args:
+        source: Oggetto file posizionato all'inizio del file cifrato.
+        key (bytes): Chiave Fernet.
+        workers (int): Thread che decifrano i blocchi in parallelo.
+        fasi (dict, optional): Dizionario a cui sommare i secondi di 'lettura' e 'crittografia'.
+    Yields:
+        bytes: Blocchi in chiaro.
+    Raises:
+        ValueError: Se il formato non è valido, la chiave è diversa o il file è troncato.
+        cryptography.exceptions.InvalidTag: Se un blocco è stato alterato.
+    """
+    header = source.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("file cifrato troncato o non valido")
+    magic, versione, chunk_size, key_id, prefisso = _HEADER.unpack(header)
+    if magic != MAGIC or versione != VERSIONE:
+        raise ValueError("formato del file cifrato non supportato")
+    aes_key, atteso = derive_key(key)
+    if key_id != atteso:
+        raise ValueError("la chiave non corrisponde a quella usata per crittografare il file")
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    aesgcm = AESGCM(aes_key)
+    fasi = _fasi() if fasi is None else fasi
+
+    def blocchi():
+        indice = 0
+        while True:
+            t = time.perf_counter()
+            lunghezza = source.read(_LUNGHEZZA.size)
+            if len(lunghezza) < _LUNGHEZZA.size:
+                raise ValueError("file cifrato troncato: manca l'ultimo blocco")
+            (dimensione,) = _LUNGHEZZA.unpack(lunghezza)
+            if dimensione > chunk_size + _TAG_SIZE:
+                raise ValueError("blocco cifrato di dimensione non valida")
+            cifrato = source.read(dimensione)
+            if len(cifrato) < dimensione:
+                raise ValueError("file cifrato troncato")
+            # Il flag di ultimo blocco è parte del nonce: se il file è stato troncato
+            # dopo un blocco intermedio, nessun blocco si autentica come ultimo
+            ultimo = source.peek(1)[:1] == b"" if hasattr(source, "peek") else _a_fine(source)
+            fasi["lettura"] += time.perf_counter() - t
+            yield indice, cifrato, ultimo
+            if ultimo:
+                return
+            indice += 1
+
+    def decifra(elemento):
+        indice, cifrato, ultimo = elemento
+        return aesgcm.decrypt(_nonce(prefisso, indice, ultimo), cifrato, header)
+
+    yield from _pipeline(blocchi(), decifra, workers, fasi)
+
+
+def reencrypt_stream(source, target, old_key, new_key, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Ricifra un file `.enc` con una nuova chiave blocco per blocco: il testo in chiaro
+    resta in memoria un blocco alla volta e non viene mai scritto su disco.
+    I vecchi file Fernet (token unico) vengono decifrati in memoria e convertiti nel formato a blocchi.
+    Args:
+        source: Oggetto file del file cifrato con `old_key`.
+        target: Oggetto file su cui scrivere il file cifrato con `new_key`.
+        old_key (bytes | MultiFernet): Chiave Fernet attuale (o MultiFernet per i vecchi file).
+        new_key (bytes): Nuova chiave Fernet.
+        chunk_size (int): Dimensione dei blocchi in chiaro del file ricifrato.
+        workers (int): Thread di cifratura/decifratura.
+    Returns:
+        int: Byte in chiaro ricifrati.
+    """
+    if source.read(len(MAGIC)) == MAGIC:
+        source.seek(0)
+        chiaro = _LettoreBlocchi(iter_decrypt_stream(source, old_key, workers))
+    else:
+        source.seek(0)
+        from cryptography.fernet import Fernet
+
+        fernet = old_key if hasattr(old_key, "decrypt") else Fernet(old_key)
+        chiaro = io.BytesIO(fernet.decrypt(source.read()))
+    return encrypt_stream(chiaro, target, new_key, chunk_size, workers)
+
+
+class _LettoreBlocchi:
+    """
+    Espone come oggetto file (metodo `read`) una sequenza di blocchi di byte.
+    """
+
+    def __init__(self, blocchi):
+        self._blocchi = iter(blocchi)
+        self._buffer = bytearray()
+
+    def read(self, size):
+        while len(self._buffer) < size:
+            blocco = next(self._blocchi, None)
+            if blocco is None:
+                break
+            self._buffer += blocco
+        dati = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return dati
+
+
+def _pipeline(elementi, trasforma, workers, fasi):
+    """
+    Applica `trasforma` agli elementi mantenendone l'ordine.
+    Con più di un worker un thread lettore consuma `elementi` e li mette in una coda
+    limitata, un pool di thread esegue `trasforma` (le primitive AEAD di `cryptography`
+    rilasciano il GIL) e i risultati vengono restituiti nell'ordine originale a chi scrive.
+    Args:
+        elementi (Iterator): Blocchi da elaborare (prodotti dalla lettura del file).
+        trasforma (Callable): Cifratura o decifratura di un blocco.
+        workers (int): Numero di thread di elaborazione; con 1 tutto avviene nel thread corrente.
+        fasi (dict): Dizionario a cui sommare i secondi di 'crittografia'.
+    Yields:
+        Risultati di `trasforma`, nell'ordine degli elementi.
+    """
+    def misura(elemento):
+        t = time.perf_counter()
+        risultato = trasforma(elemento)
+        return risultato, time.perf_counter() - t
+
+    if workers <= 1:
+        for elemento in elementi:
+            risultato, secondi = misura(elemento)
+            fasi["crittografia"] += secondi
+            yield risultato
+        return
+
+    coda = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    fine = object()
+
+    def metti(elemento):
+        # Non si blocca se il consumatore ha smesso di leggere (errore o iterazione interrotta)
+        while not stop.is_set():
+            try:
+                coda.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def lettore():
+        try:
+            for elemento in elementi:
+                if not metti(elemento):
+                    return
+            metti(fine)
+        except BaseException as e:
+            metti(_ErroreLettura(e))
+
+    thread = threading.Thread(target=lettore, name="streamcrypto-reader", daemon=True)
+    thread.start()
+    in_volo = deque()
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="streamcrypto") as executor:
+            finito = False
+            while not finito or in_volo:
+                # Tiene occupati i worker senza accumulare più di 2 blocchi per worker in memoria
+                while not finito and len(in_volo) < workers * 2:
+                    elemento = coda.get()
+                    if elemento is fine:
+                        finito = True
+                    elif isinstance(elemento, _ErroreLettura):
+                        raise elemento.errore
+                    else:
+                        in_volo.append(executor.submit(misura, elemento))
+                if in_volo:
+                    risultato, secondi = in_volo.popleft().result()
+                    fasi["crittografia"] += secondi
+                    yield risultato
+    finally:
+        stop.set()
+        for futuro in in_volo:
+            futuro.cancel()
+        thread.join()
+
+
+class _ErroreLettura:
+    """
+    Eccezione sollevata dal thread lettore, inoltrata al thread principale tramite la coda.
+    """
+
+    def __init__(self, errore):
+        self.errore = errore
+
+
+def encrypt_file(path, encrypted_path, key, chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Cifra un file a blocchi scrivendo prima su un file temporaneo e poi rinominandolo.
+    Args:
+        path (str): File in chiaro.
+        encrypted_path (str): File cifrato da creare (o sovrascrivere).
+        key (bytes): Chiave Fernet.
+        chunk_size (int): Dimensione dei blocchi in chiaro.
+        workers (int, optional): Thread di cifratura. Default: numero di CPU.
+    Returns:
+        dict: 'byte', 'secondi', 'mb_al_secondo', 'workers' e 'fasi' (secondi di lettura,
+        crittografia sommata su tutti i worker e scrittura).
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    fasi = _fasi()
+    temporaneo = encrypted_path + ".tmp"
+    try:
+        with open(path, "rb") as source, open(temporaneo, "wb") as target:
+            totale = encrypt_stream(source, target, key, chunk_size, workers, fasi)
+        os.replace(temporaneo, encrypted_path)
+    finally:
+        if os.path.exists(temporaneo):
+            os.remove(temporaneo)
+    return _stats(totale, time.perf_counter() - start, workers, fasi)
+
+
+def decrypt_file(encrypted_path, path, key, workers=None, fernet=None):
+    """
+    Decifra un file `.enc`, sia nel formato a blocchi sia nel vecchio formato Fernet.
+    Il file in chiaro viene sostituito solo se la decrittografia va a buon fine.
+    Args:
+        encrypted_path (str): File cifrato.
+        path (str): File in chiaro da creare (o sovrascrivere).
+        key (bytes): Chiave Fernet.
+        workers (int, optional): Thread di decifratura. Default: numero di CPU.
+        fernet (Fernet | MultiFernet, optional): Oggetto usato per i vecchi file Fernet
+            (es. MultiFernet con più chiavi candidate). Default: `Fernet(key)`.
+    Returns:
+        dict: Statistiche come `encrypt_file()`.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    fasi = _fasi()
+    temporaneo = path + ".tmp"
+    try:
+        with open(encrypted_path, "rb") as source, open(temporaneo, "wb") as target:
+            if source.read(len(MAGIC)) == MAGIC:
+                source.seek(0)
+                totale = decrypt_stream(source, target, key, workers, fasi)
+            else:
+                # Vecchio formato: un unico token Fernet per tutto il file
+                from cryptography.fernet import Fernet
+
+                source.seek(0)
+                decrypted = (fernet or Fernet(key)).decrypt(source.read())
+                target.write(decrypted)
+                totale = len(decrypted)
+        os.replace(temporaneo, path)
+    finally:
+        if os.path.exists(temporaneo):
+            os.remove(temporaneo)
+    return _stats(totale, time.perf_counter() - start, workers, fasi)
+
+
+def _nonce(prefisso, indice, ultimo):
+    """
+    Costruisce il nonce a 12 byte di un blocco.
+    """
+    return prefisso + struct.pack(">IB", indice, 1 if ultimo else 0)
+
+
+def _a_fine(source):
+    """
+    Verifica se un oggetto file senza `peek` (es. BytesIO) è arrivato alla fine.
+    """
+    posizione = source.tell()
+    fine = source.read(1) == b""
+    source.seek(posizione)
+    return fine
+
+
+def _fasi():
+    """
+    Restituisce il dizionario dei tempi per fase, azzerato.
+    """
+    return {"lettura": 0.0, "crittografia": 0.0, "scrittura": 0.0}
+
+
+def _stats(totale, secondi, workers, fasi):
+    """
+    Restituisce le statistiche di un'operazione di crittografia.
+    """
+    return {
+        "byte": totale,
+        "secondi": secondi,
+        "mb_al_secondo": totale / (1024 * 1024) / secondi if secondi else 0.0,
+        "workers": workers,
+        "fasi": fasi,
+    }
+
+
+def format_stats(stats):
+    """
+    Descrive in una riga le statistiche restituite da `encrypt_file()` / `decrypt_file()`.
+    Args:
+        stats (dict): Statistiche dell'operazione.
+    Returns:
+        str: Es. "12.3 MB/s, 4 worker (lettura 0.10s, crittografia 0.40s, scrittura 0.05s)".
+    """
+    fasi = ", ".join(f"{nome} {secondi:.2f}s" for nome, secondi in stats["fasi"].items())
+    return f"{stats['mb_al_secondo']:.1f} MB/s, {stats['workers']} worker ({fasi})"
@@ -0,0 +1,58 @@
+import sqlite3
+
+import cli
+from excel import ExcelWriter
+
+
+def _righe_db(db):
+    conn = sqlite3.connect(db)
+    try:
+        return [riga[1:] for riga in conn.execute("SELECT * FROM persone ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def _righe_excel(excel_file):
+    return [riga for chunk in ExcelWriter(excel_file, cache=False).iter_excel_rows() for riga in chunk]
+
+
+def test_pipeline(tmp_path):
+    """
+    Le persone generate vengono scritte in parallelo nel database e nel file Excel, e il file
+    riletto si importa e si confronta con il database.
+    """
+    db = str(tmp_path / "persone.db")
+    copia = str(tmp_path / "copia.db")
+    excel_file = str(tmp_path / "persone.xlsx")
+    assert cli.main(["generate", "--count", "250", "--seed", "1", "--batch-size", "100",
+                     "|", "to-sqlite", "--db", db, "|", "to-excel", "--file", excel_file]) == 0
+    righe = _righe_db(db)
+    assert len(righe) == 250
+    assert _righe_excel(excel_file) == righe
+
+    assert cli.main(["read", "--file", excel_file, "|", "to-sqlite", "--db", copia,
+                     "|", "compare", "--excel", excel_file, "--db", db]) == 0
+    assert _righe_db(copia) == righe
+
+
+def test_pipeline_interrotta(tmp_path, monkeypatch):
+    """
+    Se la sorgente fallisce a metà, database e file Excel esistenti restano quelli di prima.
+    """
+    db = str(tmp_path / "persone.db")
+    excel_file = str(tmp_path / "persone.xlsx")
+    assert cli.main(["generate", "--count", "50", "--seed", "1", "|", "to-sqlite", "--db", db,
+                     "|", "to-excel", "--file", excel_file]) == 0
+    prima = _righe_db(db)
+    with open(excel_file, "rb") as file:
+        contenuto = file.read()
+
+    def guasto(args, flusso, contesto):
+        yield [prima[0]]
+        raise RuntimeError("sorgente guasta")
+
+    monkeypatch.setitem(cli.STADI, "generate", ("sorgente", guasto))
+    assert cli.main(["generate", "|", "to-sqlite", "--db", db, "|", "to-excel", "--file", excel_file]) == 1
+    assert _righe_db(db) == prima
+    with open(excel_file, "rb") as file:
+        assert file.read() == contenuto
@@ -0,0 +1,138 @@
+import sqlite3
+
+from database import SQLiteWriter
+from generator import DataGenerator
+from keys import key_manager
+
+
+def _conta(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM persone").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_crypto_db_con_wal_e_lettore_aperto(tmp_path):
+    """
+    Le righe confermate ancora nel WAL finiscono nel file cifrato anche con un lettore aperto.
+    """
+    db = str(tmp_path / "persone.db")
+    chiave = str(tmp_path / "psw.key")
+    writer = SQLiteWriter(db)
+    writer.bulk_insert(DataGenerator().generate_bulk(100, seed=1))
+    writer.write_to_db(DataGenerator().generate_bulk(50, seed=2))
+    lettore = writer.iter_persone(fetch_size=10)
+    next(lettore)
+    try:
+        assert writer.crypto_db(chiave, remove_original=False) is not None
+    finally:
+        lettore.close()
+        writer.close()
+
+    key_manager.decrypt_file(db + ".enc", str(tmp_path / "ripristinato.db"), chiave)
+    assert _conta(str(tmp_path / "ripristinato.db")) == 150
+
+    cifrato = SQLiteWriter(db, encrypted=True, path_key=chiave)
+    try:
+        assert sum(persone for _, persone in cifrato.query_conteggi()) == 150
+    finally:
+        cifrato.close()
+
+
+def _pagina_tutto(writer, limit, **filtri):
+    """
+    Legge tutte le pagine di `query_persone()` con i filtri indicati.
+    """
+    ids, after_id = [], 0
+    while True:
+        righe, after_id = writer.query_persone(after_id=after_id, limit=limit, **filtri)
+        ids += [riga[0] for riga in righe]
+        if after_id is None:
+            return ids
+
+
+def test_paginazione_keyset(tmp_path):
+    """
+    Le pagine coprono esattamente le righe che soddisfano i filtri, senza duplicati, e le pagine
+    successive alla prima cercano nell'indice senza ordinare le righe trovate.
+    """
+    db = str(tmp_path / "persone.db")
+    writer = SQLiteWriter(db)
+    try:
+        writer.bulk_insert(DataGenerator().generate_bulk(2000, seed=1))
+        conn = sqlite3.connect(db)
+        try:
+            provincia, cognome = conn.execute("SELECT Provincia, Cognome FROM persone WHERE id = 1").fetchone()
+            attesi = {
+                "nessuno": ({}, "SELECT id FROM persone", ()),
+                "provincia": ({"provincia": provincia}, "SELECT id FROM persone WHERE Provincia = ?", (provincia,)),
+                "cognome": ({"cognome": cognome[0]}, "SELECT id FROM persone WHERE Cognome LIKE ?",
+                            (cognome[0] + "%",)),
+                "entrambi": ({"cognome": cognome[0], "provincia": provincia},
+                             "SELECT id FROM persone WHERE Cognome LIKE ? AND Provincia = ?",
+                             (cognome[0] + "%", provincia)),
+            }
+            attesi = {nome: (filtri, {riga[0] for riga in conn.execute(sql, params)})
+                      for nome, (filtri, sql, params) in attesi.items()}
+        finally:
+            conn.close()
+
+        for nome, (filtri, righe) in attesi.items():
+            ids = _pagina_tutto(writer, 7, **filtri)
+            assert len(ids) == len(set(ids)), nome
+            assert set(ids) == righe, nome
+            assert righe, nome
+
+        assert _pagina_tutto(writer, 7) == sorted(attesi["nessuno"][1])
+        for nome in ("provincia", "cognome", "entrambi"):
+            filtri = attesi[nome][0]
+            piano = writer.explain_query(after_id=1, **filtri)
+            assert any("USING INDEX" in riga for riga in piano), piano
+            assert not any("TEMP B-TREE" in riga for riga in piano), piano
+    finally:
+        writer.close()
+
+
+def test_sync_from_excel(tmp_path):
+    """
+    La sincronizzazione per email inserisce, aggiorna ed elimina solo le righe cambiate
+    mantenendo gli id, e salta il file se non è cambiato dall'ultima volta.
+    """
+    from batching import iter_row_batches
+    from excel import ExcelWriter
+
+    db = str(tmp_path / "persone.db")
+    excel_file = str(tmp_path / "persone.xlsx")
+    righe = [riga for batch in iter_row_batches(DataGenerator().generate_bulk(20, seed=1)) for riga in batch]
+    ExcelWriter(excel_file).write_to_excel_streaming(righe)
+    writer = SQLiteWriter(db)
+    try:
+        stats = writer.sync_from_excel(excel_file)
+        assert (stats["inserite"], stats["aggiornate"], stats["eliminate"]) == (20, 0, 0)
+        assert writer.sync_from_excel(excel_file)["file_invariato"]
+
+        conn = sqlite3.connect(db)
+        try:
+            id_prima = dict(conn.execute("SELECT Email, id FROM persone"))
+        finally:
+            conn.close()
+        nuova = ("Nuova",) + righe[0][1:3] + ("nuova@example.com",) + righe[0][4:]
+        modificate = righe[1:5] + [("Cambiato",) + righe[5][1:]] + righe[6:] + [nuova]
+        ExcelWriter(excel_file).write_to_excel_streaming(modificate)
+
+        stats = writer.sync_from_excel(excel_file)
+        assert not stats["file_invariato"]
+        assert (stats["inserite"], stats["aggiornate"], stats["eliminate"], stats["invariate"]) == (1, 1, 1, 18)
+        conn = sqlite3.connect(db)
+        try:
+            id_dopo = dict(conn.execute("SELECT Email, id FROM persone"))
+            cambiato = conn.execute("SELECT Nome FROM persone WHERE Email = ?", (righe[5][3],)).fetchone()
+        finally:
+            conn.close()
+        assert cambiato == ("Cambiato",)
+        assert righe[0][3] not in id_dopo
+        assert all(id_dopo[email] == id_prima[email] for email in id_prima if email != righe[0][3])
+        assert writer.sync_from_excel(excel_file)["file_invariato"]
+    finally:
+        writer.close()
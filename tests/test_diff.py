@@ -0,0 +1,72 @@
+import sqlite3
+
+from batching import iter_row_batches
+from database import SQLiteWriter
+from diff import DiffEngine
+from excel import ExcelWriter
+from generator import DataGenerator
+
+
+def _prepara(tmp_path):
+    """
+    Crea un file Excel e un database con le stesse 20 persone, poi nel database modifica la
+    persona 3, elimina la 5 e ne aggiunge una nuova (id 21).
+    """
+    db = str(tmp_path / "persone.db")
+    excel_file = str(tmp_path / "persone.xlsx")
+    righe = [riga for batch in iter_row_batches(DataGenerator().generate_bulk(20, seed=1)) for riga in batch]
+    ExcelWriter(excel_file).write_to_excel_streaming(righe)
+    writer = SQLiteWriter(db)
+    try:
+        writer.bulk_insert(righe)
+        writer.write_to_db([("Nuova",) + righe[0][1:3] + ("nuova@example.com",) + righe[0][4:]])
+    finally:
+        writer.close()
+    conn = sqlite3.connect(db)
+    try:
+        with conn:
+            conn.execute("UPDATE persone SET Nome = 'Cambiato' WHERE id = 3")
+            conn.execute("DELETE FROM persone WHERE id = 5")
+    finally:
+        conn.close()
+    return excel_file, db, righe
+
+
+def test_confronto_per_id_e_per_email(tmp_path):
+    """
+    Righe solo nel file, solo nel database e modificate, abbinate per posizione (id) o per email.
+    """
+    excel_file, db, righe = _prepara(tmp_path)
+
+    result = DiffEngine(ExcelWriter(excel_file), db).compare()
+    assert (result.inserted, result.deleted, result.modified, result.unchanged) == ([5], [21], [3], 18)
+    assert result.has_differences()
+
+    result = DiffEngine(ExcelWriter(excel_file), db, key="email").compare()
+    assert result.inserted == [righe[4][3]]
+    assert result.deleted == ["nuova@example.com"]
+    assert result.modified == [righe[2][3]]
+
+
+def test_indice_salvato(tmp_path):
+    """
+    Con `index_file` un nuovo confronto rilegge solo la sorgente cambiata, anche se la modifica
+    del database è ancora nel WAL.
+    """
+    excel_file, db, righe = _prepara(tmp_path)
+    indice = str(tmp_path / "persone.diffidx")
+
+    assert DiffEngine(ExcelWriter(excel_file), db, index_file=indice).compare().rescanned == ["excel", "db"]
+    result = DiffEngine(ExcelWriter(excel_file), db, index_file=indice).compare()
+    assert result.rescanned == []
+    assert (result.inserted, result.deleted, result.modified) == ([5], [21], [3])
+
+    # Il writer resta aperto: la nuova riga è solo nel WAL, il file del database non cambia
+    writer = SQLiteWriter(db)
+    try:
+        writer.write_to_db([("Altra",) + righe[0][1:3] + ("altra@example.com",) + righe[0][4:]])
+        result = DiffEngine(ExcelWriter(excel_file), db, index_file=indice).compare()
+    finally:
+        writer.close()
+    assert result.rescanned == ["db"]
+    assert result.deleted == [21, 22]
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+from database import SQLiteWriter
+from fieldcrypto import FieldCipher
+
+
+def test_cifratura_e_indice_cieco():
+    """
+    I valori tornano in chiaro solo con lo stesso campo; l'indice cieco ignora maiuscole
+    dell'email e spazi del telefono ma distingue i campi.
+    """
+    cifratore = FieldCipher(Fernet.generate_key())
+    token = cifratore.encrypt("email", "Mario.Rossi@example.com")
+    assert cifratore.decrypt("email", token) == "Mario.Rossi@example.com"
+    assert cifratore.encrypt("email", "Mario.Rossi@example.com") != token
+    with pytest.raises(InvalidTag):
+        cifratore.decrypt("telefono", token)
+    assert cifratore.encrypt("email", None) is None
+
+    indice = cifratore.blind_index
+    assert indice("email", " Mario.Rossi@EXAMPLE.com") == indice("email", "mario.rossi@example.com")
+    assert indice("telefono", "+39 333 1234567") == indice("telefono", "+393331234567")
+    assert indice("email", "x") != indice("indirizzo", "x")
+    assert FieldCipher(Fernet.generate_key()).blind_index("email", "x") != indice("email", "x")
+
+
+def test_query_persone_cifrate(tmp_path):
+    """
+    Le persone scritte con `encrypt_fields=True` non sono in chiaro nel database e si trovano
+    per email o telefono tramite gli indici ciechi.
+    """
+    db = str(tmp_path / "persone.db")
+    writer = SQLiteWriter(db, field_key=str(tmp_path / "campi.key"))
+    persone = [
+        {"nome": "Mario", "cognome": "Rossi", "indirizzo": "Via Roma 1, 00100 Roma RM",
+         "email": "mario.rossi@example.com", "telefono": "+39 333 1234567"},
+        {"nome": "Anna", "cognome": "Bianchi", "indirizzo": "Via Po 2, 10100 Torino TO",
+         "email": "anna.bianchi@example.com", "telefono": "+39 333 7654321"},
+    ]
+    try:
+        writer.write_to_db(persone, encrypt_fields=True)
+        assert writer.query_persone_cifrate(email="MARIO.ROSSI@example.com") == [
+            (1, "Mario", "Rossi", "Via Roma 1, 00100 Roma RM", "mario.rossi@example.com", "+39 333 1234567")]
+        assert [riga[0] for riga in writer.query_persone_cifrate(telefono="+393337654321")] == [2]
+        assert writer.query_persone_cifrate(email="mario.rossi@example.com", telefono="+39 333 7654321") == []
+        with pytest.raises(ValueError):
+            writer.query_persone_cifrate()
+    finally:
+        writer.close()
+
+    conn = sqlite3.connect(db)
+    try:
+        contenuto = conn.execute("SELECT Indirizzo, Email, Telefono FROM persone_cifrate").fetchall()
+    finally:
+        conn.close()
+    assert all(isinstance(valore, bytes) and b"example.com" not in valore and b"Roma" not in valore
+               for riga in contenuto for valore in riga)
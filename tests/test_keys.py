@@ -0,0 +1,32 @@
+import pytest
+from cryptography.fernet import Fernet
+
+import streamcrypto
+from keys import KeyManager
+
+
+def test_rotazione_chiave(tmp_path):
+    """
+    `rotate()` ricifra sotto la nuova chiave sia i file a blocchi sia i vecchi file Fernet,
+    salta quelli già ricifrati e la vecchia chiave non li apre più.
+    """
+    chiavi = KeyManager()
+    vecchia = tmp_path / "vecchia.key"
+    vecchia.write_bytes(Fernet.generate_key())
+    nuova = str(tmp_path / "nuova.key")
+
+    (tmp_path / "a.bin").write_bytes(b"file a blocchi" * 1000)
+    a_blocchi = str(tmp_path / "a.bin.enc")
+    streamcrypto.encrypt_file(str(tmp_path / "a.bin"), a_blocchi, vecchia.read_bytes(), chunk_size=4096)
+    fernet = tmp_path / "b.bin.enc"
+    fernet.write_bytes(Fernet(vecchia.read_bytes()).encrypt(b"vecchio file Fernet"))
+
+    assert chiavi.rotate([a_blocchi, str(fernet)], str(vecchia), nuova) == {"ricifrati": 2, "saltati": 0}
+    assert chiavi.rotate([a_blocchi, str(fernet)], str(vecchia), nuova) == {"ricifrati": 0, "saltati": 2}
+
+    for cifrato, atteso in ((a_blocchi, b"file a blocchi" * 1000), (str(fernet), b"vecchio file Fernet")):
+        assert streamcrypto.read_key_id(cifrato) == chiavi.get(nuova).key_id
+        chiavi.decrypt_file(cifrato, str(tmp_path / "chiaro.bin"), [str(vecchia), nuova])
+        assert (tmp_path / "chiaro.bin").read_bytes() == atteso
+        with pytest.raises(ValueError):
+            chiavi.decrypt_file(cifrato, str(tmp_path / "chiaro.bin"), str(vecchia))
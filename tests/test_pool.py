@@ -0,0 +1,30 @@
+from database import SQLiteWriter
+from generator import DataGenerator
+
+
+def test_database_cifrato_da_crypto_db(tmp_path):
+    """
+    Un database in WAL cifrato con `crypto_db()` deve essere utilizzabile in modalità cifrata.
+    """
+    db = str(tmp_path / "persone.db")
+    chiave = str(tmp_path / "psw.key")
+    writer = SQLiteWriter(db)
+    writer.bulk_insert(DataGenerator().generate_bulk(50, seed=1))
+    writer.write_to_db(DataGenerator().generate_bulk(1, seed=2))
+    assert writer.crypto_db(chiave, remove_original=True) is not None
+
+    cifrato = SQLiteWriter(db, encrypted=True, path_key=chiave)
+    try:
+        righe, _ = cifrato.query_persone(limit=100)
+        assert len(righe) == 51
+        cifrato.write_to_db(DataGenerator().generate_bulk(10, seed=3))
+        assert sum(persone for _, persone in cifrato.query_conteggi()) == 61
+    finally:
+        cifrato.close()
+
+    # Il file .enc riscritto dal pool si riapre con i dati aggiunti
+    cifrato = SQLiteWriter(db, encrypted=True, path_key=chiave)
+    try:
+        assert sum(persone for _, persone in cifrato.query_conteggi()) == 61
+    finally:
+        cifrato.close()
@@ -0,0 +1,115 @@
+import asyncio
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from keys import key_manager
+from service import DataService
+
+
+@contextmanager
+def _servizio(root, **opzioni):
+    """
+    Avvia il servizio su una porta libera in un thread con il proprio ciclo di eventi.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    service = DataService(str(root), port=0, **opzioni)
+    asyncio.run_coroutine_threadsafe(service.start(), loop).result()
+    try:
+        yield service
+    finally:
+        asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def _chiama(service, metodo, percorso, corpo=None):
+    conn = http.client.HTTPConnection(service.host, service.port, timeout=30)
+    try:
+        conn.request(metodo, percorso, body=None if corpo is None else json.dumps(corpo),
+                     headers={"Content-Type": "application/json"})
+        risposta = conn.getresponse()
+        dati = risposta.read()
+        return risposta.status, json.loads(dati) if dati else None
+    finally:
+        conn.close()
+
+
+def test_encrypt_db_con_letture_in_corso(tmp_path):
+    """
+    /encrypt del database non perde le righe ancora nel WAL mentre un lettore tiene una connessione.
+    """
+    with _servizio(tmp_path) as service:
+        assert _chiama(service, "POST", "/generate", {"count": 100, "seed": 1})[0] == 200
+        assert _chiama(service, "POST", "/generate", {"count": 50, "seed": 2, "append": True})[0] == 200
+        lettore = service.sqlite.iter_persone(fetch_size=10)
+        next(lettore)
+        try:
+            stato, risposta = _chiama(service, "POST", "/encrypt", {"target": "db"})
+            assert stato == 200, risposta
+        finally:
+            lettore.close()
+
+    ripristinato = str(tmp_path / "ripristinato.db")
+    key_manager.decrypt_file(str(tmp_path / "persone.db.enc"), ripristinato, str(tmp_path / "psw.key"))
+    conn = sqlite3.connect(ripristinato)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM persone").fetchone()[0] == 150
+    finally:
+        conn.close()
+
+
+def test_letture_oltre_il_limite(tmp_path):
+    """
+    Con `max_letture` letture in corso le altre vengono respinte subito con 503.
+    """
+    with _servizio(tmp_path, max_letture=1) as service:
+        assert _chiama(service, "POST", "/generate", {"count": 10, "seed": 1})[0] == 200
+        iniziata, sblocca = threading.Event(), threading.Event()
+        conteggi = service.sqlite.query_conteggi
+
+        def lenta(*args, **kwargs):
+            iniziata.set()
+            sblocca.wait(10)
+            return conteggi(*args, **kwargs)
+
+        service.sqlite.query_conteggi = lenta
+        risposte = []
+        prima = threading.Thread(target=lambda: risposte.append(_chiama(service, "GET", "/conteggi")))
+        prima.start()
+        try:
+            assert iniziata.wait(10)
+            stato, risposta = _chiama(service, "GET", "/conteggi")
+            assert stato == 503, risposta
+            assert _chiama(service, "GET", "/health")[1]["rifiutate"] == 1
+        finally:
+            sblocca.set()
+            prima.join()
+        assert risposte[0][0] == 200
+        assert _chiama(service, "GET", "/conteggi")[0] == 200
+
+
+def test_connessioni_oltre_il_limite(tmp_path):
+    """
+    Oltre `max_connessioni` connessioni aperte la nuova connessione riceve 503 e viene chiusa.
+    """
+    with _servizio(tmp_path, max_connessioni=1) as service:
+        aperta = http.client.HTTPConnection(service.host, service.port, timeout=30)
+        try:
+            # Keep-alive: la connessione resta aperta dopo la risposta
+            aperta.request("GET", "/health")
+            assert aperta.getresponse().read()
+            with socket.create_connection((service.host, service.port), timeout=30) as seconda:
+                risposta = b""
+                while dati := seconda.recv(4096):
+                    risposta += dati
+            assert risposta.startswith(b"HTTP/1.1 503")
+            assert b"Retry-After" in risposta
+        finally:
+            aperta.close()
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+import streamcrypto
+
+
+def _cifra(tmp_path, dati, key, chunk_size=1024):
+    chiaro = tmp_path / "dati.bin"
+    chiaro.write_bytes(dati)
+    cifrato = str(tmp_path / "dati.bin.enc")
+    streamcrypto.encrypt_file(str(chiaro), cifrato, key, chunk_size=chunk_size, workers=2)
+    return cifrato
+
+
+def test_round_trip_a_blocchi(tmp_path):
+    """
+    Un file di più blocchi (l'ultimo parziale) torna identico e il file cifrato è nel formato PWSTREAM.
+    """
+    key = Fernet.generate_key()
+    dati = os.urandom(10 * 1024 + 123)
+    cifrato = _cifra(tmp_path, dati, key)
+
+    assert streamcrypto.is_stream_file(cifrato)
+    assert streamcrypto.read_key_id(cifrato) == streamcrypto.derive_key(key)[1]
+    stats = streamcrypto.decrypt_file(cifrato, str(tmp_path / "ripristinato.bin"), key, workers=2)
+    assert stats["byte"] == len(dati)
+    assert (tmp_path / "ripristinato.bin").read_bytes() == dati
+
+
+def test_file_vuoto(tmp_path):
+    """
+    Anche un file vuoto produce un blocco finale autenticato.
+    """
+    key = Fernet.generate_key()
+    cifrato = _cifra(tmp_path, b"", key)
+    streamcrypto.decrypt_file(cifrato, str(tmp_path / "ripristinato.bin"), key)
+    assert (tmp_path / "ripristinato.bin").read_bytes() == b""
+
+
+def test_blocco_alterato(tmp_path):
+    """
+    Un byte alterato in un blocco intermedio viene rilevato e il file in chiaro non viene creato.
+    """
+    key = Fernet.generate_key()
+    cifrato = _cifra(tmp_path, os.urandom(8 * 1024), key)
+    contenuto = bytearray(open(cifrato, "rb").read())
+    contenuto[len(contenuto) // 2] ^= 0x01
+    with open(cifrato, "wb") as file:
+        file.write(contenuto)
+
+    with pytest.raises(InvalidTag):
+        streamcrypto.decrypt_file(cifrato, str(tmp_path / "ripristinato.bin"), key, workers=2)
+    assert not (tmp_path / "ripristinato.bin").exists()
+
+
+def test_file_troncato_e_chiave_diversa(tmp_path):
+    """
+    Una chiave diversa viene rifiutata dall'intestazione, un file troncato dal flag di ultimo blocco.
+    """
+    key = Fernet.generate_key()
+    cifrato = _cifra(tmp_path, os.urandom(4 * 1024), key)
+
+    with pytest.raises(ValueError):
+        streamcrypto.decrypt_file(cifrato, str(tmp_path / "ripristinato.bin"), Fernet.generate_key())
+
+    # Troncato dopo un blocco intermedio: nessun blocco si autentica come ultimo
+    dimensione_blocco = 4 + 1024 + 16
+    with open(cifrato, "r+b") as file:
+        file.truncate(streamcrypto._HEADER.size + 2 * dimensione_blocco)
+    with pytest.raises(InvalidTag):
+        streamcrypto.decrypt_file(cifrato, str(tmp_path / "ripristinato.bin"), key)
+
+
+def test_vecchio_formato_fernet(tmp_path):
+    """
+    I file cifrati con un unico token Fernet vengono ancora decifrati.
+    """
+    key = Fernet.generate_key()
+    cifrato = tmp_path / "vecchio.enc"
+    cifrato.write_bytes(Fernet(key).encrypt(b"contenuto in chiaro"))
+
+    assert not streamcrypto.is_stream_file(str(cifrato))
+    streamcrypto.decrypt_file(str(cifrato), str(tmp_path / "vecchio.bin"), key)
+    assert (tmp_path / "vecchio.bin").read_bytes() == b"contenuto in chiaro"